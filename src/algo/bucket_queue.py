@@ -0,0 +1,80 @@
+import heapq
+from bisect import insort
+from typing import Dict, List, Tuple
+
+
+class BucketQueue:
+    """
+    BucketQueue is a priority queue for small non-negative integer keys, as the
+    f-scores of searches with unit move costs are. Items are kept in one bucket
+    per f-score, and only the f-scores holding items are kept in a binary heap,
+    so finding the next f-score sifts through a handful of keys rather than
+    every open item, and skips the gaps left by moves costing more than 1.
+
+    Within an f-score, items with a higher g-score pop first: they are closer
+    to the target by the heuristic, and a search reaches the target sooner by
+    following them. Ties on g go to the higher item, so the order is fully
+    deterministic. Each bucket is kept sorted by (g-score, item); a search
+    mostly pushes the children of the item it just popped, one g-score deeper,
+    which lands at the end of the bucket without shifting anything.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: Dict[int, List[Tuple[int, int]]] = {}  # f-score -> sorted (g-score, item)
+        self._f_scores: List[int] = []  # Heap of the f-scores with a bucket
+        self._size: int = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def clear(self) -> None:
+        """
+        Removes every item, e.g. to reuse the queue for another search.
+        """
+        self._buckets.clear()
+        self._f_scores.clear()
+        self._size = 0
+
+    def push(self, f_score: int, g_score: int, item: int) -> None:
+        """
+        Adds an item with its f-score and g-score.
+
+        Args:
+            f_score (int): The key to order by, at least 0.
+            g_score (int): The tie-breaker, higher first.
+            item (int): The item, e.g. a dense index.
+        """
+        entry = (g_score, item)
+        bucket = self._buckets.get(f_score)
+        if bucket is None:
+            self._buckets[f_score] = [entry]
+            heapq.heappush(self._f_scores, f_score)
+        elif entry >= bucket[-1]:
+            bucket.append(entry)
+        else:
+            insort(bucket, entry)
+        self._size += 1
+
+    def pop(self) -> Tuple[int, int, int]:
+        """
+        Removes the item with the lowest f-score, the highest g-score among those.
+
+        Returns:
+            Tuple[int, int, int]: The f-score, g-score and item.
+
+        Raises:
+            IndexError: If the queue is empty.
+        """
+        if not self._size:
+            raise IndexError("pop from an empty bucket queue")
+        f_score = self._f_scores[0]
+        bucket = self._buckets[f_score]
+        g_score, item = bucket.pop()
+        if not bucket:
+            del self._buckets[f_score]
+            heapq.heappop(self._f_scores)
+        self._size -= 1
+        return f_score, g_score, item
@@ -0,0 +1,464 @@
+from array import array
+from dataclasses import dataclass
+from itertools import accumulate
+from operator import sub
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from algo.directions import RouteDirectionFactory
+from algo.costs import UnitCostModel
+from base.cost_base import CostModel
+from algo_types.map_types import Map, Node
+from algo_types.grid_map_types import EMPTY_NODE_CODE, NODE_TYPE_CODES, NODE_CODE_TYPES
+
+
+@dataclass
+class CompiledGraphArrays:
+    """
+    The flat arrays a CompiledGraph is made of. Any buffer supporting indexing and
+    slicing works, so the arrays can come straight from a memory-mapped snapshot.
+
+    Attributes:
+        node_codes: Node type code of every index (see NODE_TYPE_CODES), 0 if no node.
+        xs, ys, zs: Coordinates of every index.
+        offsets: CSR row offsets, one more entry than there are indices.
+        targets: CSR neighbour indices.
+        costs: Cost of every edge, parallel to targets. None to price the edges again.
+        cost_table: The cost table the costs were priced with, packed by
+            CompiledGraph.pack_cost_table. The costs are only used if it matches
+            the cost model of the graph they are loaded into.
+    """
+    node_codes: Union[bytearray, memoryview]
+    xs: Union[array, memoryview]
+    ys: Union[array, memoryview]
+    zs: Union[array, memoryview]
+    offsets: Union[array, memoryview]
+    targets: Union[array, memoryview]
+    costs: Optional[Union[array, memoryview]] = None
+    cost_table: Optional[Union[array, memoryview]] = None
+
+
+class CompiledGraph:
+    """
+    CompiledGraph is a CSR (compressed sparse row) adjacency structure compiled
+    from a map and the direction protocols registered in a RouteDirectionFactory.
+    Rows are addressed by the map's dense node indices, and the neighbours of
+    index i are targets[offsets[i]:offsets[i + 1]], so search loops iterate an
+    array slice instead of querying direction protocols and coordinates on every
+    expansion. Blocked nodes get no incoming edges.
+
+    The cost of every edge, priced by a CostModel, is kept in the costs array
+    parallel to targets, so searches weigh a move by indexing an array instead
+    of calling the model. Costs depend on the model rather than the map, so
+    arrays stored with the costs of another model are priced again on load.
+
+    All per-index state lives in flat arrays (see CompiledGraphArrays). Indices
+    the map frees keep their stale row until they are reused; nothing points to
+    them, so searches never reach them.
+
+    The reversed graph (the indices that can move onto each index), used by
+    backward searches, is built on first use and then recompiled along with
+    the forward rows.
+    """
+
+    def __init__(
+        self,
+        map: Map,
+        direction_registry_factory: RouteDirectionFactory,
+        arrays: Optional[CompiledGraphArrays] = None,
+        cost_model: Optional[CostModel] = None
+    ) -> None:
+        """
+        Initializes the CompiledGraph and compiles it from the given map, unless
+        previously compiled arrays are given.
+
+        Args:
+            map (Map): The map to compile.
+            direction_registry_factory (RouteDirectionFactory): The registry holding the
+                direction protocol of each node type.
+            arrays (Optional[CompiledGraphArrays]): Arrays of a graph compiled earlier
+                from the same map and protocols, e.g. loaded from a map snapshot.
+            cost_model (Optional[CostModel]): The cost of every move, one per move if not given.
+
+        Raises:
+            ValueError: If the cost model prices a move below 1.
+        """
+        self._map = map
+        self._direction_registry_factory = direction_registry_factory
+        self.cost_model = UnitCostModel() if cost_model is None else cost_model
+        self.reverse_offsets: Optional[array] = None
+        self.reverse_targets: Optional[array] = None
+        self.reverse_costs: Optional[array] = None
+        self._set_cost_table()
+        if arrays is None:
+            self.compile()
+        else:
+            self._set_arrays(arrays)
+            if arrays.costs is not None and arrays.cost_table is not None and (
+                arrays.cost_table.tolist() == self.pack_cost_table().tolist()
+            ):
+                self.costs = arrays.costs
+            elif self.is_unit_cost:
+                self.costs = array('i', [1]) * len(self.targets)
+            else:
+                self.costs = array('i', (
+                    self._edge_cost(index, target)
+                    for index in range(len(self.node_codes))
+                    for target in self.targets[self.offsets[index]:self.offsets[index + 1]]
+                ))
+
+    def compile(self) -> None:
+        """
+        Compiles the whole map: records the coordinates and type of every dense
+        index and builds the offsets and targets arrays from the registered
+        direction protocols, pricing every edge with the cost model.
+        """
+        indices_length = self._map.get_indices_length()
+        self._set_arrays(CompiledGraphArrays(
+            node_codes=bytearray(indices_length),
+            xs=array('i', [0]) * indices_length,
+            ys=array('i', [0]) * indices_length,
+            zs=array('i', [0]) * indices_length,
+            offsets=array('q', [0]),
+            targets=array('q'),
+        ))
+
+        for index in range(indices_length):
+            self._set_index(index, self._map.get_node_by_index(index))
+
+        directions_by_code = self._get_directions_by_code()
+        targets, offsets = self.targets, self.offsets
+        self.costs = costs = array('i')
+        for index in range(len(self.node_codes)):
+            row = self._compile_row(index, directions_by_code)
+            targets.extend(row)
+            costs.extend(self._edge_cost(index, target) for target in row)
+            offsets.append(len(targets))
+        self.reverse_offsets = self.reverse_targets = self.reverse_costs = None
+
+    def recompile(self, changed_coords: Iterable[Tuple[int, int, int]]) -> bool:
+        """
+        Incrementally recompiles the graph after nodes were added, removed,
+        retyped, blocked or unblocked at the given coordinates. Only the rows of the changed nodes and
+        of the nodes that can move onto them are rebuilt.
+
+        Args:
+            changed_coords (Iterable[Tuple[int, int, int]]): The (x, y, z) coordinates
+                whose node changed on the map.
+
+        Returns:
+            bool: True if a row gained a target. If not, edges were only taken away, so
+                no distance on the graph got shorter.
+        """
+        directions_by_code = self._get_directions_by_code()
+        all_directions = self._get_all_directions(directions_by_code)
+        affected: Set[int] = set()
+        reverse_affected: Set[int] = set()
+
+        for x, y, z in changed_coords:
+            index = self._map.get_index_by_coords(x, y, z)
+            if index is not None:
+                self._set_index(index, self._map.get_node_by_index(index))
+                affected.add(index)
+            for dx, dy, dz in all_directions:
+                source = self._map.get_index_by_coords(x - dx, y - dy, z - dz)
+                if source is not None:
+                    affected.add(source)
+                # A removed node leaves no row behind to tell which indices it could move onto
+                target = self._map.get_index_by_coords(x + dx, y + dy, z + dz)
+                if target is not None:
+                    reverse_affected.add(target)
+
+        # Indices the map added since the last compile start with an empty row
+        self.offsets = self._grow_offsets(self.offsets)
+
+        rows = {index: self._compile_row(index, directions_by_code) for index in affected}
+        gained_edges = any(not set(row).issubset(self.neighbors(index)) for index, row in rows.items())
+        if self.reverse_offsets is not None:
+            # Reversed rows change wherever a rewritten row gained or lost a target
+            reverse_affected.update(target for row in rows.values() for target in row)
+            for index in affected:
+                reverse_affected.update(self.neighbors(index))
+        self.offsets, self.targets, self.costs = self._rewrite_rows(
+            self.offsets,
+            self.targets,
+            self.costs,
+            {index: (row, [self._edge_cost(index, target) for target in row]) for index, row in rows.items()}
+        )
+
+        if self.reverse_offsets is not None:
+            self.reverse_offsets = self._grow_offsets(self.reverse_offsets)
+            reverse_rows = {index: self._compile_reverse_row(index, all_directions) for index in reverse_affected}
+            self.reverse_offsets, self.reverse_targets, self.reverse_costs = self._rewrite_rows(
+                self.reverse_offsets,
+                self.reverse_targets,
+                self.reverse_costs,
+                {index: (row, [self._edge_cost(source, index) for source in row]) for index, row in reverse_rows.items()}
+            )
+        return gained_edges
+
+    def compile_reverse(self) -> None:
+        """
+        Builds the reversed graph from the forward rows, unless it is already built.
+        The predecessors of index i are then
+        reverse_targets[reverse_offsets[i]:reverse_offsets[i + 1]], and
+        reverse_costs holds the cost of each of their edges onto i.
+        """
+        if self.reverse_offsets is not None:
+            return
+        offsets, targets, costs = self.offsets, self.targets, self.costs
+        indices_length = len(self.node_codes)
+
+        # Counting sort of the edges by target index
+        degrees = array('q', [0]) * indices_length
+        for target in targets:
+            degrees[target] += 1
+        reverse_offsets = array('q', accumulate(degrees, initial=0))
+        positions = array('q', reverse_offsets[:-1])
+        reverse_targets = array('q', [0]) * len(targets)
+        reverse_costs = array('i', [0]) * len(targets)
+        for index in range(indices_length):
+            for position in range(offsets[index], offsets[index + 1]):
+                target = targets[position]
+                reverse_targets[positions[target]] = index
+                reverse_costs[positions[target]] = costs[position]
+                positions[target] += 1
+
+        self.reverse_offsets, self.reverse_targets, self.reverse_costs = reverse_offsets, reverse_targets, reverse_costs
+
+        # Stale rows of freed indices aren't predecessors of anything
+        stale_targets = {
+            target
+            for index in range(indices_length) if offsets[index] < offsets[index + 1] and self._is_stale(index)
+            for target in targets[offsets[index]:offsets[index + 1]]
+        }
+        if stale_targets:
+            all_directions = self._get_all_directions(self._get_directions_by_code())
+            reverse_rows = {index: self._compile_reverse_row(index, all_directions) for index in stale_targets}
+            self.reverse_offsets, self.reverse_targets, self.reverse_costs = self._rewrite_rows(
+                reverse_offsets,
+                reverse_targets,
+                reverse_costs,
+                {index: (row, [self._edge_cost(source, index) for source in row]) for index, row in reverse_rows.items()}
+            )
+
+    def get_arrays(self) -> CompiledGraphArrays:
+        """
+        Returns the flat arrays of the graph, e.g. to write them to a map snapshot.
+        """
+        return CompiledGraphArrays(
+            node_codes=self.node_codes,
+            xs=self.xs,
+            ys=self.ys,
+            zs=self.zs,
+            offsets=self.offsets,
+            targets=self.targets,
+            costs=self.costs,
+            cost_table=self.pack_cost_table(),
+        )
+
+    def pack_cost_table(self) -> array:
+        """
+        Packs the cost of every (type, next type, direction) the graph was priced
+        with, to tell whether stored costs fit a cost model.
+
+        Returns:
+            array: (code, next code, dx, dy, dz, cost) of every entry, sorted.
+        """
+        return array('q', [
+            value
+            for (code, next_code, direction), cost in sorted(self._cost_table.items())
+            for value in (code, next_code, *direction, cost)
+        ])
+
+    def get_index(self, node: Node) -> int:
+        """
+        Returns the dense index of a node, looked up by its coordinates so that
+        maps don't need an id table for it.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        index = self._map.get_index_by_coords(node.coords.x, node.coords.y, node.coords.z)
+        if index is None:
+            raise KeyError(f"Node doesn't exist in Map with Id: {node.id}")
+        return index
+
+    def get_node(self, index: int) -> Union[Node, None]:
+        """
+        Returns the map node stored at a dense index.
+        """
+        return self._map.get_node_by_index(index)
+
+    def get_node_type(self, index: int) -> Union[str, None]:
+        """
+        Returns the node type compiled for a dense index, None if it has no node.
+        """
+        return NODE_CODE_TYPES.get(self.node_codes[index])
+
+    def get_transfer_cost(self, levels: int) -> int:
+        """
+        Returns the cost of riding a VTU shaft over the given number of levels.
+        """
+        return self.cost_model.get_transfer_cost(levels)
+
+    def neighbors(self, index: int) -> array:
+        """
+        Returns the neighbour indices of a dense index as a slice of the targets array.
+        """
+        return self.targets[self.offsets[index]:self.offsets[index + 1]]
+
+    def predecessors(self, index: int) -> array:
+        """
+        Returns the indices that can move onto a dense index, building the reversed
+        graph on first use.
+        """
+        self.compile_reverse()
+        return self.reverse_targets[self.reverse_offsets[index]:self.reverse_offsets[index + 1]]
+
+    def has_node(self, index: int) -> bool:
+        """
+        Checks whether a dense index holds a node, as opposed to being unused or freed.
+        """
+        return self.node_codes[index] != EMPTY_NODE_CODE and not self._is_stale(index)
+
+    def get_nodes_length(self) -> int:
+        """
+        Returns the number of dense indices, including indices without a node.
+        """
+        return len(self.node_codes)
+
+    def _set_arrays(self, arrays: CompiledGraphArrays) -> None:
+        self.node_codes = arrays.node_codes
+        self.xs, self.ys, self.zs = arrays.xs, arrays.ys, arrays.zs
+        self.offsets, self.targets = arrays.offsets, arrays.targets
+
+    def _set_index(self, index: int, node: Optional[Node]) -> None:
+        # Grow the per-index arrays when the map grew, copying buffers that can't grow
+        if len(self.node_codes) <= index:
+            self.node_codes, self.xs, self.ys, self.zs = (
+                bytearray(self.node_codes), array('i', self.xs), array('i', self.ys), array('i', self.zs)
+            )
+            while len(self.node_codes) <= index:
+                self.node_codes.append(EMPTY_NODE_CODE)
+                self.xs.append(0)
+                self.ys.append(0)
+                self.zs.append(0)
+        if node is None:
+            self.node_codes[index] = EMPTY_NODE_CODE
+            return
+        self.node_codes[index] = NODE_TYPE_CODES[node.node_type]
+        self.xs[index], self.ys[index], self.zs[index] = node.coords.x, node.coords.y, node.coords.z
+
+    def _set_cost_table(self) -> None:
+        # Price every (type, next type, direction) once, and bound the cost of a step along each axis from below
+        directions_by_code = self._get_directions_by_code()
+        self._cost_table: Dict[Tuple[int, int, Tuple[int, int, int]], int] = {
+            (code, next_code, direction): self.cost_model.get_move_cost(
+                NODE_CODE_TYPES[code], NODE_CODE_TYPES[next_code], direction
+            )
+            for code, directions in directions_by_code.items()
+            for direction in directions
+            for next_code in NODE_CODE_TYPES
+        }
+        # Heuristics count every remaining move at the cheapest cost, searches stop at the first target popped
+        for (code, next_code, direction), cost in self._cost_table.items():
+            if cost < 1:
+                raise ValueError(
+                    f"Move from {NODE_CODE_TYPES[code]} to {NODE_CODE_TYPES[next_code]} in direction {direction} "
+                    f"costs {cost}, moves must cost at least 1"
+                )
+        costs = self._cost_table.values()
+        self.is_unit_cost: bool = all(cost == 1 for cost in costs)
+        self.min_x_cost: int = min((cost for (_, _, direction), cost in self._cost_table.items() if direction[0]), default=0)
+        self.min_y_cost: int = min((cost for (_, _, direction), cost in self._cost_table.items() if direction[1]), default=0)
+        self.min_cost: int = min(costs, default=1)
+
+    def _edge_cost(self, index: int, target: int) -> int:
+        xs, ys, zs = self.xs, self.ys, self.zs
+        return self._cost_table[(
+            self.node_codes[index],
+            self.node_codes[target],
+            (xs[target] - xs[index], ys[target] - ys[index], zs[target] - zs[index])
+        )]
+
+    def _get_directions_by_code(self) -> Dict[int, Tuple[Tuple[int, int, int], ...]]:
+        # Query every protocol once per compile instead of once per expansion
+        return {
+            NODE_TYPE_CODES[node_type]: tuple(tuple(direction) for direction in protocol.get_directions())
+            for node_type, protocol in self._direction_registry_factory.get_direction_registry().items()
+        }
+
+    def _get_all_directions(
+        self,
+        directions_by_code: Dict[int, Tuple[Tuple[int, int, int], ...]]
+    ) -> Set[Tuple[int, int, int]]:
+        return {direction for directions in directions_by_code.values() for direction in directions}
+
+    def _grow_offsets(self, offsets: array) -> array:
+        if len(offsets) <= len(self.node_codes):
+            offsets = array('q', offsets)
+            while len(offsets) <= len(self.node_codes):
+                offsets.append(offsets[-1])
+        return offsets
+
+    def _compile_reverse_row(self, index: int, all_directions: Set[Tuple[int, int, int]]) -> List[int]:
+        # The only indices that can move onto an index are one direction step away from it
+        if self.node_codes[index] == EMPTY_NODE_CODE:
+            return []
+        x, y, z = self.xs[index], self.ys[index], self.zs[index]
+        row: List[int] = []
+        for dx, dy, dz in all_directions:
+            source = self._map.get_index_by_coords(x - dx, y - dy, z - dz)
+            if source is not None and index in self.neighbors(source):
+                row.append(source)
+        return row
+
+    def _is_stale(self, index: int) -> bool:
+        # A freed index no longer holds the node at the coordinates it was compiled with
+        return self._map.get_index_by_coords(self.xs[index], self.ys[index], self.zs[index]) != index
+
+    def _compile_row(self, index: int, directions_by_code: Dict[int, Tuple[Tuple[int, int, int], ...]]) -> List[int]:
+        node_code = self.node_codes[index]
+        if node_code == EMPTY_NODE_CODE:
+            return []
+
+        x, y, z = self.xs[index], self.ys[index], self.zs[index]
+        row: List[int] = []
+        for dx, dy, dz in directions_by_code.get(node_code, ()):
+            nx, ny, nz = x + dx, y + dy, z + dz
+            if 0 <= nx < self._map.lanes_nums and 0 <= ny < self._map.aisle_nums and 0 <= nz < self._map.level_nums:
+                target = self._map.get_index_by_coords(nx, ny, nz)
+                if target is not None and not self._map.is_blocked(target):
+                    row.append(target)
+        return row
+
+    def _rewrite_rows(
+        self,
+        offsets: array,
+        targets: array,
+        costs: array,
+        rows: Dict[int, Tuple[List[int], List[int]]]
+    ) -> Tuple[array, array, array]:
+        # Rows that kept their length are patched in place
+        if all(len(row) == offsets[index + 1] - offsets[index] for index, (row, _) in rows.items()):
+            for index, (row, row_costs) in rows.items():
+                targets[offsets[index]:offsets[index + 1]] = array('q', row)
+                costs[offsets[index]:offsets[index + 1]] = array('i', row_costs)
+            return offsets, targets, costs
+
+        # Otherwise splice the new rows between the untouched slices and rebuild the offsets
+        new_targets, new_costs = array('q'), array('i')
+        degrees = array('q', map(sub, offsets[1:], offsets[:-1]))
+        start = 0
+        for index in sorted(rows):
+            row, row_costs = rows[index]
+            new_targets.extend(targets[offsets[start]:offsets[index]])
+            new_targets.extend(row)
+            new_costs.extend(costs[offsets[start]:offsets[index]])
+            new_costs.extend(row_costs)
+            degrees[index] = len(row)
+            start = index + 1
+        new_targets.extend(targets[offsets[start]:])
+        new_costs.extend(costs[offsets[start]:])
+
+        return array('q', accumulate(degrees, initial=0)), new_targets, new_costs
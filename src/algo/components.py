@@ -0,0 +1,174 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from algo.compiled_graph import CompiledGraph
+from algo_types.grid_map_types import EMPTY_NODE_CODE
+
+# Label of indices that don't hold a node
+NO_COMPONENT: int = -1
+
+
+class StronglyConnectedComponents:
+    """
+    StronglyConnectedComponents labels every index of a CompiledGraph with its
+    strongly connected component, computed per level with Tarjan's algorithm.
+
+    Tarjan numbers components in reverse topological order: if component A has
+    an edge into component B then label(A) > label(B). So a target can only be
+    reached from nodes whose label is >= the target's label, and components
+    without edges leaving (or entering) them are known to trap (or exclude) a
+    raft. can_reach uses these facts to answer most unreachable queries in O(1),
+    and searches can prune neighbours that can no longer reach the target.
+
+    Labels of a level are recomputed lazily, and only for the levels whose
+    layout or blockers changed.
+    """
+
+    def __init__(self, graph: CompiledGraph) -> None:
+        """
+        Initializes the component labels of a compiled graph. Nothing is computed
+        until a level is queried.
+
+        Args:
+            graph (CompiledGraph): The graph to label. Moves are assumed to stay on
+                their level, as they do for every registered direction protocol.
+        """
+        self._graph = graph
+        self.labels: array = array('q')
+        self._level_indices: Dict[int, Set[int]] = {}
+        self._level_labels: Dict[int, Tuple[int, int]] = {}
+        self._dirty_levels: Set[int] = set()
+        self._exits: Set[int] = set()
+        self._entries: Set[int] = set()
+        self._next_label: int = 0
+        self._collect_levels()
+
+    def invalidate(self, changed_coords: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Marks the levels of the changed coordinates for relabelling. Call it after
+        the graph was recompiled for the same coordinates.
+
+        Args:
+            changed_coords (Iterable[Tuple[int, int, int]]): The (x, y, z) coordinates
+                whose node or blocked state changed.
+        """
+        for x, y, z in changed_coords:
+            index = self._graph._map.get_index_by_coords(x, y, z)
+            if index is not None:
+                self._level_indices.setdefault(z, set()).add(index)
+            self._dirty_levels.add(z)
+
+    def get_labels(self, level: int) -> array:
+        """
+        Returns the label array, after relabelling the given level if it changed.
+
+        Args:
+            level (int): The level the caller is about to search.
+
+        Returns:
+            array: The component label of every index.
+        """
+        if level in self._dirty_levels or level not in self._level_labels:
+            self._label_level(level)
+        return self.labels
+
+    def can_reach(self, start_index: int, target_index: int) -> Optional[bool]:
+        """
+        Decides in O(1) whether the target can be reached from the start, when the
+        component labels alone prove it. Both indices must be on the same level.
+
+        Args:
+            start_index (int): The index the raft starts from.
+            target_index (int): The index to reach.
+
+        Returns:
+            Optional[bool]: True if both are in the same component, False if the
+                target provably can't be reached, None if a search has to decide.
+        """
+        labels = self.get_labels(self._graph.zs[start_index])
+        start_label, target_label = labels[start_index], labels[target_index]
+        if start_label == target_label:
+            return True
+        if start_label < target_label or start_label not in self._exits or target_label not in self._entries:
+            return False
+        return None
+
+    def _collect_levels(self) -> None:
+        zs, node_codes = self._graph.zs, self._graph.node_codes
+        for index in range(self._graph.get_nodes_length()):
+            if node_codes[index] != EMPTY_NODE_CODE:
+                self._level_indices.setdefault(zs[index], set()).add(index)
+
+    def _label_level(self, level: int) -> None:
+        graph = self._graph
+        offsets, targets, zs, node_codes = graph.offsets, graph.targets, graph.zs, graph.node_codes
+        labels = self.labels
+        if len(labels) < graph.get_nodes_length():
+            labels.extend(array('q', [NO_COMPONENT]) * (graph.get_nodes_length() - len(labels)))
+
+        # Drop the exit/entry flags of the level's previous labels
+        first_label, last_label = self._level_labels.get(level, (0, 0))
+        for label in range(first_label, last_label):
+            self._exits.discard(label)
+            self._entries.discard(label)
+
+        # Indices that moved to another level or lost their node since they were collected
+        indices = self._level_indices.get(level, set())
+        indices -= {index for index in indices if zs[index] != level or node_codes[index] == EMPTY_NODE_CODE}
+        for index in indices:
+            labels[index] = NO_COMPONENT
+
+        first_label = self._next_label
+        order: Dict[int, int] = {}
+        lowlink: Dict[int, int] = {}
+        stack: List[int] = []
+        on_stack: Set[int] = set()
+
+        # Iterative Tarjan, each work item is (index, position in its CSR row)
+        for root in indices:
+            if root in order:
+                continue
+            order[root] = lowlink[root] = len(order)
+            stack.append(root)
+            on_stack.add(root)
+            work: List[Tuple[int, int]] = [(root, offsets[root])]
+
+            while work:
+                index, position = work[-1]
+                if position < offsets[index + 1]:
+                    work[-1] = (index, position + 1)
+                    neighbor = targets[position]
+                    if neighbor not in indices:
+                        continue
+                    if neighbor not in order:
+                        order[neighbor] = lowlink[neighbor] = len(order)
+                        stack.append(neighbor)
+                        on_stack.add(neighbor)
+                        work.append((neighbor, offsets[neighbor]))
+                    elif neighbor in on_stack and order[neighbor] < lowlink[index]:
+                        lowlink[index] = order[neighbor]
+                    continue
+
+                work.pop()
+                if work and lowlink[index] < lowlink[work[-1][0]]:
+                    lowlink[work[-1][0]] = lowlink[index]
+                if lowlink[index] == order[index]:
+                    label = self._next_label
+                    self._next_label += 1
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        labels[member] = label
+                        if member == index:
+                            break
+
+        # Components with an edge leaving them (exits) or entering them (entries)
+        for index in indices:
+            label = labels[index]
+            for neighbor in targets[offsets[index]:offsets[index + 1]]:
+                if neighbor in indices and labels[neighbor] != label:
+                    self._exits.add(label)
+                    self._entries.add(labels[neighbor])
+
+        self._level_labels[level] = (first_label, self._next_label)
+        self._dirty_levels.discard(level)
@@ -0,0 +1,316 @@
+import heapq
+import time
+from array import array
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from algo.compiled_graph import CompiledGraph
+
+# Middle index of an edge that is not a shortcut
+NO_MIDDLE: int = -1
+
+# Snapshot sections the hierarchy is stored in, with their array typecodes
+CONTRACTION_SECTIONS: Dict[str, str] = {
+    "ch.rank": "q",
+    "ch.up_offsets": "q",
+    "ch.up_targets": "q",
+    "ch.up_costs": "i",
+    "ch.up_middles": "q",
+    "ch.down_offsets": "q",
+    "ch.down_targets": "q",
+    "ch.down_costs": "i",
+    "ch.down_middles": "q",
+}
+
+
+class ContractionHierarchy:
+    """
+    ContractionHierarchy is a contraction hierarchy over the directed graph of a
+    CompiledGraph. Nodes are contracted one by one, least important first; when
+    a node v is contracted, a shortcut u -> w is added for every u -> v -> w that
+    is the only shortest way between them (checked by a bounded witness search).
+    Moves never change level, so every level is contracted on its own.
+
+    The result is stored as two CSR graphs. The upward graph holds each index's
+    edges to higher ranked indices. The downward graph holds, for each index,
+    the higher ranked indices with an edge onto it. A query runs Dijkstra upward
+    from both ends and meets at the highest ranked index of the shortest path,
+    settling only a few hundred indices. Each edge records the index it
+    shortcuts (NO_MIDDLE for original edges), so paths unpack into cells.
+    """
+
+    def __init__(
+        self,
+        rank: Union[array, memoryview],
+        up_offsets: Union[array, memoryview],
+        up_targets: Union[array, memoryview],
+        up_costs: Union[array, memoryview],
+        up_middles: Union[array, memoryview],
+        down_offsets: Union[array, memoryview],
+        down_targets: Union[array, memoryview],
+        down_costs: Union[array, memoryview],
+        down_middles: Union[array, memoryview],
+        preprocessing_time: float = 0.0
+    ) -> None:
+        """
+        Initializes the hierarchy from its arrays, see build.
+
+        Args:
+            rank: Contraction order of every index, -1 for indices without a node.
+            up_offsets, up_targets, up_costs, up_middles: The upward CSR graph.
+            down_offsets, down_targets, down_costs, down_middles: The downward CSR graph.
+            preprocessing_time (float): Seconds build took, 0 for loaded hierarchies.
+        """
+        self.rank = rank
+        self.up_offsets, self.up_targets, self.up_costs, self.up_middles = up_offsets, up_targets, up_costs, up_middles
+        self.down_offsets, self.down_targets, self.down_costs, self.down_middles = (
+            down_offsets, down_targets, down_costs, down_middles
+        )
+        self.preprocessing_time = preprocessing_time
+
+    @property
+    def shortcut_count(self) -> int:
+        """
+        The number of shortcuts added by the contraction.
+        """
+        return sum(1 for middle in self.up_middles if middle != NO_MIDDLE) + sum(
+            1 for middle in self.down_middles if middle != NO_MIDDLE
+        )
+
+    @classmethod
+    def build(cls, graph: CompiledGraph, witness_settle_limit: int = 64) -> "ContractionHierarchy":
+        """
+        Contracts every node of the graph. The next node to contract is the one with
+        the lowest edge difference (shortcuts added minus edges removed) plus the
+        number of its neighbours contracted already, re-evaluated lazily.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            witness_settle_limit (int): Indices a witness search may settle before it
+                gives up and the shortcut is added anyway, which is always correct.
+
+        Returns:
+            ContractionHierarchy: The hierarchy of the graph.
+        """
+        start_time: float = time.perf_counter()
+        indices_length = graph.get_nodes_length()
+        out_edges: List[Dict[int, int]] = [{} for _ in range(indices_length)]
+        in_edges: List[Dict[int, int]] = [{} for _ in range(indices_length)]
+        middles: Dict[Tuple[int, int], int] = {}
+        live_indices = [index for index in range(indices_length) if graph.has_node(index)]
+        for index in live_indices:
+            for target in graph.neighbors(index):
+                out_edges[index][target] = 1
+                in_edges[target][index] = 1
+
+        contracted = bytearray(indices_length)
+        contracted_neighbors = array('q', [0]) * indices_length
+        rank = array('q', [-1]) * indices_length
+
+        def shortcuts_of(node: int) -> List[Tuple[int, int, int]]:
+            # The shortcuts contracting node needs: u -> w pairs without a witness path
+            shortcuts: List[Tuple[int, int, int]] = []
+            for source, source_cost in in_edges[node].items():
+                costs = {target: source_cost + cost for target, cost in out_edges[node].items() if target != source}
+                if not costs:
+                    continue
+                witnesses = _witness_search(out_edges, source, node, max(costs.values()), costs, witness_settle_limit)
+                shortcuts.extend(
+                    (source, target, cost) for target, cost in costs.items() if witnesses.get(target, cost + 1) > cost
+                )
+            return shortcuts
+
+        def priority_of(node: int) -> int:
+            return len(shortcuts_of(node)) - len(in_edges[node]) - len(out_edges[node]) + contracted_neighbors[node]
+
+        queue: List[Tuple[int, int]] = [(priority_of(index), index) for index in live_indices]
+        heapq.heapify(queue)
+        next_rank = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            if contracted[node]:
+                continue
+            priority = priority_of(node)
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, node))  # Lazy update: something cheaper may come first
+                continue
+
+            for source, target, cost in shortcuts_of(node):
+                if cost < out_edges[source].get(target, cost + 1):
+                    out_edges[source][target] = in_edges[target][source] = cost
+                    middles[(source, target)] = node
+            for source in in_edges[node]:
+                del out_edges[source][node]
+                contracted_neighbors[source] += 1
+            for target in out_edges[node]:
+                del in_edges[target][node]
+                contracted_neighbors[target] += 1
+            contracted[node] = 1
+            rank[node] = next_rank
+            next_rank += 1
+
+        # Edges left on a contracted node all lead to, or come from, higher ranked nodes
+        return cls(
+            rank,
+            *_to_csr(out_edges, lambda index, target: middles.get((index, target), NO_MIDDLE)),
+            *_to_csr(in_edges, lambda index, source: middles.get((source, index), NO_MIDDLE)),
+            preprocessing_time=time.perf_counter() - start_time,
+        )
+
+    @classmethod
+    def from_sections(cls, sections: Dict[str, Union[array, memoryview]]) -> Optional["ContractionHierarchy"]:
+        """
+        Loads a hierarchy from map snapshot sections, if the snapshot holds one.
+
+        Args:
+            sections (Dict[str, Union[array, memoryview]]): The sections of a map snapshot.
+
+        Returns:
+            Optional[ContractionHierarchy]: The hierarchy, None if the snapshot has none.
+        """
+        if not all(name in sections for name in CONTRACTION_SECTIONS):
+            return None
+        return cls(*(sections[name] for name in CONTRACTION_SECTIONS))
+
+    def get_sections(self) -> Dict[str, array]:
+        """
+        Returns the arrays to store as map snapshot sections (see save_map_snapshot's
+        extra_sections).
+        """
+        sections: Dict[str, array] = {}
+        for name, typecode in CONTRACTION_SECTIONS.items():
+            values = getattr(self, name[len("ch."):])
+            sections[name] = values if isinstance(values, array) else array(typecode, values)
+        return sections
+
+    def find_path(self, start_index: int, target_index: int) -> Optional[Tuple[int, List[int], int]]:
+        """
+        Runs the bidirectional upward query between two indices of one level. Each
+        side stops once its smallest key reaches the best meeting cost.
+
+        Args:
+            start_index (int): The index to start from.
+            target_index (int): The index to reach.
+
+        Returns:
+            Optional[Tuple[int, List[int], int]]: The path cost, the unpacked path
+                indices from start to target and the number of settled indices,
+                None if the target can't be reached.
+        """
+        searches = (
+            (self.up_offsets, self.up_targets, self.up_costs, {start_index: 0}, {}, [(0, start_index)]),
+            (self.down_offsets, self.down_targets, self.down_costs, {target_index: 0}, {}, [(0, target_index)]),
+        )
+        best_cost: float = 0 if start_index == target_index else float('inf')
+        meeting_index: int = start_index
+        settled: int = 0
+
+        side = 0
+        while True:
+            # Alternate sides, skipping a side that is done
+            if not (searches[side][5] and searches[side][5][0][0] < best_cost):
+                side = 1 - side
+                if not (searches[side][5] and searches[side][5][0][0] < best_cost):
+                    break
+            offsets, targets, costs, distances, parents, open_list = searches[side]
+            other_distances = searches[1 - side][3]
+            side = 1 - side
+
+            distance, current = heapq.heappop(open_list)
+            if distance > distances[current]:
+                continue  # Skip stale heap entries
+            settled += 1
+            if current in other_distances and distance + other_distances[current] < best_cost:
+                best_cost, meeting_index = distance + other_distances[current], current
+            for position in range(offsets[current], offsets[current + 1]):
+                neighbor, next_distance = targets[position], distance + costs[position]
+                if next_distance < distances.get(neighbor, next_distance + 1):
+                    distances[neighbor] = next_distance
+                    parents[neighbor] = current
+                    heapq.heappush(open_list, (next_distance, neighbor))
+
+        if best_cost == float('inf'):
+            return None
+
+        # Walk back to the start upward, and on to the target downward, unpacking every edge
+        forward_parents, backward_parents = searches[0][4], searches[1][4]
+        chain: List[int] = [meeting_index]
+        while chain[-1] in forward_parents:
+            chain.append(forward_parents[chain[-1]])
+        chain.reverse()
+        while chain[-1] in backward_parents:
+            chain.append(backward_parents[chain[-1]])
+
+        path: List[int] = [chain[0]]
+        for source, target in zip(chain, chain[1:]):
+            path.extend(self._unpack(source, target))
+        return int(best_cost), path, settled
+
+    def _unpack(self, source: int, target: int) -> List[int]:
+        # The cells after source up to target along the edge source -> target
+        cells: List[int] = []
+        stack: List[Tuple[int, int]] = [(source, target)]
+        while stack:
+            edge_source, edge_target = stack.pop()
+            middle = self._middle(edge_source, edge_target)
+            if middle == NO_MIDDLE:
+                cells.append(edge_target)
+            else:
+                stack.append((middle, edge_target))
+                stack.append((edge_source, middle))
+        return cells
+
+    def _middle(self, source: int, target: int) -> int:
+        # An edge is stored at its lower ranked end: upward from source or downward onto target
+        if self.rank[source] < self.rank[target]:
+            offsets, targets, middles, index, other = self.up_offsets, self.up_targets, self.up_middles, source, target
+        else:
+            offsets, targets, middles, index, other = self.down_offsets, self.down_targets, self.down_middles, target, source
+        for position in range(offsets[index], offsets[index + 1]):
+            if targets[position] == other:
+                return middles[position]
+        raise KeyError(f"No edge from index {source} to index {target} in the hierarchy")
+
+
+def _witness_search(
+    out_edges: List[Dict[int, int]],
+    source: int,
+    excluded: int,
+    max_cost: int,
+    costs: Dict[int, int],
+    settle_limit: int
+) -> Dict[int, int]:
+    # Dijkstra from source avoiding the node being contracted, bounded in cost and settled nodes
+    distances: Dict[int, int] = {source: 0}
+    open_list: List[Tuple[int, int]] = [(0, source)]
+    settled, remaining = 0, len(costs)
+    while open_list and settled < settle_limit and remaining:
+        distance, current = heapq.heappop(open_list)
+        if distance > max_cost:
+            break
+        if distance > distances[current]:
+            continue
+        settled += 1
+        if current in costs:
+            remaining -= 1
+        for neighbor, cost in out_edges[current].items():
+            next_distance = distance + cost
+            if neighbor != excluded and next_distance < distances.get(neighbor, next_distance + 1):
+                distances[neighbor] = next_distance
+                heapq.heappush(open_list, (next_distance, neighbor))
+    return distances
+
+
+def _to_csr(
+    rows: List[Dict[int, int]],
+    middle_of: Callable[[int, int], int]
+) -> Tuple[array, array, array, array]:
+    # Flatten per-index {neighbour: cost} rows into offsets, targets, costs and middles arrays
+    targets, costs, middles = array('q'), array('i'), array('q')
+    for index, row in enumerate(rows):
+        for neighbor in sorted(row):
+            targets.append(neighbor)
+            costs.append(row[neighbor])
+            middles.append(middle_of(index, neighbor))
+    offsets = array('q', accumulate((len(row) for row in rows), initial=0))
+    return offsets, targets, costs, middles
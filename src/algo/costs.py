@@ -0,0 +1,100 @@
+from typing import Tuple
+from algo_types.map_types import NodeTypes
+from algo_types.map_interfaces import MapNodeTypes
+from base.cost_base import CostModel
+
+class UnitCostModel(CostModel):
+    """
+    UnitCostModel is a concrete implementation of the CostModel. Every move
+    and every level ridden costs 1, so routes are the ones with the fewest moves.
+    Searches that track the heading charge turn for every change of direction.
+    """
+
+    def __init__(self, turn: int = 0) -> None:
+        """
+        Initializes the model.
+
+        Args:
+            turn (int): Cost of a change of direction, in moves.
+        """
+        self.turn = turn
+
+    def get_move_cost(self, node_type: NodeTypes, next_node_type: NodeTypes, direction: Tuple[int, int, int]) -> int:
+        """
+        Every move costs 1.
+        """
+        return 1
+
+    def get_transfer_cost(self, levels: int) -> int:
+        """
+        Every level ridden costs 1.
+        """
+        return levels
+
+    def get_turn_cost(self, direction: Tuple[int, int, int], next_direction: Tuple[int, int, int]) -> int:
+        """
+        Every change of direction costs turn.
+        """
+        return self.turn if next_direction != direction else 0
+
+
+class TravelTimeCostModel(CostModel):
+    """
+    TravelTimeCostModel is a concrete implementation of the CostModel that
+    prices moves by the time a raft needs for them. Moves are priced by the
+    type of the node moved from, since that decides whether the raft drives
+    along a lane or an aisle. A move between an aisle node and a lane or VTU
+    node happens at a crossing, where the raft changes direction, and adds the
+    time that takes. Searches that track the heading charge turn for every
+    change of direction instead, including reversals and turns the node types
+    don't show, so set crossing to 0 when using them to not charge turns twice.
+    """
+
+    def __init__(
+        self,
+        lane_move: int = 10,
+        aisle_move: int = 15,
+        vtu_move: int = 10,
+        crossing: int = 20,
+        level_transfer: int = 40,
+        turn: int = 20
+    ) -> None:
+        """
+        Initializes the model with the time of each kind of move, in tenths of a second by default.
+
+        Args:
+            lane_move (int): Time of one move from a lane node.
+            aisle_move (int): Time of one move from an aisle node.
+            vtu_move (int): Time of one move from a VTU node.
+            crossing (int): Extra time of a move between an aisle node and a lane or VTU node.
+            level_transfer (int): Time of riding a VTU shaft one level.
+            turn (int): Time of stopping and switching the wheel set to change direction.
+        """
+        self.move_costs = {
+            MapNodeTypes.Lane.value: lane_move,
+            MapNodeTypes.Aisle.value: aisle_move,
+            MapNodeTypes.VTU.value: vtu_move,
+        }
+        self.crossing = crossing
+        self.level_transfer = level_transfer
+        self.turn = turn
+
+    def get_move_cost(self, node_type: NodeTypes, next_node_type: NodeTypes, direction: Tuple[int, int, int]) -> int:
+        """
+        Computes the time of one move, adding the crossing time if the raft turns
+        into or out of an aisle.
+        """
+        aisle = MapNodeTypes.Aisle.value
+        return self.move_costs[node_type] + (self.crossing if (node_type == aisle) != (next_node_type == aisle) else 0)
+
+    def get_transfer_cost(self, levels: int) -> int:
+        """
+        Computes the time of riding a VTU shaft over the given number of levels.
+        """
+        return self.level_transfer * levels
+
+    def get_turn_cost(self, direction: Tuple[int, int, int], next_direction: Tuple[int, int, int]) -> int:
+        """
+        Computes the time of changing direction between two moves.
+        """
+        return self.turn if next_direction != direction else 0
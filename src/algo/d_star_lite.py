@@ -0,0 +1,146 @@
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from algo.compiled_graph import CompiledGraph
+
+# Priority of an index in the open list: (min(g, rhs) + h + km, min(g, rhs))
+Key = Tuple[float, float]
+
+
+class DStarLitePlanner:
+    """
+    DStarLitePlanner keeps the search state of one raft driving to one target
+    with D* Lite, so its route can be repaired instead of planned again when
+    cells are blocked or unblocked.
+
+    The search runs backwards from the target: g(v) is the distance from v to
+    the target as last computed, rhs(v) the one-step lookahead 1 + min g over
+    v's neighbours. Indices where the two disagree are queued by their distance
+    plus the Manhattan distance to the raft, so only the part of the search tree
+    that can still affect the raft's route is repaired. km keeps the keys of
+    queued indices valid while the raft moves on.
+    """
+
+    def __init__(self, graph: CompiledGraph, start_index: int, target_index: int) -> None:
+        """
+        Initializes the planner. Nothing is searched until get_path.
+
+        Args:
+            graph (CompiledGraph): The compiled graph, kept in sync with the map by its router.
+            start_index (int): The index the raft is on.
+            target_index (int): The index the raft drives to, on the same level.
+        """
+        self._graph = graph
+        self.start_index = start_index
+        self.target_index = target_index
+        self._km: int = 0
+        self._g: Dict[int, float] = {}
+        self._rhs: Dict[int, float] = {target_index: 0}
+        self._queued_keys: Dict[int, Key] = {}
+        self._open_list: List[Tuple[float, float, int]] = []
+        self._changed: Set[int] = set()
+        self.expanded_nodes: int = 0
+        self._push(target_index)
+
+    def move_to(self, index: int) -> None:
+        """
+        Moves the raft to another index, e.g. the next cell of its route.
+
+        Args:
+            index (int): The index the raft is on now.
+        """
+        self._km += self._heuristic(self.start_index, index)
+        self.start_index = index
+
+    def notify_changed(self, indices: Iterable[int]) -> None:
+        """
+        Records indices whose moves changed (their row of the compiled graph was
+        rewritten). They are repaired on the next get_path.
+
+        Args:
+            indices (Iterable[int]): The indices whose outgoing moves changed.
+        """
+        self._changed.update(indices)
+
+    def get_path(self) -> Optional[List[int]]:
+        """
+        Repairs the search after recorded changes and returns the current route.
+
+        Returns:
+            Optional[List[int]]: The indices from the raft to the target, None if the
+                target can't be reached any more.
+        """
+        if self._changed:
+            changed, self._changed = self._changed, set()
+            for index in changed:
+                self._update_vertex(index)
+        self._compute_shortest_path()
+
+        if self._g.get(self.start_index, math.inf) == math.inf:
+            return None
+        graph = self._graph
+        path: List[int] = [self.start_index]
+        while path[-1] != self.target_index:
+            current = path[-1]
+            path.append(min(graph.neighbors(current), key=lambda neighbor: (self._g.get(neighbor, math.inf), neighbor)))
+        return path
+
+    def _compute_shortest_path(self) -> None:
+        g, rhs = self._g, self._rhs
+        start_index = self.start_index
+        while True:
+            top = self._top()
+            start_key = self._calculate_key(start_index)
+            if top is None or (top[0] >= start_key and rhs.get(start_index, math.inf) == g.get(start_index, math.inf)):
+                return
+            key, index = top
+            heapq.heappop(self._open_list)
+
+            new_key = self._calculate_key(index)
+            if key < new_key:
+                self._push(index, new_key)  # Stale because the raft moved on
+                continue
+            del self._queued_keys[index]
+            self.expanded_nodes += 1
+            if g.get(index, math.inf) > rhs.get(index, math.inf):
+                g[index] = rhs[index]
+            else:
+                g[index] = math.inf
+                self._update_vertex(index)
+            for source in self._graph.predecessors(index):
+                self._update_vertex(source)
+
+    def _update_vertex(self, index: int) -> None:
+        graph = self._graph
+        if index != self.target_index:
+            if index < graph.get_nodes_length() and graph.has_node(index):
+                self._rhs[index] = min((1 + self._g.get(neighbor, math.inf) for neighbor in graph.neighbors(index)), default=math.inf)
+            else:
+                self._rhs[index] = math.inf
+        self._queued_keys.pop(index, None)  # Its heap entry goes stale
+        if self._g.get(index, math.inf) != self._rhs.get(index, math.inf):
+            self._push(index)
+
+    def _top(self) -> Optional[Tuple[Key, int]]:
+        # Drop heap entries whose index was removed or requeued since
+        open_list = self._open_list
+        while open_list:
+            first, second, index = open_list[0]
+            if self._queued_keys.get(index) == (first, second):
+                return (first, second), index
+            heapq.heappop(open_list)
+        return None
+
+    def _push(self, index: int, key: Optional[Key] = None) -> None:
+        key = self._calculate_key(index) if key is None else key
+        self._queued_keys[index] = key
+        heapq.heappush(self._open_list, (key[0], key[1], index))
+
+    def _calculate_key(self, index: int) -> Key:
+        distance = min(self._g.get(index, math.inf), self._rhs.get(index, math.inf))
+        return distance + self._heuristic(self.start_index, index) + self._km, distance
+
+    def _heuristic(self, source: int, target: int) -> int:
+        xs, ys = self._graph.xs, self._graph.ys
+        return abs(xs[source] - xs[target]) + abs(ys[source] - ys[target])
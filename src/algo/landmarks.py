@@ -0,0 +1,298 @@
+import heapq
+from array import array
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from algo.compiled_graph import CompiledGraph
+
+# Distance of an index that can't reach, or can't be reached from, a landmark
+UNREACHABLE: int = -1
+# Index of a landmark slot left empty, on levels with fewer nodes than slots
+NO_LANDMARK: int = -1
+
+# Snapshot sections the tables are stored in
+LANDMARK_SECTIONS: Dict[str, str] = {
+    "landmarks": "q",
+    "landmarks.from": "i",
+    "landmarks.to": "i",
+}
+
+
+class LandmarkTables:
+    """
+    LandmarkTables holds the distance tables of the ALT (A*, landmarks, triangle
+    inequality) heuristic. Every level gets the same number of landmarks, chosen
+    far apart from each other. For every landmark L the tables hold d(L, v) and
+    d(v, L) for each index v of its level. The triangle inequality then bounds the
+    remaining cost of any index v to a target t from below:
+
+        d(v, t) >= max(d(L, t) - d(L, v), d(v, L) - d(t, L))
+
+    On directional lanes and aisles this is much tighter than the Manhattan
+    distance, which ignores the detours needed to find a cell to turn in.
+
+    Distance arrays are slot-major: entry slot * indices_length + v holds the
+    distance of v to the slot's landmark on v's level. Taking edges away only
+    lengthens distances, so the bounds stay valid under blockers and removals.
+    Levels where an edge was added are marked stale and fall back to Manhattan
+    until rebuilt.
+
+    Distances count moves. Routers that weigh moves by a cost model scale the
+    bounds by the cheapest move, which keeps them admissible.
+    """
+
+    def __init__(
+        self,
+        landmarks: Union[array, memoryview],
+        distances_from: Union[array, memoryview],
+        distances_to: Union[array, memoryview],
+        landmarks_per_level: int
+    ) -> None:
+        """
+        Initializes the tables from their arrays.
+
+        Args:
+            landmarks (Union[array, memoryview]): Landmark index of every (level, slot),
+                level-major, NO_LANDMARK for empty slots.
+            distances_from (Union[array, memoryview]): d(L, v) for every slot and index.
+            distances_to (Union[array, memoryview]): d(v, L) for every slot and index.
+            landmarks_per_level (int): Number of landmark slots per level.
+        """
+        self.landmarks = landmarks
+        self.distances_from = distances_from
+        self.distances_to = distances_to
+        self.landmarks_per_level = landmarks_per_level
+        self.indices_length: int = len(distances_from) // landmarks_per_level if landmarks_per_level else 0
+        self._stale_levels: Set[int] = set()
+
+    @classmethod
+    def build(cls, graph: CompiledGraph, level_nums: int, landmarks_per_level: int = 8) -> "LandmarkTables":
+        """
+        Chooses the landmarks of every level and computes their distance tables.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            level_nums (int): Number of levels of the map.
+            landmarks_per_level (int): Number of landmarks to choose on each level.
+
+        Returns:
+            LandmarkTables: The tables of every level.
+        """
+        indices_length = graph.get_nodes_length()
+        tables = cls(
+            landmarks=array('q', [NO_LANDMARK]) * (level_nums * landmarks_per_level),
+            distances_from=array('i', [UNREACHABLE]) * (indices_length * landmarks_per_level),
+            distances_to=array('i', [UNREACHABLE]) * (indices_length * landmarks_per_level),
+            landmarks_per_level=landmarks_per_level,
+        )
+        for level in range(level_nums):
+            tables.rebuild_level(graph, level)
+        return tables
+
+    @classmethod
+    def from_sections(cls, sections: Dict[str, Union[array, memoryview]], level_nums: int) -> Optional["LandmarkTables"]:
+        """
+        Loads the tables from map snapshot sections, if the snapshot holds them.
+
+        Args:
+            sections (Dict[str, Union[array, memoryview]]): The sections of a map snapshot.
+            level_nums (int): Number of levels of the map.
+
+        Returns:
+            Optional[LandmarkTables]: The tables, None if the snapshot has none.
+        """
+        if not all(name in sections for name in LANDMARK_SECTIONS) or not level_nums:
+            return None
+        return cls(
+            landmarks=sections["landmarks"],
+            distances_from=sections["landmarks.from"],
+            distances_to=sections["landmarks.to"],
+            landmarks_per_level=len(sections["landmarks"]) // level_nums,
+        )
+
+    def get_sections(self) -> Dict[str, Union[array, memoryview]]:
+        """
+        Returns the arrays to store as map snapshot sections.
+        """
+        return {"landmarks": self.landmarks, "landmarks.from": self.distances_from, "landmarks.to": self.distances_to}
+
+    def rebuild_level(self, graph: CompiledGraph, level: int) -> None:
+        """
+        Chooses the landmarks of a level again and recomputes their tables, e.g.
+        during a quiet period after the level was marked stale.
+
+        Each landmark is the node farthest from the ones chosen before it, the first
+        one the farthest from an arbitrary node of the level.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            level (int): The level to rebuild.
+        """
+        self._fit(graph.get_nodes_length())
+        level_indices = [
+            index for index in range(graph.get_nodes_length()) if graph.zs[index] == level and graph.has_node(index)
+        ]
+        first_slot = level * self.landmarks_per_level
+        for slot in range(self.landmarks_per_level):
+            self.landmarks[first_slot + slot] = NO_LANDMARK
+            start = slot * self.indices_length
+            for index in level_indices:
+                self.distances_from[start + index] = self.distances_to[start + index] = UNREACHABLE
+        if not level_indices:
+            self._stale_levels.discard(level)
+            return
+
+        # Distance to the closest chosen landmark, seeded with distances from an arbitrary node
+        closest: Dict[int, int] = _breadth_first(graph.offsets, graph.targets, level_indices[0])
+        for slot in range(min(self.landmarks_per_level, len(level_indices))):
+            landmark = max(closest, key=lambda index: (closest[index], -index))
+            if slot and not closest[landmark]:
+                break  # Every node the landmarks reach is a landmark already
+            self.landmarks[first_slot + slot] = landmark
+            start = slot * self.indices_length
+
+            distances_from = _breadth_first(graph.offsets, graph.targets, landmark)
+            for index, distance in distances_from.items():
+                self.distances_from[start + index] = distance
+            graph.compile_reverse()
+            for index, distance in _breadth_first(graph.reverse_offsets, graph.reverse_targets, landmark).items():
+                self.distances_to[start + index] = distance
+
+            if slot == 0:
+                closest = distances_from
+            else:
+                for index, distance in distances_from.items():
+                    if distance < closest.get(index, distance + 1):
+                        closest[index] = distance
+        self._stale_levels.discard(level)
+
+    def invalidate(self, levels: Iterable[int]) -> None:
+        """
+        Marks levels whose graph gained edges as stale: their distances may have
+        shrunk below the tables, which would no longer be lower bounds.
+
+        Args:
+            levels (Iterable[int]): The levels that gained edges.
+        """
+        self._stale_levels.update(levels)
+
+    def is_usable(self, level: int) -> bool:
+        """
+        Checks whether the tables of a level hold landmarks and are not stale.
+        """
+        first_slot = level * self.landmarks_per_level
+        return (
+            level not in self._stale_levels
+            and 0 <= first_slot < len(self.landmarks)
+            and self.landmarks[first_slot] != NO_LANDMARK
+        )
+
+    def lower_bound_to(self, graph: CompiledGraph, target_index: int) -> Callable[[int], int]:
+        """
+        Returns a function bounding the distance from any index of the target's level
+        to the target from below, by the landmarks or the Manhattan distance.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            target_index (int): The index to bound distances to.
+
+        Returns:
+            Callable[[int], int]: The lower bound of d(v, target) for an index v.
+        """
+        return self._lower_bound(graph, target_index, to_index=True)
+
+    def lower_bound_from(self, graph: CompiledGraph, source_index: int) -> Callable[[int], int]:
+        """
+        Returns a function bounding the distance from the source to any index of its
+        level from below, by the landmarks or the Manhattan distance.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            source_index (int): The index to bound distances from.
+
+        Returns:
+            Callable[[int], int]: The lower bound of d(source, v) for an index v.
+        """
+        return self._lower_bound(graph, source_index, to_index=False)
+
+    def _lower_bound(self, graph: CompiledGraph, index: int, to_index: bool) -> Callable[[int], int]:
+        xs, ys = graph.xs, graph.ys
+        x, y = xs[index], ys[index]
+        indices_length = self.indices_length
+        distances_from, distances_to = self.distances_from, self.distances_to
+
+        # (slot offset, d(L, index), d(index, L)) of every landmark of the level
+        slots: List[Tuple[int, int, int]] = []
+        first_slot = graph.zs[index] * self.landmarks_per_level
+        if index < indices_length:
+            for slot in range(self.landmarks_per_level):
+                if self.landmarks[first_slot + slot] != NO_LANDMARK:
+                    start = slot * indices_length
+                    slots.append((start, distances_from[start + index], distances_to[start + index]))
+
+        def lower_bound(other: int) -> int:
+            bound = abs(xs[other] - x) + abs(ys[other] - y)
+            if other >= indices_length:
+                return bound
+            for start, from_landmark, to_landmark in slots:
+                other_from, other_to = distances_from[start + other], distances_to[start + other]
+                # d(other, index) >= d(L, index) - d(L, other) and >= d(other, L) - d(index, L)
+                if to_index:
+                    if from_landmark >= 0 and other_from >= 0 and from_landmark - other_from > bound:
+                        bound = from_landmark - other_from
+                    if to_landmark >= 0 and other_to >= 0 and other_to - to_landmark > bound:
+                        bound = other_to - to_landmark
+                # d(index, other) >= d(L, other) - d(L, index) and >= d(index, L) - d(other, L)
+                else:
+                    if from_landmark >= 0 and other_from >= 0 and other_from - from_landmark > bound:
+                        bound = other_from - from_landmark
+                    if to_landmark >= 0 and other_to >= 0 and to_landmark - other_to > bound:
+                        bound = to_landmark - other_to
+            return bound
+
+        return lower_bound
+
+    def _fit(self, indices_length: int) -> None:
+        # Re-lay the slot-major arrays when the graph grew, copying buffers that can't grow
+        if indices_length <= self.indices_length:
+            return
+        for name in ("distances_from", "distances_to"):
+            old = getattr(self, name)
+            new = array('i', [UNREACHABLE]) * (indices_length * self.landmarks_per_level)
+            for slot in range(self.landmarks_per_level):
+                new[slot * indices_length:slot * indices_length + self.indices_length] = array(
+                    'i', old[slot * self.indices_length:(slot + 1) * self.indices_length]
+                )
+            setattr(self, name, new)
+        self.landmarks = array('q', self.landmarks)
+        self.indices_length = indices_length
+
+
+def _breadth_first(offsets, targets, source: int) -> Dict[int, int]:
+    # Unit-cost distances from source over a CSR graph
+    distances: Dict[int, int] = {source: 0}
+    queue = deque([source])
+    while queue:
+        current = queue.popleft()
+        next_distance = distances[current] + 1
+        for neighbor in targets[offsets[current]:offsets[current + 1]]:
+            if neighbor not in distances:
+                distances[neighbor] = next_distance
+                queue.append(neighbor)
+    return distances
+
+
+def _dijkstra(offsets, targets, costs, source: int) -> Dict[int, int]:
+    # Distances from source over a CSR graph whose edge costs are in a parallel array
+    distances: Dict[int, int] = {source: 0}
+    open_list: List[Tuple[int, int]] = [(0, source)]
+    while open_list:
+        distance, current = heapq.heappop(open_list)
+        if distance > distances[current]:
+            continue  # Skip stale heap entries
+        for position in range(offsets[current], offsets[current + 1]):
+            neighbor, next_distance = targets[position], distance + costs[position]
+            if next_distance < distances.get(neighbor, next_distance + 1):
+                distances[neighbor] = next_distance
+                heapq.heappush(open_list, (next_distance, neighbor))
+    return distances
@@ -0,0 +1,163 @@
+import heapq
+from array import array
+from collections import deque
+from typing import Iterable, List, Set, Tuple
+
+from algo.compiled_graph import CompiledGraph
+from algo.landmarks import UNREACHABLE
+from algo.vtu_transfers import NO_VTU
+from algo_types.map_interfaces import MapNodeTypes
+from algo_types.grid_map_types import NODE_TYPE_CODES
+
+
+class NearestVTUField:
+    """
+    NearestVTUField assigns every index of a CompiledGraph the VTU it reaches
+    first and the number of moves to it, a Voronoi partition of each level
+    around its VTUs. It is built by one breadth-first search from all VTUs at
+    once over the reversed graph, so the closest VTU of any cell is an O(1)
+    lookup. Blocked VTUs can't be driven onto and are left out.
+
+    Map changes are repaired locally. Cells whose row changed, and the cells
+    whose distance relied on them, are reset; they then take the best distance
+    offered by their neighbours, and improvements spread to their predecessors.
+    """
+
+    def __init__(self, graph: CompiledGraph) -> None:
+        """
+        Initializes the field of a compiled graph.
+
+        Args:
+            graph (CompiledGraph): The graph to assign. Moves are assumed to stay on
+                their level, as they do for every registered direction protocol.
+        """
+        self._graph = graph
+        self._vtu_code: int = NODE_TYPE_CODES[MapNodeTypes.VTU.value]
+        self.nearest: array = array('q')
+        self.distances: array = array('i')
+        self.build()
+
+    def build(self) -> None:
+        """
+        Assigns every index from scratch.
+        """
+        graph = self._graph
+        graph.compile_reverse()
+        indices_length = graph.get_nodes_length()
+        self.nearest = array('q', [NO_VTU]) * indices_length
+        self.distances = array('i', [UNREACHABLE]) * indices_length
+        nearest, distances = self.nearest, self.distances
+        reverse_offsets, reverse_targets = graph.reverse_offsets, graph.reverse_targets
+
+        queue = deque(index for index in range(indices_length) if self._is_source(index))
+        for index in queue:
+            nearest[index], distances[index] = index, 0
+        while queue:
+            current = queue.popleft()
+            next_distance = distances[current] + 1
+            for source in reverse_targets[reverse_offsets[current]:reverse_offsets[current + 1]]:
+                if distances[source] == UNREACHABLE:
+                    nearest[source], distances[source] = nearest[current], next_distance
+                    queue.append(source)
+
+    def get(self, index: int) -> Tuple[int, int]:
+        """
+        Returns the closest VTU of an index and the number of moves to it.
+
+        Args:
+            index (int): The index to look up.
+
+        Returns:
+            Tuple[int, int]: The VTU index and distance, NO_VTU and UNREACHABLE if the
+                index reaches no VTU.
+        """
+        if index >= len(self.nearest):
+            return NO_VTU, UNREACHABLE
+        return self.nearest[index], self.distances[index]
+
+    def update(self, changed_coords: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Repairs the field after the graph was recompiled for the given coordinates.
+
+        Args:
+            changed_coords (Iterable[Tuple[int, int, int]]): The (x, y, z) coordinates
+                whose node was added, removed, retyped, blocked or unblocked.
+        """
+        graph = self._graph
+        graph.compile_reverse()
+        self._fit(graph.get_nodes_length())
+        offsets, targets = graph.offsets, graph.targets
+        reverse_offsets, reverse_targets = graph.reverse_offsets, graph.reverse_targets
+        nearest, distances = self.nearest, self.distances
+
+        # Cells whose row, type or blocked state may have changed
+        map = graph._map
+        all_directions = graph._get_all_directions(graph._get_directions_by_code())
+        changed: Set[int] = set()
+        for x, y, z in changed_coords:
+            for dx, dy, dz in ((0, 0, 0), *all_directions):
+                index = map.get_index_by_coords(x - dx, y - dy, z - dz)
+                if index is not None:
+                    changed.add(index)
+
+        # Reset the changed cells, then every cell left without a neighbour one step closer to its VTU
+        reset: Set[int] = set()
+        queue = deque(changed)
+        while queue:
+            current = queue.popleft()
+            if current in reset or (current not in changed and self._is_supported(current)):
+                continue
+            reset.add(current)
+            old_nearest, old_distance = nearest[current], distances[current]
+            nearest[current], distances[current] = NO_VTU, UNREACHABLE
+            if old_distance == UNREACHABLE:
+                continue
+            for source in reverse_targets[reverse_offsets[current]:reverse_offsets[current + 1]]:
+                if nearest[source] == old_nearest and distances[source] == old_distance + 1 and source not in reset:
+                    queue.append(source)
+
+        # Reset cells take the best offer of their neighbours; improvements spread backwards
+        open_list: List[Tuple[int, int]] = []
+        for current in reset:
+            if not graph.has_node(current):
+                continue
+            if self._is_source(current):
+                nearest[current], distances[current] = current, 0
+            else:
+                for target in targets[offsets[current]:offsets[current + 1]]:
+                    distance = distances[target]
+                    if distance != UNREACHABLE and (distances[current] == UNREACHABLE or distance + 1 < distances[current]):
+                        nearest[current], distances[current] = nearest[target], distance + 1
+            if distances[current] != UNREACHABLE:
+                heapq.heappush(open_list, (distances[current], current))
+        while open_list:
+            distance, current = heapq.heappop(open_list)
+            if distance != distances[current]:
+                continue  # Skip stale heap entries
+            for source in reverse_targets[reverse_offsets[current]:reverse_offsets[current + 1]]:
+                if distances[source] == UNREACHABLE or distance + 1 < distances[source]:
+                    nearest[source], distances[source] = nearest[current], distance + 1
+                    heapq.heappush(open_list, (distance + 1, source))
+
+    def _is_source(self, index: int) -> bool:
+        graph = self._graph
+        return graph.node_codes[index] == self._vtu_code and graph.has_node(index) and not graph._map.is_blocked(index)
+
+    def _is_supported(self, index: int) -> bool:
+        # Whether the index still has a neighbour one step closer to the same VTU
+        distance = self.distances[index]
+        if distance == UNREACHABLE or not self._graph.has_node(index):
+            return distance == UNREACHABLE
+        if distance == 0:
+            return self._is_source(index)
+        nearest, distances = self.nearest, self.distances
+        return any(
+            nearest[target] == nearest[index] and distances[target] == distance - 1
+            for target in self._graph.neighbors(index)
+        )
+
+    def _fit(self, indices_length: int) -> None:
+        # Indices the map added since the last update start without a VTU
+        if len(self.nearest) < indices_length:
+            self.nearest.extend(array('q', [NO_VTU]) * (indices_length - len(self.nearest)))
+            self.distances.extend(array('i', [UNREACHABLE]) * (indices_length - len(self.distances)))
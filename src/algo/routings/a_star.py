@@ -1,13 +1,23 @@
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Iterable, Set
 from base.routing_base import PathRoutingBase
 from algo.directions import RouteDirectionFactory
+from base.cost_base import CostModel
+from algo.compiled_graph import CompiledGraph, CompiledGraphArrays
+from algo.components import StronglyConnectedComponents
+from algo.landmarks import LandmarkTables, UNREACHABLE
+from algo.vtu_transfers import VTUTransferTables, NO_VTU
+from algo.nearest_vtu import NearestVTUField
+from algo.search_arena import SearchArena
+from algo.bucket_queue import BucketQueue
+from algo.target_trees import TargetTree, TargetTreeCache
 from algo.directions import (
     AisleDirections, 
     LaneDirections,
     ElevationDirections
 )
-from algo_types.map_types import Map, Node, Path
+from algo_types.map_types import Map, Node, Path, DistanceMatrix
 from algo_types.map_interfaces import MapNodeTypes
+from mapper.map_snapshot import MapSnapshot
 from algo_exceptions.route_exceptions import (
     PathNotFoundException, 
     VTUNotFound,
@@ -16,27 +26,80 @@ from algo_exceptions.route_exceptions import (
 
 import heapq
 import time 
+from array import array
 from collections import deque
 
+# Penalised costs of alternative route searches are kept in units this much finer than edge costs
+PENALTY_SCALE: int = 4
+
 class AstarRouting(PathRoutingBase):
     """
     AstarRouting is an implementation of the A* pathfinding algorithm.
     It calculates the optimal path from a start node to a target node on a map.
     The class utilizes different direction protocols for aisles and lanes,
-    and computes the shortest path based on a heuristic function.
+    and computes the shortest path based on a heuristic function. Moves are
+    weighed by a CostModel, compiled into the edge costs of the graph.
     """
 
-    def __init__(self, map: Map) -> None:
+    def __init__(
+        self,
+        map: Map,
+        compiled_graph_arrays: Optional[CompiledGraphArrays] = None,
+        bidirectional: bool = False,
+        landmark_tables: Optional[LandmarkTables] = None,
+        target_tree_capacity: int = 0,
+        cost_model: Optional[CostModel] = None
+    ) -> None:
         """
         Initializes the AstarRouting class with a provided map and sets up the
         direction registry using the factory pattern.
 
         Args:
             map (Map): The map on which the routing will be performed.
+            compiled_graph_arrays (Optional[CompiledGraphArrays]): A graph compiled
+                earlier for this map (e.g. from a map snapshot), used instead of
+                compiling it again.
+            bidirectional (bool): Whether same-level searches run from both ends by
+                default. It can be overridden per call.
+            landmark_tables (Optional[LandmarkTables]): ALT tables built for this map.
+                Searches use them as heuristic on every level they are usable for.
+            target_tree_capacity (int): Most hot targets, e.g. VTUs and pick stations, to
+                keep a reverse shortest-path tree for, see TargetTreeCache. The trees
+                are off by default.
+            cost_model (Optional[CostModel]): The cost of every move, e.g. its travel
+                time. Every move costs 1 if not given.
         """
         self._map = map
+        self.bidirectional = bidirectional
+        self.landmark_tables = landmark_tables
         self._direction_registry_factory = RouteDirectionFactory()
+        self._compiled_graph: Optional[CompiledGraph] = None
+        self._compiled_graph_arrays = compiled_graph_arrays
+        self._cost_model = cost_model
+        self._components: Optional[StronglyConnectedComponents] = None
+        self._vtu_transfers: Optional[VTUTransferTables] = None
+        self._vtu_field: Optional[NearestVTUField] = None
+        self._search_arena = SearchArena()
+        self._target_trees: Optional[TargetTreeCache] = None
+        self._target_tree_capacity = target_tree_capacity
         self.initialize_direction_registry()
+        self._map.add_change_listener(self.recompile)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: MapSnapshot) -> "AstarRouting":
+        """
+        Creates a router for a loaded map snapshot, using the compiled graph and
+        the landmark tables stored in it when there are any.
+
+        Args:
+            snapshot (MapSnapshot): The snapshot returned by load_map_snapshot.
+
+        Returns:
+            AstarRouting: The router of the snapshot's map.
+        """
+        router = cls(snapshot.map, snapshot.compiled_graph_arrays)
+        router.landmark_tables = snapshot.landmark_tables
+        return router
 
     def initialize_direction_registry(self) -> None:
         """
@@ -51,7 +114,10 @@ class AstarRouting(PathRoutingBase):
     def heuristic(self, current_node: Node, target_node: Node) -> int:
         """
         Computes the heuristic value for the A* algorithm. The heuristic is the 
-        Manhattan distance between the current node and the target node.
+        Manhattan distance between the current node and the target node, each
+        axis weighed by its cheapest move and levels by the VTU transfer cost,
+        raised to the landmark bound when landmark tables are usable for the level.
+        It never exceeds the cost of a route under the router's cost model.
 
         Args:
             current_node (Node): The node being evaluated.
@@ -60,43 +126,156 @@ class AstarRouting(PathRoutingBase):
         Returns:
             int: The heuristic distance from the current node to the target node.
         """
-        return abs(current_node.coords.x - target_node.coords.x) + abs(current_node.coords.y - target_node.coords.y) + abs(current_node.coords.z - target_node.coords.z)
+        graph = self.get_compiled_graph()
+        manhattan = (
+            abs(current_node.coords.x - target_node.coords.x) * graph.min_x_cost
+            + abs(current_node.coords.y - target_node.coords.y) * graph.min_y_cost
+            + graph.get_transfer_cost(abs(current_node.coords.z - target_node.coords.z))
+        )
+        if current_node.coords.z != target_node.coords.z or not self._has_landmarks(target_node.coords.z):
+            return manhattan
+        moves = self.landmark_tables.lower_bound_to(graph, graph.get_index(target_node))(graph.get_index(current_node))
+        return max(manhattan, moves * graph.min_cost)
+
+    def get_compiled_graph(self) -> CompiledGraph:
+        """
+        Returns the CSR adjacency graph of the map, compiling it from the
+        registered direction protocols on first use.
 
-    def get_neighbors(self, node: Node) -> List[Node]:
+        Returns:
+            CompiledGraph: The compiled graph of the map.
         """
-        Retrieves the neighboring nodes of a given node based on the registered
-        direction protocol. The direction can vary depending on the node type 
-        (Aisle or Lane).
+        if self._compiled_graph is None:
+            self._compiled_graph = CompiledGraph(
+                self._map, self._direction_registry_factory, self._compiled_graph_arrays, self._cost_model
+            )
+            self._compiled_graph_arrays = None
+        return self._compiled_graph
+
+    def build_landmarks(self, landmarks_per_level: int = 8) -> LandmarkTables:
+        """
+        Chooses landmarks on every level and precomputes their distance tables,
+        which searches then use as heuristic. Store them with save_map_snapshot to
+        skip this step when the map is loaded again.
 
         Args:
-            node (Node): The node for which to find neighbors.
+            landmarks_per_level (int): Number of landmarks per level.
 
         Returns:
-            List[Node]: A list of neighboring nodes.
+            LandmarkTables: The landmark tables of the map.
         """
-        neighbors: List[Node] = []
+        self.landmark_tables = LandmarkTables.build(self.get_compiled_graph(), self._map.level_nums, landmarks_per_level)
+        return self.landmark_tables
 
-        direction_protocol = self._direction_registry_factory.get_direction_protocol(node.node_type)
-        directions = direction_protocol.get_directions()
+    def get_components(self) -> StronglyConnectedComponents:
+        """
+        Returns the strongly connected components of the compiled graph, used to
+        reject unreachable targets without a search.
+
+        Returns:
+            StronglyConnectedComponents: The component labels of the compiled graph.
+        """
+        if self._components is None:
+            self._components = StronglyConnectedComponents(self.get_compiled_graph())
+        return self._components
 
-        # Calculate neighbors based on valid movement directions
-        for direction in directions:
+    def get_vtu_transfers(self, levels: Iterable[int] = ()) -> VTUTransferTables:
+        """
+        Returns the VTU transfer tables of the map, computing them on first use
+        and recomputing the given levels if they changed since.
+
+        Args:
+            levels (Iterable[int]): The levels the caller is about to use.
 
-            neighbor_coords: Tuple[int, int] = (node.coords.x + direction[0], node.coords.y + direction[1], node.coords.z + direction[2])
-            if 0 <= neighbor_coords[0] < self._map.lanes_nums and 0 <= neighbor_coords[1] < self._map.aisle_nums and neighbor_coords[2] < self._map.level_nums :
-                neighbor: Node = self._map.get_node_by_coords(neighbor_coords[0], neighbor_coords[1], neighbor_coords[2])
-                if neighbor:
-                    neighbors.append(neighbor)
-        return neighbors
+        Returns:
+            VTUTransferTables: The distance tables of every VTU.
+        """
+        graph = self.get_compiled_graph()
+        if self._vtu_transfers is None:
+            self._vtu_transfers = VTUTransferTables.build(graph, self._map.level_nums)
+        for level in levels:
+            if self._vtu_transfers.is_stale(level):
+                self._vtu_transfers.rebuild_level(graph, level)
+        return self._vtu_transfers
+
+    def get_vtu_field(self) -> NearestVTUField:
+        """
+        Returns the closest VTU of every cell, computed on first use and then
+        repaired along with the compiled graph.
+
+        Returns:
+            NearestVTUField: The nearest-VTU field of the map.
+        """
+        if self._vtu_field is None:
+            self._vtu_field = NearestVTUField(self.get_compiled_graph())
+        return self._vtu_field
 
-    def find_path_on_same_level(self, current_node: Node, target_node: Node) -> Path:
+    def get_target_trees(self) -> TargetTreeCache:
+        """
+        Returns the cache of reverse shortest-path trees of hot targets, created
+        on first use and invalidated along with the compiled graph.
+
+        Returns:
+            TargetTreeCache: The target trees of the map.
+        """
+        if self._target_trees is None:
+            self._target_trees = TargetTreeCache(self.get_compiled_graph(), self._target_tree_capacity)
+        return self._target_trees
+
+    def recompile(self, changed_coords: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Incrementally recompiles the graph after the map layout changed at the
+        given coordinates. It is registered as a change listener on the map, and
+        does nothing if the graph hasn't been compiled yet, unless it is pending
+        from precompiled arrays that wouldn't show the change.
+
+        Args:
+            changed_coords (Iterable[Tuple[int, int, int]]): The (x, y, z) coordinates
+                whose node was added, removed, retyped, blocked or unblocked.
+        """
+        if self._compiled_graph is None and self._compiled_graph_arrays is not None:
+            self.get_compiled_graph()
+        if self._compiled_graph is not None:
+            changed_coords = list(changed_coords)
+            if self._compiled_graph.recompile(changed_coords) and self.landmark_tables is not None:
+                # Added edges can shorten distances below the landmark tables
+                self.landmark_tables.invalidate({z for _, _, z in changed_coords})
+            if self._components is not None:
+                self._components.invalidate(changed_coords)
+            if self._vtu_transfers is not None:
+                self._vtu_transfers.invalidate({z for _, _, z in changed_coords})
+            if self._vtu_field is not None:
+                self._vtu_field.update(changed_coords)
+            if self._target_trees is not None:
+                self._target_trees.invalidate({z for _, _, z in changed_coords})
+
+    def get_neighbors(self, node: Node) -> List[Node]:
+        """
+        Retrieves the neighboring nodes of a given node from the compiled graph.
+        The direction can vary depending on the node type (Aisle or Lane).
+
+        Args:
+            node (Node): The node for which to find neighbors.
+
+        Returns:
+            List[Node]: A list of neighboring nodes.
+        """
+        graph = self.get_compiled_graph()
+        return [graph.get_node(neighbor) for neighbor in graph.neighbors(graph.get_index(node))]
+
+    def find_path_on_same_level(self, current_node: Node, target_node: Node, bidirectional: Optional[bool] = None) -> Path:
         """
         Implements the A* pathfinding algorithm to find the optimal path from 
-        the current node to the target node.
+        the current node to the target node. The search runs over the dense
+        indices of the compiled graph, keeping its per-index state in the
+        router's SearchArena. Targets queried often get a reverse shortest-path
+        tree, and routes to them follow its next hops without any search.
 
         Args:
             current_node (Node): The starting node.
             target_node (Node): The goal node.
+            bidirectional (Optional[bool]): Whether to search from both ends, see
+                _find_path_bidirectional. Defaults to the mode of the instance.
 
         Returns:
             List[Node]: The optimal path from the current node to the target node.
@@ -104,90 +283,567 @@ class AstarRouting(PathRoutingBase):
         Raises:
             PathNotFoundException: If no path exists between the start and target nodes.
         """
-        open_list: List[Tuple[int, Node]] = []  # Priority queue (min-heap) to track nodes to evaluate
-        closed_list = set()  # Set of nodes that have already been evaluated
-
-        node_relations: Dict[str, Node] = {}  # Dictionary to store node relationships (for path reconstruction)
-        g_score: Dict[str, int] = {current_node.id: 0}  # Cost from start node to each node
-
-        total_compute_time: float = 0.0
-
         if current_node.coords.z != target_node.coords.z: 
             raise NotSameLevelRoutingException("you are using a method that restricts routing on the same level.")
 
-        heapq.heappush(open_list, (0, current_node))  # Push starting node to open list
-        
+        graph = self.get_compiled_graph()
+        offsets, targets, costs, xs, ys = graph.offsets, graph.targets, graph.costs, graph.xs, graph.ys
+        x_cost, y_cost, min_cost = graph.min_x_cost, graph.min_y_cost, graph.min_cost
+        start_index: int = graph.get_index(current_node)
+        target_index: int = graph.get_index(target_node)
+        target_x, target_y = target_node.coords.x, target_node.coords.y
+
+        # Targets in a component the start can't reach are rejected without a search
+        components = self.get_components()
+        if components.can_reach(start_index, target_index) is False:
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+        labels = components.labels
+        target_label = labels[target_index]
+
         start_time_compute: float = time.perf_counter()
+        tree = self.get_target_trees().lookup(target_index)
+        if tree is not None:
+            path_indices = tree.get_route(start_index)
+            if path_indices is None:
+                raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+            return Path(
+                nodes=[graph.get_node(index) for index in path_indices],
+                computation_time=time.perf_counter() - start_time_compute,
+                expanded_nodes=0
+            )
+
+        if self.bidirectional if bidirectional is None else bidirectional:
+            return self._find_path_bidirectional(start_index, target_index, current_node, target_node)
+
+        lower_bound = self.landmark_tables.lower_bound_to(graph, target_index) if self._has_landmarks(target_node.coords.z) else None
+
+        # Per-index state lives in the router's arena; entries of earlier queries carry older generations
+        arena = self._search_arena
+        generation = arena.begin(graph.get_nodes_length())
+        g_scores, parents, reached, closed = arena.g_scores, arena.parents, arena.reached, arena.closed
+        open_list = arena.queue  # Indices to evaluate by f-score, higher g-score first on ties
+        expanded_nodes: int = 0
+
+        reached[start_index], g_scores[start_index] = generation, 0
+        open_list.push(0, 0, start_index)  # Push starting node to open list
+
         while open_list:
-            _, current_node = heapq.heappop(open_list)  # Pop node with lowest f-score
+            _, _, current_index = open_list.pop()  # Pop index with lowest f-score
 
             # Check if we have reached the target node
-            if current_node.id == target_node.id:
-                end_time_compute: float = time.perf_counter()
-                total_compute_time = end_time_compute - start_time_compute
-                constructed_path: List[Node] = self.reconstruct_path(node_relations, current_node)
+            if current_index == target_index:
+                path_indices: List[int] = [current_index]
+                while path_indices[-1] != start_index:
+                    path_indices.append(parents[path_indices[-1]])
                 return Path(
-                    nodes=constructed_path,
-                    computation_time=total_compute_time
+                    nodes=[graph.get_node(index) for index in reversed(path_indices)],
+                    computation_time=time.perf_counter() - start_time_compute,
+                    expanded_nodes=expanded_nodes
                 )
 
-            closed_list.add(current_node.id)  # Mark current node as evaluated
+            if closed[current_index] == generation:
+                continue  # Skip stale queue entries
+            closed[current_index] = generation  # Mark current node as evaluated
+            expanded_nodes += 1
 
-            # Explore neighbors
-            for neighbor in self.get_neighbors(current_node):
-                if neighbor.id in closed_list:
-                    continue  # Skip already evaluated nodes
+            g_score = g_scores[current_index]
 
-                tentative_g_score = g_score[current_node.id] + 1  # Cost to reach neighbor
+            # Explore neighbors, each move weighed by its compiled edge cost
+            for position in range(offsets[current_index], offsets[current_index + 1]):
+                neighbor = targets[position]
+                if closed[neighbor] == generation or labels[neighbor] < target_label:
+                    continue  # Skip evaluated nodes and components that can't lead to the target
 
                 # Update g-score if this path is better or not explored
-                if  neighbor.id not in g_score or tentative_g_score < g_score[neighbor.id]:
-                    node_relations[neighbor.id] = current_node
-                    g_score[neighbor.id] = tentative_g_score
-                    f_score: int = tentative_g_score + self.heuristic(neighbor, target_node)
-                    heapq.heappush(open_list, (f_score, neighbor))  # Add neighbor to open list
+                tentative_g_score = g_score + costs[position]
+                if reached[neighbor] != generation or tentative_g_score < g_scores[neighbor]:
+                    reached[neighbor], g_scores[neighbor], parents[neighbor] = generation, tentative_g_score, current_index
+                    f_score: int = tentative_g_score + abs(xs[neighbor] - target_x) * x_cost + abs(ys[neighbor] - target_y) * y_cost
+                    if lower_bound is not None:
+                        f_score = max(f_score, tentative_g_score + lower_bound(neighbor) * min_cost)
+                    open_list.push(f_score, tentative_g_score, neighbor)  # Add neighbor to open list
 
         # If no path found, raise an exception
         raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
     
-    def find_path(self, current_node: Node, target_node: Node) -> List[Node]:
-        return super().find_path(current_node, target_node)
-
-    def find_closest_vtu(self, start_node: Node) -> Node: 
-        visited = set() 
-        queue = deque([start_node])
-
-        while queue: 
-            current_node = queue.popleft()
-            if current_node.node_type == MapNodeTypes.VTU.value: 
-                return current_node
-            
-            visited.add(current_node.id)
-
-            neighbors = self.get_neighbors(current_node)
-            for neighbor in neighbors: 
-                if neighbor.id not in visited and neighbor not in queue: 
-                    queue.append(neighbor)
-        
-        return VTUNotFound(f"No VTU found near the current node")
+    def _find_path_bidirectional(self, start_index: int, target_index: int, current_node: Node, target_node: Node) -> Path:
+        """
+        Bidirectional A*: a forward search from the start over the compiled graph
+        and a backward search from the target over the reversed graph. Both use the
+        average potential p(v) = (h_target(v) - h_start(v)) / 2 of the Manhattan
+        or landmark bounds (negated for the backward side), which keeps the two searches
+        consistent with each other. Keys are doubled to stay integers. The side with
+        the smaller open list expands next, and every node reached by both sides
+        updates the best meeting cost mu. Once the smallest forward and backward
+        keys sum to at least 2 * mu, no shorter path can exist and the search stops.
+
+        Returns:
+            Path: The optimal path, the same length as the one-directional search finds.
+
+        Raises:
+            PathNotFoundException: If no path exists between the start and target nodes.
+        """
+        graph = self.get_compiled_graph()
+        graph.compile_reverse()
+        offsets, targets, costs, xs, ys = graph.offsets, graph.targets, graph.costs, graph.xs, graph.ys
+        reverse_offsets, reverse_targets, reverse_costs = graph.reverse_offsets, graph.reverse_targets, graph.reverse_costs
+        x_cost, y_cost, min_cost = graph.min_x_cost, graph.min_y_cost, graph.min_cost
+        labels = self.get_components().labels
+        start_label, target_label = labels[start_index], labels[target_index]
+        start_x, start_y = current_node.coords.x, current_node.coords.y
+        target_x, target_y = target_node.coords.x, target_node.coords.y
+        if self._has_landmarks(target_node.coords.z):
+            to_target_moves = self.landmark_tables.lower_bound_to(graph, target_index)
+            from_start_moves = self.landmark_tables.lower_bound_from(graph, start_index)
+            to_target = lambda index: max(
+                abs(xs[index] - target_x) * x_cost + abs(ys[index] - target_y) * y_cost, to_target_moves(index) * min_cost
+            )
+            from_start = lambda index: max(
+                abs(xs[index] - start_x) * x_cost + abs(ys[index] - start_y) * y_cost, from_start_moves(index) * min_cost
+            )
+        else:
+            to_target = lambda index: abs(xs[index] - target_x) * x_cost + abs(ys[index] - target_y) * y_cost
+            from_start = lambda index: abs(xs[index] - start_x) * x_cost + abs(ys[index] - start_y) * y_cost
+
+        forward_open: List[Tuple[int, int]] = [(0, start_index)]
+        backward_open: List[Tuple[int, int]] = [(0, target_index)]
+        forward_closed, backward_closed = set(), set()
+        forward_relations: Dict[int, int] = {}  # Parent index of each index reached from the start
+        backward_relations: Dict[int, int] = {}  # Next index towards the target of each index reached from it
+        forward_g_score: Dict[int, int] = {start_index: 0}
+        backward_g_score: Dict[int, int] = {target_index: 0}
+
+        best_cost: float = 0 if start_index == target_index else float('inf')
+        meeting_index: int = start_index
+
+        start_time_compute: float = time.perf_counter()
+        while forward_open and backward_open:
+            if forward_open[0][0] + backward_open[0][0] >= 2 * best_cost:
+                break
+
+            # Expand the side with less work queued, pruning components that can't be on a path
+            if len(forward_open) <= len(backward_open):
+                _, current_index = heapq.heappop(forward_open)
+                if current_index in forward_closed:
+                    continue  # Skip stale heap entries
+                forward_closed.add(current_index)
+                for position in range(offsets[current_index], offsets[current_index + 1]):
+                    neighbor = targets[position]
+                    if neighbor in forward_closed or labels[neighbor] < target_label:
+                        continue
+                    tentative_g_score = forward_g_score[current_index] + costs[position]
+                    if tentative_g_score < forward_g_score.get(neighbor, tentative_g_score + 1):
+                        forward_relations[neighbor] = current_index
+                        forward_g_score[neighbor] = tentative_g_score
+                        potential: int = to_target(neighbor) - from_start(neighbor)
+                        heapq.heappush(forward_open, (2 * tentative_g_score + potential, neighbor))
+                        if neighbor in backward_g_score and tentative_g_score + backward_g_score[neighbor] < best_cost:
+                            best_cost = tentative_g_score + backward_g_score[neighbor]
+                            meeting_index = neighbor
+            else:
+                _, current_index = heapq.heappop(backward_open)
+                if current_index in backward_closed:
+                    continue
+                backward_closed.add(current_index)
+                for position in range(reverse_offsets[current_index], reverse_offsets[current_index + 1]):
+                    neighbor = reverse_targets[position]
+                    if neighbor in backward_closed or labels[neighbor] > start_label:
+                        continue
+                    tentative_g_score = backward_g_score[current_index] + reverse_costs[position]
+                    if tentative_g_score < backward_g_score.get(neighbor, tentative_g_score + 1):
+                        backward_relations[neighbor] = current_index
+                        backward_g_score[neighbor] = tentative_g_score
+                        potential = from_start(neighbor) - to_target(neighbor)
+                        heapq.heappush(backward_open, (2 * tentative_g_score + potential, neighbor))
+                        if neighbor in forward_g_score and tentative_g_score + forward_g_score[neighbor] < best_cost:
+                            best_cost = tentative_g_score + forward_g_score[neighbor]
+                            meeting_index = neighbor
+
+        if best_cost == float('inf'):
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+
+        # Join the start half and the target half at the meeting index
+        path_indices: List[int] = [meeting_index]
+        while path_indices[-1] in backward_relations:
+            path_indices.append(backward_relations[path_indices[-1]])
+        constructed_path: List[Node] = self.reconstruct_path(forward_relations, meeting_index)
+        constructed_path.extend(graph.get_node(index) for index in path_indices[1:])
+        return Path(
+            nodes=constructed_path,
+            computation_time=time.perf_counter() - start_time_compute,
+            expanded_nodes=len(forward_closed) + len(backward_closed)
+        )
+
+    def find_alternative_paths(
+        self,
+        current_node: Node,
+        target_node: Node,
+        k: int = 3,
+        min_dissimilarity: float = 0.3,
+        max_stretch: float = 1.5,
+        penalty: float = 0.25
+    ) -> List[Path]:
+        """
+        Finds up to k good routes between two nodes on the same level that differ
+        from each other, e.g. to spread rafts over the aisles. The first one is
+        the optimal route, read off the target's reverse shortest-path tree. Each
+        further search raises the cost of the moves of every route found so far
+        by the penalty, so it is pushed onto other lanes and aisles, and its
+        route is kept if it is different enough from all kept routes.
+
+        The tree's exact distances are the heuristic of every further search
+        (penalties only make moves dearer, so they stay admissible), which
+        steers it straight back onto unpenalised moves. Indices that can't reach
+        the target, or that can't be on a route within max_stretch of the best,
+        are never expanded. The searches are ordered by penalised cost but this
+        bound is checked on the true, unpenalised cost of the route so far plus
+        the exact distance left, so a route within max_stretch is never pruned for
+        its penalties. The tree is cached like those of hot targets, if the router
+        keeps any.
+
+        Args:
+            current_node (Node): The starting node.
+            target_node (Node): The goal node.
+            k (int): Most routes to return.
+            min_dissimilarity (float): Least share of a route's moves that no kept
+                route makes, for the route to be kept.
+            max_stretch (float): Most a route may cost, as a multiple of the best route's cost.
+            penalty (float): Share of its cost every move of a found route is raised by.
+
+        Returns:
+            List[Path]: The routes, cheapest first, without repeated nodes. expanded_nodes
+                counts the indices the search of each route expanded.
+
+        Raises:
+            NotSameLevelRoutingException: If the nodes are on different levels.
+            ValueError: If k or max_stretch is below 1, or min_dissimilarity isn't
+                between 0 and 1.
+            PathNotFoundException: If no path exists between the start and target nodes.
+        """
+        if current_node.coords.z != target_node.coords.z:
+            raise NotSameLevelRoutingException("you are using a method that restricts routing on the same level.")
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        if max_stretch < 1:
+            raise ValueError(f"max_stretch must be at least 1, got {max_stretch}")
+        if not 0 <= min_dissimilarity <= 1:
+            raise ValueError(f"min_dissimilarity must be between 0 and 1, got {min_dissimilarity}")
+
+        start_time_compute: float = time.perf_counter()
+        graph = self.get_compiled_graph()
+        start_index: int = graph.get_index(current_node)
+        target_index: int = graph.get_index(target_node)
+        tree = self.get_target_trees().build(target_index)
+        best_indices = tree.get_route(start_index)
+        if best_indices is None:
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+
+        best_cost = tree.distance_to_target(start_index)
+        paths: List[Tuple[int, Path]] = [(best_cost, Path(
+            nodes=[graph.get_node(index) for index in best_indices],
+            computation_time=time.perf_counter() - start_time_compute,
+            expanded_nodes=0
+        ))]
+        cost_limit = int(best_cost * max_stretch)
+        kept_moves: List[Set[Tuple[int, int]]] = [set(zip(best_indices, best_indices[1:]))]
+        penalties: Dict[int, int] = {}  # Extra cost by edge position
+        self._penalize(graph, best_indices, penalties, penalty)
+
+        # A search may find a route too close to a kept one; it is penalised too and the next search moves on
+        for _ in range(3 * (k - 1)):
+            if len(paths) >= k:
+                break
+            start_time_compute = time.perf_counter()
+            found = self._find_penalized_path(graph, start_index, target_index, tree, penalties, cost_limit)
+            if found is None:
+                break
+            indices, cost, expanded_nodes = found
+            self._penalize(graph, indices, penalties, penalty)
+            moves = set(zip(indices, indices[1:]))
+            if moves and all(len(moves - kept) >= min_dissimilarity * len(moves) for kept in kept_moves):
+                kept_moves.append(moves)
+                paths.append((cost, Path(
+                    nodes=[graph.get_node(index) for index in indices],
+                    computation_time=time.perf_counter() - start_time_compute,
+                    expanded_nodes=expanded_nodes
+                )))
+        paths.sort(key=lambda cost_and_path: cost_and_path[0])
+        return [path for _, path in paths]
+
+    def find_path(self, current_node: Node, target_node: Node) -> Path:
+        """
+        Finds the optimal path from the current node to the target node on any
+        level. Across levels the raft drives to a VTU, rides its shaft to the
+        target level and drives on from the shaft's VTU there. Only shafts with
+        an unblocked VTU on every level in between can be ridden. Every shaft is
+        priced from the VTU transfer tables, the cheapest one is taken and both
+        legs are read off the tables, so no search runs at all.
 
-    def reconstruct_path(self, node_relations: Dict[Node, Node], current_node: Node) -> List[Node]:
+        Args:
+            current_node (Node): The starting node.
+            target_node (Node): The goal node.
+
+        Returns:
+            Path: The optimal path, the shaft's VTUs on the levels in between
+                included. expanded_nodes counts the shafts priced.
+
+        Raises:
+            PathNotFoundException: If no VTU connects the start to the target.
+        """
+        start_level, target_level = current_node.coords.z, target_node.coords.z
+        if start_level == target_level:
+            return self.find_path_on_same_level(current_node, target_node)
+
+        start_time_compute: float = time.perf_counter()
+        graph = self.get_compiled_graph()
+        transfers = self.get_vtu_transfers((start_level, target_level))
+        start_index: int = graph.get_index(current_node)
+        target_index: int = graph.get_index(target_node)
+        xs, ys = graph.xs, graph.ys
+
+        shafts = self._get_shafts(transfers, start_level, target_level)
+        best: Optional[Tuple[int, int, int]] = None  # (cost, entry slot, exit slot)
+        for slot, exit_slot in shafts:
+            to_vtu, from_vtu = transfers.distance_to(slot, start_index), transfers.distance_from(exit_slot, target_index)
+            if to_vtu == UNREACHABLE or from_vtu == UNREACHABLE:
+                continue
+            if best is None or to_vtu + from_vtu < best[0]:
+                best = (to_vtu + from_vtu, slot, exit_slot)
+
+        if best is None:
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+
+        _, slot, exit_slot = best
+        entry_leg = transfers.walk_to(graph, slot, start_index)
+        exit_leg = transfers.walk_from(graph, exit_slot, target_index)
+        x, y = xs[entry_leg[-1]], ys[entry_leg[-1]]
+        step = 1 if target_level > start_level else -1
+        shaft = [self._map.get_node_by_coords(x, y, z) for z in range(start_level + step, target_level, step)]
+        return Path(
+            nodes=[graph.get_node(index) for index in entry_leg] + shaft + [graph.get_node(index) for index in exit_leg],
+            computation_time=time.perf_counter() - start_time_compute,
+            expanded_nodes=len(shafts)
+        )
+
+    def distance_matrix(self, sources: List[Node], targets: List[Node]) -> DistanceMatrix:
+        """
+        Computes the distance from every source to every target, e.g. to assign
+        idle rafts to open tasks. Each source runs one search (breadth-first on
+        unit-cost graphs, Dijkstra's otherwise) that stops once it reached all
+        targets on its level; targets on other levels are priced from the VTU
+        transfer tables plus the cost model's transfer cost of riding the shaft.
+        Paths are built only for the pairs asked for, by find_path, which picks
+        the same shaft but reports no cost, so a path doesn't show the ride.
+
+        Args:
+            sources (List[Node]): The nodes to measure from.
+            targets (List[Node]): The nodes to measure to.
+
+        Returns:
+            DistanceMatrix: The distances, row-major by source.
+        """
+        graph = self.get_compiled_graph()
+        components = self.get_components()
+        source_indices = [graph.get_index(node) for node in sources]
+        target_indices = [graph.get_index(node) for node in targets]
+        columns_by_index: Dict[int, List[int]] = {}
+        for column, index in enumerate(target_indices):
+            columns_by_index.setdefault(index, []).append(column)
+        target_levels = {node.coords.z for node in targets}
+        width = len(targets)
+        distances = array('i', [UNREACHABLE]) * (len(sources) * width)
+
+        for row, (source_node, source_index) in enumerate(zip(sources, source_indices)):
+            level = source_node.coords.z
+            first = row * width
+
+            # Targets on the source's level: one search for all of them
+            remaining = {
+                index for index in columns_by_index
+                if graph.zs[index] == level and components.can_reach(source_index, index) is not False
+            }
+            found = self._search_targets(graph, source_index, remaining)
+            for index, columns in columns_by_index.items():
+                if graph.zs[index] == level and index in found:
+                    for column in columns:
+                        distances[first + column] = found[index]
+
+            # Targets on other levels: the cheapest shaft by table lookups
+            for target_level in target_levels - {level}:
+                transfers = self.get_vtu_transfers((level, target_level))
+                entries = [
+                    (exit_slot, to_vtu)
+                    for slot, exit_slot in self._get_shafts(transfers, level, target_level)
+                    if (to_vtu := transfers.distance_to(slot, source_index)) != UNREACHABLE
+                ]
+                for column, (target_node, target_index) in enumerate(zip(targets, target_indices)):
+                    if target_node.coords.z != target_level:
+                        continue
+                    costs = [
+                        to_vtu + from_vtu
+                        for exit_slot, to_vtu in entries
+                        if (from_vtu := transfers.distance_from(exit_slot, target_index)) != UNREACHABLE
+                    ]
+                    if costs:
+                        distances[first + column] = min(costs) + graph.get_transfer_cost(abs(target_level - level))
+
+        return DistanceMatrix(sources=sources, targets=targets, distances=distances, find_path=self.find_path)
+
+    def _search_targets(self, graph: CompiledGraph, source_index: int, remaining: Set[int]) -> Dict[int, int]:
+        # Distances from the source to everything settled before the last of the remaining targets
+        offsets, targets = graph.offsets, graph.targets
+        found: Dict[int, int] = {source_index: 0}
+        if graph.is_unit_cost:
+            remaining.discard(source_index)
+            queue = deque([source_index])
+            while queue and remaining:
+                current = queue.popleft()
+                next_distance = found[current] + 1
+                for neighbor in targets[offsets[current]:offsets[current + 1]]:
+                    if neighbor not in found:
+                        found[neighbor] = next_distance
+                        queue.append(neighbor)
+                        remaining.discard(neighbor)
+            return found
+
+        costs = graph.costs
+        settled: Dict[int, int] = {}
+        open_list: List[Tuple[int, int]] = [(0, source_index)]
+        while open_list and remaining:
+            distance, current = heapq.heappop(open_list)
+            if current in settled:
+                continue  # Skip stale heap entries
+            settled[current] = distance
+            remaining.discard(current)
+            for position in range(offsets[current], offsets[current + 1]):
+                neighbor, next_distance = targets[position], distance + costs[position]
+                if next_distance < found.get(neighbor, next_distance + 1):
+                    found[neighbor] = next_distance
+                    heapq.heappush(open_list, (next_distance, neighbor))
+        return settled
+
+    def find_closest_vtu(self, start_node: Node) -> Node:
+        """
+        Finds the VTU the start node reaches in the fewest moves on its level,
+        looked up in the nearest-VTU field.
+
+        Args:
+            start_node (Node): The node to start from.
+
+        Returns:
+            Node: The closest VTU.
+
+        Raises:
+            VTUNotFound: If no VTU can be reached from the start node.
+        """
+        graph = self.get_compiled_graph()
+        vtu_index, _ = self.get_vtu_field().get(graph.get_index(start_node))
+        if vtu_index == NO_VTU:
+            raise VTUNotFound(f"No VTU found near the current node")
+        return graph.get_node(vtu_index)
+
+    def _get_shafts(self, transfers: VTUTransferTables, start_level: int, target_level: int) -> List[Tuple[int, int]]:
+        # (entry slot, exit slot) of every shaft with a VTU on both levels that can be driven off
+        # and an unblocked VTU on every level in between to ride through
+        graph = self.get_compiled_graph()
+        xs, ys = graph.xs, graph.ys
+        exits: Dict[Tuple[int, int], int] = {
+            (xs[vtu], ys[vtu]): slot for slot, vtu in transfers.get_vtus(target_level) if not self._map.is_blocked(vtu)
+        }
+        step = 1 if target_level > start_level else -1
+        return [
+            (slot, exits[(xs[vtu], ys[vtu])]) for slot, vtu in transfers.get_vtus(start_level)
+            if (xs[vtu], ys[vtu]) in exits
+            and all(self._is_open_vtu(xs[vtu], ys[vtu], z) for z in range(start_level + step, target_level, step))
+        ]
+
+    def _is_open_vtu(self, x: int, y: int, z: int) -> bool:
+        # Whether a shaft can be ridden through the cell: a VTU that isn't blocked
+        index = self._map.get_index_by_coords(x, y, z)
+        return (
+            index is not None
+            and self._map.get_node_by_index(index).node_type == MapNodeTypes.VTU.value
+            and not self._map.is_blocked(index)
+        )
+
+    def _penalize(self, graph: CompiledGraph, indices: List[int], penalties: Dict[int, int], penalty: float) -> None:
+        # Raise the cost of every move of a route by a share of it, in PENALTY_SCALE-times finer units
+        offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+        for index, next_index in zip(indices, indices[1:]):
+            for position in range(offsets[index], offsets[index + 1]):
+                if targets[position] == next_index:
+                    penalties[position] = penalties.get(position, 0) + max(1, int(costs[position] * PENALTY_SCALE * penalty))
+
+    def _find_penalized_path(
+        self,
+        graph: CompiledGraph,
+        start_index: int,
+        target_index: int,
+        tree: TargetTree,
+        penalties: Dict[int, int],
+        cost_limit: int
+    ) -> Optional[Tuple[List[int], int, int]]:
+        # A* over penalised costs, guided by exact unpenalised distances to the target;
+        # indices whose route would cost more than the limit unpenalised are pruned
+        offsets, targets, costs = graph.offsets, graph.targets, graph.costs
+        distance_to_target = tree.distance_to_target
+        g_scores: Dict[int, int] = {start_index: 0}
+        true_g_scores: Dict[int, int] = {start_index: 0}
+        parents: Dict[int, int] = {}
+        closed: Set[int] = set()
+        open_list = BucketQueue()
+        open_list.push(distance_to_target(start_index) * PENALTY_SCALE, 0, start_index)
+
+        while open_list:
+            _, _, current_index = open_list.pop()
+            if current_index == target_index:
+                path_indices: List[int] = [current_index]
+                while path_indices[-1] != start_index:
+                    path_indices.append(parents[path_indices[-1]])
+                path_indices.reverse()
+                return path_indices, true_g_scores[target_index], len(closed)
+            if current_index in closed:
+                continue  # Skip stale queue entries
+            closed.add(current_index)
+
+            g_score, true_g_score = g_scores[current_index], true_g_scores[current_index]
+            for position in range(offsets[current_index], offsets[current_index + 1]):
+                neighbor = targets[position]
+                remaining = distance_to_target(neighbor)
+                if neighbor in closed or remaining == UNREACHABLE:
+                    continue
+                next_true_g_score = true_g_score + costs[position]
+                if next_true_g_score + remaining > cost_limit:
+                    continue
+                tentative_g_score = g_score + costs[position] * PENALTY_SCALE + penalties.get(position, 0)
+                if tentative_g_score < g_scores.get(neighbor, tentative_g_score + 1):
+                    g_scores[neighbor], true_g_scores[neighbor], parents[neighbor] = (
+                        tentative_g_score, next_true_g_score, current_index
+                    )
+                    open_list.push(tentative_g_score + remaining * PENALTY_SCALE, tentative_g_score, neighbor)
+        return None
+
+    def _has_landmarks(self, level: int) -> bool:
+        return self.landmark_tables is not None and self.landmark_tables.is_usable(level)
+
+    def reconstruct_path(self, node_relations: Dict[int, int], current_index: int) -> List[Node]:
         """
         Reconstructs the path from the target node to the start node by backtracking
-        using the node_relations dictionary.
+        using the node_relations dictionary of compiled graph indices.
 
         Args:
-            node_relations (Dict[Node, Node]): The dictionary containing node relationships.
-            current_node (Node): The node to backtrack from (typically the target node).
+            node_relations (Dict[int, int]): The dictionary mapping each index to its parent index.
+            current_index (int): The index to backtrack from (typically the target node).
 
         Returns:
             List[Node]: The reconstructed path in the correct order, from start to target.
         """
-        total_path: List[Node] = [current_node]  # Start with the current node (goal node)
+        graph = self.get_compiled_graph()
+        total_path: List[int] = [current_index]  # Start with the current index (goal node)
         
         # Backtrack using node_relations
-        while current_node.id in node_relations.keys():
-            current_node = node_relations[current_node.id]
-            total_path.append(current_node)
+        while current_index in node_relations:
+            current_index = node_relations[current_index]
+            total_path.append(current_index)
         
-        return total_path[::-1]  # Reverse the path to return it from start to goal
+        return [graph.get_node(index) for index in reversed(total_path)]  # Return it from start to goal
@@ -0,0 +1,200 @@
+from typing import List, Tuple, Optional, Iterable
+from base.routing_base import PathRoutingBase
+from algo.routings.a_star import AstarRouting
+from algo.compiled_graph import CompiledGraph, CompiledGraphArrays
+from algo.contraction_hierarchy import ContractionHierarchy
+from algo_types.map_types import Map, Node, Path, DistanceMatrix
+from mapper.map_snapshot import MapSnapshot
+from algo_exceptions.route_exceptions import (
+    PathNotFoundException,
+    NotSameLevelRoutingException
+)
+
+import time
+
+
+class ContractionHierarchyRouting(PathRoutingBase):
+    """
+    ContractionHierarchyRouting answers same-level queries with a contraction
+    hierarchy of the compiled graph, built once by preprocess and reused for
+    every query until the map changes. Queries settle a few hundred indices
+    instead of searching the level.
+
+    A map change makes the hierarchy stale: shortcuts may skip a blocked cell or
+    miss a new one. Queries then fall back to AstarRouting until preprocess is
+    called again, e.g. once the layout change is complete.
+    """
+
+    def __init__(
+        self,
+        map: Map,
+        compiled_graph_arrays: Optional[CompiledGraphArrays] = None,
+        hierarchy: Optional[ContractionHierarchy] = None
+    ) -> None:
+        """
+        Initializes the ContractionHierarchyRouting class with a provided map.
+
+        Args:
+            map (Map): The map on which the routing will be performed.
+            compiled_graph_arrays (Optional[CompiledGraphArrays]): A graph compiled
+                earlier for this map (e.g. from a map snapshot).
+            hierarchy (Optional[ContractionHierarchy]): A hierarchy built earlier for
+                this map. It is built on the first query otherwise.
+        """
+        super().__init__(map)
+        self._astar = AstarRouting(map, compiled_graph_arrays)  # Compiles the graph and keeps it in sync
+        self.hierarchy = hierarchy
+        self.stale: bool = False
+        self._map.add_change_listener(self.invalidate)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: MapSnapshot) -> "ContractionHierarchyRouting":
+        """
+        Creates a router for a loaded map snapshot, using the compiled graph and
+        the hierarchy stored in it when there are any. Store a hierarchy with
+        save_map_snapshot(..., extra_sections=hierarchy.get_sections()).
+
+        Args:
+            snapshot (MapSnapshot): The snapshot returned by load_map_snapshot.
+
+        Returns:
+            ContractionHierarchyRouting: The router of the snapshot's map.
+        """
+        return cls(
+            snapshot.map, snapshot.compiled_graph_arrays, ContractionHierarchy.from_sections(snapshot.sections)
+        )
+
+    def heuristic(self, current_node: Node, target_node: Node) -> int:
+        """
+        Computes the Manhattan distance between two nodes.
+        """
+        return self._astar.heuristic(current_node, target_node)
+
+    def get_neighbors(self, node: Node) -> List[Node]:
+        """
+        Retrieves the neighboring nodes of a given node from the compiled graph.
+        """
+        return self._astar.get_neighbors(node)
+
+    def get_compiled_graph(self) -> CompiledGraph:
+        """
+        Returns the CSR adjacency graph of the map the hierarchy is built from.
+        """
+        return self._astar.get_compiled_graph()
+
+    def find_closest_vtu(self, start_node: Node) -> Node:
+        """
+        Finds the VTU closest to the start node on its level.
+        """
+        return self._astar.find_closest_vtu(start_node)
+
+    def distance_matrix(self, sources: List[Node], targets: List[Node]) -> DistanceMatrix:
+        """
+        Computes the distance from every source to every target, see
+        AstarRouting.distance_matrix.
+        """
+        return self._astar.distance_matrix(sources, targets)
+
+    def find_alternative_paths(
+        self,
+        current_node: Node,
+        target_node: Node,
+        k: int = 3,
+        min_dissimilarity: float = 0.3,
+        max_stretch: float = 1.5,
+        penalty: float = 0.25
+    ) -> List[Path]:
+        """
+        Finds up to k good routes between two nodes that differ from each other,
+        see AstarRouting.find_alternative_paths.
+        """
+        return self._astar.find_alternative_paths(current_node, target_node, k, min_dissimilarity, max_stretch, penalty)
+
+    def preprocess(self, witness_settle_limit: int = 64) -> ContractionHierarchy:
+        """
+        Contracts the compiled graph, replacing a stale hierarchy. Its
+        preprocessing_time and shortcut_count report the cost of the step.
+
+        Args:
+            witness_settle_limit (int): See ContractionHierarchy.build.
+
+        Returns:
+            ContractionHierarchy: The hierarchy of the map.
+        """
+        self.hierarchy = ContractionHierarchy.build(self.get_compiled_graph(), witness_settle_limit)
+        self.stale = False
+        return self.hierarchy
+
+    def get_hierarchy(self) -> ContractionHierarchy:
+        """
+        Returns the hierarchy of the map, contracting the graph on first use.
+
+        Returns:
+            ContractionHierarchy: The hierarchy, possibly stale.
+        """
+        if self.hierarchy is None:
+            self.preprocess()
+        return self.hierarchy
+
+    def invalidate(self, changed_coords: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Marks the hierarchy stale. It is registered as a change listener on the map.
+
+        Args:
+            changed_coords (Iterable[Tuple[int, int, int]]): The (x, y, z) coordinates
+                whose node was added, removed, retyped, blocked or unblocked.
+        """
+        if self.hierarchy is not None:
+            self.stale = True
+
+    def find_path(self, current_node: Node, target_node: Node) -> Path:
+        """
+        Finds the optimal path on any level, crossing levels through the VTU
+        transfer tables of AstarRouting.find_path.
+        """
+        if current_node.coords.z != target_node.coords.z:
+            return self._astar.find_path(current_node, target_node)
+        return self.find_path_on_same_level(current_node, target_node)
+
+    def find_path_on_same_level(self, current_node: Node, target_node: Node, bidirectional: Optional[bool] = None) -> Path:
+        """
+        Finds the optimal path from the current node to the target node with the
+        bidirectional upward query of the hierarchy, unpacked into cells.
+
+        Args:
+            current_node (Node): The starting node.
+            target_node (Node): The goal node.
+            bidirectional (Optional[bool]): Whether the A* search used while the
+                hierarchy is stale runs from both ends, see AstarRouting. The query
+                of the hierarchy always runs from both ends.
+
+        Returns:
+            Path: The optimal path. expanded_nodes counts the indices settled by
+                the query.
+
+        Raises:
+            PathNotFoundException: If no path exists between the start and target nodes.
+        """
+        if current_node.coords.z != target_node.coords.z:
+            raise NotSameLevelRoutingException("you are using a method that restricts routing on the same level.")
+
+        hierarchy = self.get_hierarchy()
+        if self.stale:
+            return self._astar.find_path_on_same_level(current_node, target_node, bidirectional)
+
+        graph = self.get_compiled_graph()
+        start_index: int = graph.get_index(current_node)
+        target_index: int = graph.get_index(target_node)
+        if self._astar.get_components().can_reach(start_index, target_index) is False:
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+
+        start_time_compute: float = time.perf_counter()
+        result = hierarchy.find_path(start_index, target_index)
+        if result is None:
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+        _, path, settled = result
+        return Path(
+            nodes=[graph.get_node(index) for index in path],
+            computation_time=time.perf_counter() - start_time_compute,
+            expanded_nodes=settled
+        )
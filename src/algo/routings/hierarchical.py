@@ -0,0 +1,342 @@
+from dataclasses import dataclass, field
+from typing import List, Tuple, Dict, Optional, Iterable, Set
+from base.routing_base import PathRoutingBase
+from algo.routings.a_star import AstarRouting
+from algo.compiled_graph import CompiledGraph, CompiledGraphArrays
+from algo_types.map_types import Map, Node, Path, DistanceMatrix
+from algo_exceptions.route_exceptions import (
+    PathNotFoundException,
+    NotSameLevelRoutingException
+)
+
+import heapq
+import time
+from collections import deque
+
+# (x // cluster_size, y // cluster_size, z) of a cluster
+ClusterKey = Tuple[int, int, int]
+
+
+@dataclass
+class Cluster:
+    """
+    The abstraction of one cluster of a level.
+
+    Attributes:
+        entries (Set[int]): Indices of the cluster that can be moved onto from another cluster.
+        exits (Set[int]): Indices of the cluster that can move onto another cluster.
+        intra_edges (Dict[int, List[Tuple[int, int]]]): For every entry, the exits
+            reachable inside the cluster and their distance.
+    """
+    entries: Set[int] = field(default_factory=set)
+    exits: Set[int] = field(default_factory=set)
+    intra_edges: Dict[int, List[Tuple[int, int]]] = field(default_factory=dict)
+
+
+class HierarchicalRouting(PathRoutingBase):
+    """
+    HierarchicalRouting is a hierarchical path-finding (HPA*) engine. Each level
+    is split into square clusters. The abstract graph has a node for every cell
+    a raft can enter or leave a cluster through; entries are linked to the exits
+    they reach inside their cluster, by the distance between them, and exits to
+    the entries of the neighbouring clusters they move onto. A query searches
+    the abstract graph and then refines only the clusters on the chosen route.
+
+    Every cell crossing a cluster border is an abstract node, rather than one
+    transition per border segment. That makes abstract distances exact, so paths
+    are optimal. Clusters are abstracted on first use and rebuilt after a map
+    change only if the change touched them.
+    """
+
+    def __init__(
+        self,
+        map: Map,
+        cluster_size: int = 16,
+        compiled_graph_arrays: Optional[CompiledGraphArrays] = None
+    ) -> None:
+        """
+        Initializes the HierarchicalRouting class with a provided map.
+
+        Args:
+            map (Map): The map on which the routing will be performed.
+            cluster_size (int): Width and height of a cluster, in cells.
+            compiled_graph_arrays (Optional[CompiledGraphArrays]): A graph compiled
+                earlier for this map (e.g. from a map snapshot).
+        """
+        super().__init__(map)
+        self.cluster_size = cluster_size
+        self._astar = AstarRouting(map, compiled_graph_arrays)  # Compiles the graph and keeps it in sync
+        self._clusters: Dict[ClusterKey, Cluster] = {}
+        self._map.add_change_listener(self.invalidate)
+
+    def heuristic(self, current_node: Node, target_node: Node) -> int:
+        """
+        Computes the Manhattan distance between two nodes.
+        """
+        return self._astar.heuristic(current_node, target_node)
+
+    def get_neighbors(self, node: Node) -> List[Node]:
+        """
+        Retrieves the neighboring nodes of a given node from the compiled graph.
+        """
+        return self._astar.get_neighbors(node)
+
+    def get_compiled_graph(self) -> CompiledGraph:
+        """
+        Returns the CSR adjacency graph of the map the clusters are built from.
+        """
+        return self._astar.get_compiled_graph()
+
+    def find_closest_vtu(self, start_node: Node) -> Node:
+        """
+        Finds the VTU closest to the start node on its level.
+        """
+        return self._astar.find_closest_vtu(start_node)
+
+    def distance_matrix(self, sources: List[Node], targets: List[Node]) -> DistanceMatrix:
+        """
+        Computes the distance from every source to every target, see
+        AstarRouting.distance_matrix.
+        """
+        return self._astar.distance_matrix(sources, targets)
+
+    def find_alternative_paths(
+        self,
+        current_node: Node,
+        target_node: Node,
+        k: int = 3,
+        min_dissimilarity: float = 0.3,
+        max_stretch: float = 1.5,
+        penalty: float = 0.25
+    ) -> List[Path]:
+        """
+        Finds up to k good routes between two nodes that differ from each other,
+        see AstarRouting.find_alternative_paths.
+        """
+        return self._astar.find_alternative_paths(current_node, target_node, k, min_dissimilarity, max_stretch, penalty)
+
+    def get_cluster(self, key: ClusterKey) -> Cluster:
+        """
+        Returns the abstraction of a cluster, building it if it is new or was touched
+        by a map change.
+
+        Args:
+            key (ClusterKey): The (x // cluster_size, y // cluster_size, z) of the cluster.
+
+        Returns:
+            Cluster: The entries, exits and intra-cluster edges of the cluster.
+        """
+        cluster = self._clusters.get(key)
+        if cluster is None:
+            cluster = self._build_cluster(key)
+            self._clusters[key] = cluster
+        return cluster
+
+    def invalidate(self, changed_coords: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Drops the clusters whose cells or border crossings changed. It is registered
+        as a change listener on the map, after the graph recompiles.
+
+        Args:
+            changed_coords (Iterable[Tuple[int, int, int]]): The (x, y, z) coordinates
+                whose node was added, removed, retyped, blocked or unblocked.
+        """
+        all_directions = {
+            tuple(direction)
+            for protocol in self._astar._direction_registry_factory.get_direction_registry().values()
+            for direction in protocol.get_directions()
+        }
+        for x, y, z in changed_coords:
+            self._clusters.pop(self._cluster_key_of(x, y, z), None)
+            for dx, dy, dz in all_directions:
+                self._clusters.pop(self._cluster_key_of(x - dx, y - dy, z - dz), None)
+                self._clusters.pop(self._cluster_key_of(x + dx, y + dy, z + dz), None)
+
+    def find_path(self, current_node: Node, target_node: Node) -> Path:
+        """
+        Finds the optimal path on any level, crossing levels through the VTU
+        transfer tables of AstarRouting.find_path.
+        """
+        if current_node.coords.z != target_node.coords.z:
+            return self._astar.find_path(current_node, target_node)
+        return self.find_path_on_same_level(current_node, target_node)
+
+    def find_path_on_same_level(self, current_node: Node, target_node: Node, bidirectional: Optional[bool] = None) -> Path:
+        """
+        Finds the optimal path from the current node to the target node: first on
+        the abstract graph, with the start and target linked into their clusters,
+        then cell by cell inside the clusters of the abstract path.
+
+        Args:
+            current_node (Node): The starting node.
+            target_node (Node): The goal node.
+            bidirectional (Optional[bool]): Accepted for AstarRouting's signature and
+                ignored, the abstract and refining searches only run forward.
+
+        Returns:
+            Path: The optimal path. expanded_nodes counts abstract nodes and cells
+                expanded while linking and refining.
+
+        Raises:
+            PathNotFoundException: If no path exists between the start and target nodes.
+        """
+        if current_node.coords.z != target_node.coords.z:
+            raise NotSameLevelRoutingException("you are using a method that restricts routing on the same level.")
+
+        graph = self.get_compiled_graph()
+        graph.compile_reverse()
+        xs, ys = graph.xs, graph.ys
+        start_index: int = graph.get_index(current_node)
+        target_index: int = graph.get_index(target_node)
+        target_x, target_y = target_node.coords.x, target_node.coords.y
+
+        components = self._astar.get_components()
+        if components.can_reach(start_index, target_index) is False:
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+        labels = components.labels
+        target_label = labels[target_index]
+
+        start_time_compute: float = time.perf_counter()
+        start_key, target_key = self._cluster_key(graph, start_index), self._cluster_key(graph, target_index)
+        start_cluster = self.get_cluster(start_key)
+
+        # Link the start to the exits of its cluster, and the entries of the target's cluster to the target
+        start_distances, _ = self._cluster_search(graph, start_index, start_key)
+        start_edges = [(index, distance) for index, distance in start_distances.items() if index in start_cluster.exits]
+        if target_index in start_distances:
+            start_edges.append((target_index, start_distances[target_index]))
+        target_distances, _ = self._cluster_search(graph, target_index, target_key, reverse=True)
+        expanded_nodes: int = len(start_distances) + len(target_distances)
+
+        open_list: List[Tuple[int, int]] = [(0, start_index)]
+        closed_list = set()
+        node_relations: Dict[int, int] = {}
+        g_score: Dict[int, int] = {start_index: 0}
+
+        while open_list:
+            _, current_index = heapq.heappop(open_list)
+
+            if current_index == target_index:
+                abstract_path: List[int] = [current_index]
+                while abstract_path[-1] in node_relations:
+                    abstract_path.append(node_relations[abstract_path[-1]])
+                abstract_path.reverse()
+                nodes, refined_nodes = self._refine(graph, abstract_path)
+                return Path(
+                    nodes=nodes,
+                    computation_time=time.perf_counter() - start_time_compute,
+                    expanded_nodes=expanded_nodes + len(closed_list) + refined_nodes
+                )
+
+            if current_index in closed_list:
+                continue  # Skip stale heap entries
+            closed_list.add(current_index)
+
+            for neighbor, cost in self._abstract_edges(
+                graph, current_index, start_index, start_edges, target_index, target_key, target_distances
+            ):
+                if neighbor in closed_list or labels[neighbor] < target_label:
+                    continue
+                tentative_g_score = g_score[current_index] + cost
+                if tentative_g_score < g_score.get(neighbor, tentative_g_score + 1):
+                    node_relations[neighbor] = current_index
+                    g_score[neighbor] = tentative_g_score
+                    f_score: int = tentative_g_score + abs(xs[neighbor] - target_x) + abs(ys[neighbor] - target_y)
+                    heapq.heappush(open_list, (f_score, neighbor))
+
+        raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+
+    def _abstract_edges(
+        self,
+        graph: CompiledGraph,
+        index: int,
+        start_index: int,
+        start_edges: List[Tuple[int, int]],
+        target_index: int,
+        target_key: ClusterKey,
+        target_distances: Dict[int, int]
+    ) -> List[Tuple[int, int]]:
+        key = self._cluster_key(graph, index)
+        cluster = self.get_cluster(key)
+
+        edges: List[Tuple[int, int]] = list(start_edges) if index == start_index else list(cluster.intra_edges.get(index, ()))
+        if index in cluster.exits:
+            edges.extend((neighbor, 1) for neighbor in graph.neighbors(index) if self._cluster_key(graph, neighbor) != key)
+        if key == target_key and index in target_distances:
+            edges.append((target_index, target_distances[index]))
+        return edges
+
+    def _build_cluster(self, key: ClusterKey) -> Cluster:
+        graph = self.get_compiled_graph()
+        graph.compile_reverse()
+        cluster_x, cluster_y, z = key
+        cluster = Cluster()
+
+        for x in range(cluster_x * self.cluster_size, min((cluster_x + 1) * self.cluster_size, self._map.lanes_nums)):
+            for y in range(cluster_y * self.cluster_size, min((cluster_y + 1) * self.cluster_size, self._map.aisle_nums)):
+                index = self._map.get_index_by_coords(x, y, z)
+                if index is None:
+                    continue
+                if any(self._cluster_key(graph, source) != key for source in graph.predecessors(index)):
+                    cluster.entries.add(index)
+                if any(self._cluster_key(graph, target) != key for target in graph.neighbors(index)):
+                    cluster.exits.add(index)
+
+        for entry in cluster.entries:
+            distances, _ = self._cluster_search(graph, entry, key)
+            cluster.intra_edges[entry] = [
+                (index, distance) for index, distance in distances.items() if index in cluster.exits and index != entry
+            ]
+        return cluster
+
+    def _cluster_search(
+        self,
+        graph: CompiledGraph,
+        source: int,
+        key: ClusterKey,
+        reverse: bool = False,
+        stop: Optional[int] = None
+    ) -> Tuple[Dict[int, int], Dict[int, int]]:
+        # Breadth-first search confined to one cluster, backwards over the reversed graph if asked
+        offsets, targets = (graph.reverse_offsets, graph.reverse_targets) if reverse else (graph.offsets, graph.targets)
+        xs, ys, zs = graph.xs, graph.ys, graph.zs
+        cluster_x, cluster_y, z = key
+        size = self.cluster_size
+
+        distances: Dict[int, int] = {source: 0}
+        parents: Dict[int, int] = {}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            if current == stop:
+                break
+            for neighbor in targets[offsets[current]:offsets[current + 1]]:
+                if neighbor in distances or xs[neighbor] // size != cluster_x or ys[neighbor] // size != cluster_y or zs[neighbor] != z:
+                    continue
+                distances[neighbor] = distances[current] + 1
+                parents[neighbor] = current
+                queue.append(neighbor)
+        return distances, parents
+
+    def _refine(self, graph: CompiledGraph, abstract_path: List[int]) -> Tuple[List[Node], int]:
+        # Expand the abstract path into cells: intra-cluster hops by a confined search, border hops as they are
+        path: List[int] = [abstract_path[0]]
+        expanded_nodes: int = 0
+        for source, target in zip(abstract_path, abstract_path[1:]):
+            key = self._cluster_key(graph, source)
+            if key != self._cluster_key(graph, target):
+                path.append(target)
+                continue
+            distances, parents = self._cluster_search(graph, source, key, stop=target)
+            expanded_nodes += len(distances)
+            hop: List[int] = [target]
+            while hop[-1] != source:
+                hop.append(parents[hop[-1]])
+            path.extend(reversed(hop[:-1]))
+        return [graph.get_node(index) for index in path], expanded_nodes
+
+    def _cluster_key(self, graph: CompiledGraph, index: int) -> ClusterKey:
+        return graph.xs[index] // self.cluster_size, graph.ys[index] // self.cluster_size, graph.zs[index]
+
+    def _cluster_key_of(self, x: int, y: int, z: int) -> ClusterKey:
+        return x // self.cluster_size, y // self.cluster_size, z
@@ -0,0 +1,217 @@
+from typing import List, Tuple, Dict, Optional, Iterable, Set
+from algo.routings.a_star import AstarRouting
+from algo.compiled_graph import CompiledGraphArrays
+from algo_types.map_types import Map, Node, Path
+from algo_exceptions.route_exceptions import (
+    PathNotFoundException,
+    NotSameLevelRoutingException
+)
+
+import heapq
+import time
+
+# (stop index, number of steps, whether the stop is a dead end) of a jump
+Jump = Tuple[int, int, bool]
+# (|dx|, |dy|, |dz|, x, y, z) of a straight line, the coordinates moved along set to 0
+LineKey = Tuple[int, int, int, int, int, int]
+
+
+class JumpPointRouting(AstarRouting):
+    """
+    JumpPointRouting is a Jump Point Search adapted to the directional lane and
+    aisle grids. Lanes only move along x and aisles only along y, so maps are
+    made of long straight corridors in which every cell's only moves are going
+    on or going back. Instead of pushing each corridor cell onto the heap, the
+    search jumps along the corridor and only stops at cells where the node type
+    changes, another move becomes possible, the corridor ends, or the target is.
+    Path lengths are the same as AstarRouting's.
+
+    Jumps are memoised per (cell, first step). A map change only drops the jumps
+    running along the lines whose rows were recompiled.
+    """
+
+    def __init__(self, map: Map, compiled_graph_arrays: Optional[CompiledGraphArrays] = None) -> None:
+        """
+        Initializes the JumpPointRouting class with a provided map.
+
+        Args:
+            map (Map): The map on which the routing will be performed.
+            compiled_graph_arrays (Optional[CompiledGraphArrays]): A graph compiled
+                earlier for this map (e.g. from a map snapshot).
+        """
+        self._jumps: Dict[Tuple[int, int], Jump] = {}
+        self._line_jumps: Dict[LineKey, Set[Tuple[int, int]]] = {}
+        super().__init__(map, compiled_graph_arrays)
+
+    def recompile(self, changed_coords: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Recompiles the graph after the map changed and drops the memoised jumps
+        that crossed a cell whose moves may have changed: the changed cells and
+        the cells that could move onto them.
+
+        Args:
+            changed_coords (Iterable[Tuple[int, int, int]]): The (x, y, z) coordinates
+                whose node was added, removed, retyped, blocked or unblocked.
+        """
+        changed_coords = list(changed_coords)
+        super().recompile(changed_coords)
+
+        all_directions = {
+            tuple(direction)
+            for protocol in self._direction_registry_factory.get_direction_registry().values()
+            for direction in protocol.get_directions()
+        }
+        for x, y, z in changed_coords:
+            cells = [(x, y, z)] + [(x - dx, y - dy, z - dz) for dx, dy, dz in all_directions]
+            for cell_x, cell_y, cell_z in cells:
+                for dx, dy, dz in all_directions:
+                    for jump_key in self._line_jumps.pop(self._line_key(cell_x, cell_y, cell_z, dx, dy, dz), ()):
+                        self._jumps.pop(jump_key, None)
+
+    def find_path_on_same_level(self, current_node: Node, target_node: Node, bidirectional: Optional[bool] = None) -> Path:
+        """
+        Finds the optimal path from the current node to the target node, expanding
+        only the jump points of the corridors in between.
+
+        Args:
+            current_node (Node): The starting node.
+            target_node (Node): The goal node.
+            bidirectional (Optional[bool]): Accepted for AstarRouting's signature and
+                ignored, jump point searches only run forward.
+
+        Returns:
+            Path: The optimal path, every corridor cell included. expanded_nodes
+                counts the jump points expanded.
+
+        Raises:
+            PathNotFoundException: If no path exists between the start and target nodes.
+        """
+        if current_node.coords.z != target_node.coords.z:
+            raise NotSameLevelRoutingException("you are using a method that restricts routing on the same level.")
+
+        graph = self.get_compiled_graph()
+        offsets, targets, xs, ys = graph.offsets, graph.targets, graph.xs, graph.ys
+        start_index: int = graph.get_index(current_node)
+        target_index: int = graph.get_index(target_node)
+        target_x, target_y = target_node.coords.x, target_node.coords.y
+
+        components = self.get_components()
+        if components.can_reach(start_index, target_index) is False:
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+        labels = components.labels
+        target_label = labels[target_index]
+
+        open_list: List[Tuple[int, int]] = [(0, start_index)]  # Min-heap of (f-score, jump point index)
+        closed_list = set()
+        node_relations: Dict[int, int] = {}  # Previous jump point of each reached jump point
+        g_score: Dict[int, int] = {start_index: 0}
+
+        start_time_compute: float = time.perf_counter()
+        while open_list:
+            _, current_index = heapq.heappop(open_list)
+
+            if current_index == target_index:
+                return Path(
+                    nodes=self._reconstruct_jumps(node_relations, current_index),
+                    computation_time=time.perf_counter() - start_time_compute,
+                    expanded_nodes=len(closed_list)
+                )
+
+            if current_index in closed_list:
+                continue  # Skip stale heap entries
+            closed_list.add(current_index)
+
+            for first_step in targets[offsets[current_index]:offsets[current_index + 1]]:
+                if labels[first_step] < target_label:
+                    continue  # Nothing along this corridor can lead to the target
+                stop_index, steps, dead_end = self._jump(current_index, first_step)
+
+                # The target can sit anywhere along the corridor
+                target_steps = self._steps_to(current_index, first_step, target_index, steps)
+                if target_steps:
+                    stop_index, steps = target_index, target_steps
+                elif dead_end or labels[stop_index] < target_label or stop_index in closed_list:
+                    continue
+
+                tentative_g_score = g_score[current_index] + steps
+                if tentative_g_score < g_score.get(stop_index, tentative_g_score + 1):
+                    node_relations[stop_index] = current_index
+                    g_score[stop_index] = tentative_g_score
+                    f_score: int = tentative_g_score + abs(xs[stop_index] - target_x) + abs(ys[stop_index] - target_y)
+                    heapq.heappush(open_list, (f_score, stop_index))
+
+        raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+
+    def _jump(self, source: int, first_step: int) -> Jump:
+        jump_key = (source, first_step)
+        jump = self._jumps.get(jump_key)
+        if jump is not None:
+            return jump
+
+        graph = self.get_compiled_graph()
+        offsets, targets, node_codes, xs, ys, zs = (
+            graph.offsets, graph.targets, graph.node_codes, graph.xs, graph.ys, graph.zs
+        )
+        dx, dy, dz = xs[first_step] - xs[source], ys[first_step] - ys[source], zs[first_step] - zs[source]
+        previous, current, steps = source, first_step, 1
+
+        # Walk on while the cell keeps the corridor's type and can only go on or back
+        while True:
+            following, other_moves = -1, False
+            for neighbor in targets[offsets[current]:offsets[current + 1]]:
+                if neighbor == previous:
+                    continue
+                if following < 0 and (xs[neighbor] - xs[current], ys[neighbor] - ys[current], zs[neighbor] - zs[current]) == (dx, dy, dz):
+                    following = neighbor
+                else:
+                    other_moves = True
+            if following < 0 or other_moves or node_codes[following] != node_codes[current]:
+                break
+            previous, current, steps = current, following, steps + 1
+
+        jump = (current, steps, following < 0 and not other_moves)
+        self._jumps[jump_key] = jump
+        self._line_jumps.setdefault(
+            self._line_key(xs[source], ys[source], zs[source], dx, dy, dz), set()
+        ).add(jump_key)
+        return jump
+
+    def _steps_to(self, source: int, first_step: int, target: int, steps: int) -> int:
+        # Number of steps from source to target along the jump, 0 if the jump doesn't cross it
+        graph = self.get_compiled_graph()
+        xs, ys, zs = graph.xs, graph.ys, graph.zs
+        dx, dy, dz = xs[first_step] - xs[source], ys[first_step] - ys[source], zs[first_step] - zs[source]
+        target_steps = (xs[target] - xs[source]) * dx + (ys[target] - ys[source]) * dy + (zs[target] - zs[source]) * dz
+        if not 1 <= target_steps <= steps:
+            return 0
+        if (xs[source] + dx * target_steps, ys[source] + dy * target_steps, zs[source] + dz * target_steps) != (
+            xs[target], ys[target], zs[target]
+        ):
+            return 0
+        return target_steps
+
+    def _reconstruct_jumps(self, node_relations: Dict[int, int], current_index: int) -> List[Node]:
+        # Fill in the corridor cells between consecutive jump points
+        graph = self.get_compiled_graph()
+        xs, ys, zs = graph.xs, graph.ys, graph.zs
+        jump_points: List[int] = [current_index]
+        while jump_points[-1] in node_relations:
+            jump_points.append(node_relations[jump_points[-1]])
+        jump_points.reverse()
+
+        path: List[Node] = [graph.get_node(jump_points[0])]
+        for source, stop in zip(jump_points, jump_points[1:]):
+            x, y, z = xs[source], ys[source], zs[source]
+            dx, dy, dz = _sign(xs[stop] - x), _sign(ys[stop] - y), _sign(zs[stop] - z)
+            while (x, y, z) != (xs[stop], ys[stop], zs[stop]):
+                x, y, z = x + dx, y + dy, z + dz
+                path.append(self._map.get_node_by_coords(x, y, z))
+        return path
+
+    @staticmethod
+    def _line_key(x: int, y: int, z: int, dx: int, dy: int, dz: int) -> LineKey:
+        return abs(dx), abs(dy), abs(dz), 0 if dx else x, 0 if dy else y, 0 if dz else z
+
+
+def _sign(value: int) -> int:
+    return (value > 0) - (value < 0)
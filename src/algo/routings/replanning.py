@@ -0,0 +1,214 @@
+from typing import List, Tuple, Dict, Optional, Iterable, Hashable, Set
+from base.routing_base import PathRoutingBase
+from algo.routings.a_star import AstarRouting
+from algo.compiled_graph import CompiledGraph, CompiledGraphArrays
+from algo.d_star_lite import DStarLitePlanner
+from algo_types.map_types import Map, Node, Path, DistanceMatrix, Coords
+from algo_exceptions.route_exceptions import (
+    PathNotFoundException,
+    NotSameLevelRoutingException
+)
+
+import time
+
+
+class ReplanningRouting(PathRoutingBase):
+    """
+    ReplanningRouting keeps a D* Lite planner for every active raft, so a raft
+    whose route gets blocked (a pallet dropped on it, a robot stalled in an
+    aisle) is rerouted by repairing its search instead of searching again.
+
+    A raft's route is planned with plan_route, followed with advance as the raft
+    moves, and read with get_route, which repairs the search first if the map
+    changed since. A route whose target node is removed from the map can't be
+    reached any more, even if a node is added at the freed index later.
+    One-off queries go to AstarRouting.
+    """
+
+    def __init__(self, map: Map, compiled_graph_arrays: Optional[CompiledGraphArrays] = None) -> None:
+        """
+        Initializes the ReplanningRouting class with a provided map.
+
+        Args:
+            map (Map): The map on which the routing will be performed.
+            compiled_graph_arrays (Optional[CompiledGraphArrays]): A graph compiled
+                earlier for this map (e.g. from a map snapshot).
+        """
+        super().__init__(map)
+        self._astar = AstarRouting(map, compiled_graph_arrays)  # Compiles the graph and keeps it in sync
+        self._planners: Dict[Hashable, DStarLitePlanner] = {}
+        # (current, target) coordinates of every raft, to tell whether their indices still hold them
+        self._route_coords: Dict[Hashable, Tuple[Coords, Coords]] = {}
+        self._lost_targets: Set[Hashable] = set()
+        self._map.add_change_listener(self.invalidate)
+
+    def heuristic(self, current_node: Node, target_node: Node) -> int:
+        """
+        Computes the Manhattan distance between two nodes.
+        """
+        return self._astar.heuristic(current_node, target_node)
+
+    def get_neighbors(self, node: Node) -> List[Node]:
+        """
+        Retrieves the neighboring nodes of a given node from the compiled graph.
+        """
+        return self._astar.get_neighbors(node)
+
+    def get_compiled_graph(self) -> CompiledGraph:
+        """
+        Returns the CSR adjacency graph of the map the planners search.
+        """
+        return self._astar.get_compiled_graph()
+
+    def find_closest_vtu(self, start_node: Node) -> Node:
+        """
+        Finds the VTU closest to the start node on its level.
+        """
+        return self._astar.find_closest_vtu(start_node)
+
+    def distance_matrix(self, sources: List[Node], targets: List[Node]) -> DistanceMatrix:
+        """
+        Computes the distance from every source to every target, see
+        AstarRouting.distance_matrix.
+        """
+        return self._astar.distance_matrix(sources, targets)
+
+    def find_alternative_paths(
+        self,
+        current_node: Node,
+        target_node: Node,
+        k: int = 3,
+        min_dissimilarity: float = 0.3,
+        max_stretch: float = 1.5,
+        penalty: float = 0.25
+    ) -> List[Path]:
+        """
+        Finds up to k good routes between two nodes that differ from each other,
+        see AstarRouting.find_alternative_paths.
+        """
+        return self._astar.find_alternative_paths(current_node, target_node, k, min_dissimilarity, max_stretch, penalty)
+
+    def find_path(self, current_node: Node, target_node: Node) -> Path:
+        return self._astar.find_path(current_node, target_node)
+
+    def find_path_on_same_level(self, current_node: Node, target_node: Node, bidirectional: Optional[bool] = None) -> Path:
+        return self._astar.find_path_on_same_level(current_node, target_node, bidirectional)
+
+    def plan_route(self, raft_id: Hashable, current_node: Node, target_node: Node) -> Path:
+        """
+        Starts tracking the route of a raft, replacing any route it had.
+
+        Args:
+            raft_id (Hashable): The raft to plan for.
+            current_node (Node): The node the raft is on.
+            target_node (Node): The node the raft drives to.
+
+        Returns:
+            Path: The route. expanded_nodes counts the indices the search expanded.
+
+        Raises:
+            NotSameLevelRoutingException: If the nodes are on different levels.
+            PathNotFoundException: If no path exists between the nodes.
+        """
+        if current_node.coords.z != target_node.coords.z:
+            raise NotSameLevelRoutingException("you are using a method that restricts routing on the same level.")
+        graph = self.get_compiled_graph()
+        graph.compile_reverse()
+        self._planners[raft_id] = DStarLitePlanner(graph, graph.get_index(current_node), graph.get_index(target_node))
+        self._route_coords[raft_id] = (current_node.coords, target_node.coords)
+        self._lost_targets.discard(raft_id)
+        return self.get_route(raft_id)
+
+    def advance(self, raft_id: Hashable, node: Node) -> None:
+        """
+        Records that a raft moved, e.g. onto the next node of its route.
+
+        Args:
+            raft_id (Hashable): The raft that moved.
+            node (Node): The node it is on now.
+        """
+        self._planners[raft_id].move_to(self.get_compiled_graph().get_index(node))
+        self._route_coords[raft_id] = (node.coords, self._route_coords[raft_id][1])
+
+    def get_route(self, raft_id: Hashable) -> Path:
+        """
+        Returns the current route of a raft from the node it is on, repairing its
+        search first if the map changed since the last call.
+
+        Args:
+            raft_id (Hashable): The raft whose route to return.
+
+        Returns:
+            Path: The route. expanded_nodes counts the indices expanded by this
+                call's repair only.
+
+        Raises:
+            KeyError: If no route is planned for the raft.
+            PathNotFoundException: If the target can't be reached any more, e.g.
+                because the raft's or the target's node was removed.
+        """
+        planner = self._planners[raft_id]
+        current_coords, target_coords = self._route_coords[raft_id]
+        graph = self.get_compiled_graph()
+        expanded_before = planner.expanded_nodes
+        start_time_compute: float = time.perf_counter()
+        if (
+            raft_id in self._lost_targets
+            or not self._holds(planner.start_index, current_coords)
+            or not self._holds(planner.target_index, target_coords)
+        ):
+            raise PathNotFoundException(f"Path from {current_coords} to {target_coords} is not possible")
+        path = planner.get_path()
+        if path is None:
+            raise PathNotFoundException(f"Path from {current_coords} to {target_coords} is not possible")
+        return Path(
+            nodes=[graph.get_node(index) for index in path],
+            computation_time=time.perf_counter() - start_time_compute,
+            expanded_nodes=planner.expanded_nodes - expanded_before
+        )
+
+    def end_route(self, raft_id: Hashable) -> None:
+        """
+        Stops tracking the route of a raft, e.g. once it arrived.
+        """
+        self._planners.pop(raft_id, None)
+        self._route_coords.pop(raft_id, None)
+        self._lost_targets.discard(raft_id)
+
+    def invalidate(self, changed_coords: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Hands the indices whose moves changed to the planners of their level and
+        marks the routes whose target node was removed as unreachable. It is
+        registered as a change listener on the map, after the graph recompiles.
+
+        Args:
+            changed_coords (Iterable[Tuple[int, int, int]]): The (x, y, z) coordinates
+                whose node was added, removed, retyped, blocked or unblocked.
+        """
+        if not self._planners:
+            return
+        graph = self.get_compiled_graph()
+        all_directions = {
+            tuple(direction)
+            for protocol in self._astar._direction_registry_factory.get_direction_registry().values()
+            for direction in protocol.get_directions()
+        }
+        changed_by_level: Dict[int, List[int]] = {}
+        for x, y, z in changed_coords:
+            for dx, dy, dz in ((0, 0, 0), *all_directions):
+                index = self._map.get_index_by_coords(x - dx, y - dy, z - dz)
+                if index is not None:
+                    changed_by_level.setdefault(z - dz, []).append(index)
+        for raft_id, planner in self._planners.items():
+            if raft_id in self._lost_targets:
+                continue
+            if not self._holds(planner.target_index, self._route_coords[raft_id][1]):
+                self._lost_targets.add(raft_id)
+                continue
+            changed = changed_by_level.get(graph.zs[planner.target_index])
+            if changed:
+                planner.notify_changed(changed)
+
+    def _holds(self, index: int, coords: Coords) -> bool:
+        # Whether the index still belongs to the node at the coordinates, which removing it frees
+        return self._map.get_index_by_coords(coords.x, coords.y, coords.z) == index
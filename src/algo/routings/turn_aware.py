@@ -0,0 +1,191 @@
+from typing import List, Tuple, Dict, Optional
+from algo.routings.a_star import AstarRouting
+from algo.compiled_graph import CompiledGraphArrays
+from algo.costs import UnitCostModel
+from algo.search_arena import SearchArena
+from base.cost_base import CostModel
+from algo_types.map_types import Map, Node, Path
+from algo_exceptions.route_exceptions import (
+    PathNotFoundException,
+    NotSameLevelRoutingException
+)
+
+import time
+
+# Turn cost of the default cost model, in moves
+DEFAULT_TURN_COST: int = 2
+
+
+class TurnAwareRouting(AstarRouting):
+    """
+    TurnAwareRouting is an A* search that charges for every change of direction,
+    since a raft has to stop and switch its wheel set to turn. Its states are
+    (index, heading) pairs, packed into the single integer
+    index * heading_states + heading, so they live in flat arrays like the
+    indices of a plain search. The last heading stands for a raft that hasn't
+    moved yet, whose first move is free of turn costs.
+
+    Routes minimise the move costs plus the turn costs of the cost model. The
+    heuristic adds the cheapest turn whenever the target can't be reached
+    straight ahead, which keeps it consistent. Across levels the legs to and
+    from the VTUs are taken from the VTU transfer tables, which don't see turns.
+    """
+
+    def __init__(
+        self,
+        map: Map,
+        compiled_graph_arrays: Optional[CompiledGraphArrays] = None,
+        cost_model: Optional[CostModel] = None
+    ) -> None:
+        """
+        Initializes the TurnAwareRouting class with a provided map.
+
+        Args:
+            map (Map): The map on which the routing will be performed.
+            compiled_graph_arrays (Optional[CompiledGraphArrays]): A graph compiled
+                earlier for this map (e.g. from a map snapshot).
+            cost_model (Optional[CostModel]): The cost of every move and turn. Moves
+                cost 1 and turns DEFAULT_TURN_COST if not given.
+        """
+        super().__init__(
+            map,
+            compiled_graph_arrays,
+            cost_model=UnitCostModel(turn=DEFAULT_TURN_COST) if cost_model is None else cost_model
+        )
+        self._state_arena = SearchArena()
+        # Headings are the moves on a level; the one past the last is the raft that hasn't moved yet
+        self._headings: List[Tuple[int, int, int]] = sorted({
+            tuple(direction)
+            for protocol in self._direction_registry_factory.get_direction_registry().values()
+            for direction in protocol.get_directions()
+            if not direction[2]
+        })
+        self.heading_states: int = len(self._headings) + 1
+        self._heading_by_delta: Dict[Tuple[int, int], int] = {
+            (dx, dy): heading for heading, (dx, dy, _) in enumerate(self._headings)
+        }
+        cost_model = self._cost_model
+        self._turn_costs: List[int] = [
+            cost_model.get_turn_cost(direction, next_direction) if heading < len(self._headings) else 0
+            for heading, direction in enumerate(self._headings + [(0, 0, 0)])
+            for next_direction in self._headings + [(0, 0, 0)]
+        ]
+        self._min_turn_cost: int = min((
+            cost_model.get_turn_cost(direction, next_direction)
+            for direction in self._headings for next_direction in self._headings if direction != next_direction
+        ), default=0)
+
+    def find_path_on_same_level(
+        self,
+        current_node: Node,
+        target_node: Node,
+        bidirectional: Optional[bool] = None,
+        *,
+        heading: Optional[Tuple[int, int, int]] = None
+    ) -> Path:
+        """
+        Finds the path from the current node to the target node with the lowest
+        move and turn costs, searching over (index, heading) states.
+
+        Args:
+            current_node (Node): The starting node.
+            target_node (Node): The goal node.
+            bidirectional (Optional[bool]): Must be None or False, the search only runs
+                forward since the heading is only known at the start.
+            heading (Optional[Tuple[int, int, int]]): The direction of the raft's last
+                move, so turning away from it is charged. None if it is free to
+                leave in any direction.
+
+        Returns:
+            Path: The optimal path. expanded_nodes counts the states expanded.
+
+        Raises:
+            NotSameLevelRoutingException: If the nodes are on different levels.
+            ValueError: If a bidirectional search is asked for, or if the heading
+                isn't a move of any node type.
+            PathNotFoundException: If no path exists between the start and target nodes.
+        """
+        if current_node.coords.z != target_node.coords.z:
+            raise NotSameLevelRoutingException("you are using a method that restricts routing on the same level.")
+        if bidirectional:
+            raise ValueError("turn-aware searches only run forward from the raft's heading")
+        if heading is not None and tuple(heading) not in self._headings:
+            raise ValueError(f"{heading} isn't a direction rafts move in")
+
+        graph = self.get_compiled_graph()
+        offsets, targets, costs, xs, ys = graph.offsets, graph.targets, graph.costs, graph.xs, graph.ys
+        x_cost, y_cost, min_cost = graph.min_x_cost, graph.min_y_cost, graph.min_cost
+        heading_states, heading_by_delta, turn_costs = self.heading_states, self._heading_by_delta, self._turn_costs
+        heading_dxs = [dx for dx, _, _ in self._headings] + [0]
+        heading_dys = [dy for _, dy, _ in self._headings] + [0]
+        no_heading = heading_states - 1
+        min_turn_cost = self._min_turn_cost
+        start_index: int = graph.get_index(current_node)
+        target_index: int = graph.get_index(target_node)
+        target_x, target_y = target_node.coords.x, target_node.coords.y
+
+        components = self.get_components()
+        if components.can_reach(start_index, target_index) is False:
+            raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
+        labels = components.labels
+        target_label = labels[target_index]
+        lower_bound = self.landmark_tables.lower_bound_to(graph, target_index) if self._has_landmarks(target_node.coords.z) else None
+
+        arena = self._state_arena
+        generation = arena.begin(graph.get_nodes_length() * heading_states)
+        g_scores, parents, reached, closed = arena.g_scores, arena.parents, arena.reached, arena.closed
+        open_list = arena.queue
+        expanded_nodes: int = 0
+
+        start_heading = no_heading if heading is None else self._headings.index(tuple(heading))
+        start_state = start_index * heading_states + start_heading
+        reached[start_state], g_scores[start_state] = generation, 0
+        open_list.push(0, 0, start_state)
+
+        start_time_compute: float = time.perf_counter()
+        while open_list:
+            _, _, current_state = open_list.pop()
+            current_index, current_heading = divmod(current_state, heading_states)
+
+            if current_index == target_index:
+                path_states: List[int] = [current_state]
+                while path_states[-1] != start_state:
+                    path_states.append(parents[path_states[-1]])
+                return Path(
+                    nodes=[graph.get_node(state // heading_states) for state in reversed(path_states)],
+                    computation_time=time.perf_counter() - start_time_compute,
+                    expanded_nodes=expanded_nodes
+                )
+
+            if closed[current_state] == generation:
+                continue  # Skip stale queue entries
+            closed[current_state] = generation
+            expanded_nodes += 1
+
+            g_score = g_scores[current_state]
+            x, y = xs[current_index], ys[current_index]
+            first_turn = current_heading * heading_states
+            for position in range(offsets[current_index], offsets[current_index + 1]):
+                neighbor = targets[position]
+                if labels[neighbor] < target_label:
+                    continue  # Components that can't lead to the target
+                next_heading = heading_by_delta[(xs[neighbor] - x, ys[neighbor] - y)]
+                neighbor_state = neighbor * heading_states + next_heading
+                if closed[neighbor_state] == generation:
+                    continue
+
+                tentative_g_score = g_score + costs[position] + turn_costs[first_turn + next_heading]
+                if reached[neighbor_state] != generation or tentative_g_score < g_scores[neighbor_state]:
+                    reached[neighbor_state], g_scores[neighbor_state], parents[neighbor_state] = (
+                        generation, tentative_g_score, current_state
+                    )
+                    dx, dy = target_x - xs[neighbor], target_y - ys[neighbor]
+                    f_score: int = tentative_g_score + abs(dx) * x_cost + abs(dy) * y_cost
+                    if lower_bound is not None:
+                        f_score = max(f_score, tentative_g_score + lower_bound(neighbor) * min_cost)
+                    # At least one more turn unless the target lies straight ahead
+                    if (dx and dy) or ((dx or dy) and heading_dxs[next_heading] * dx + heading_dys[next_heading] * dy <= 0):
+                        f_score += min_turn_cost
+                    open_list.push(f_score, tentative_g_score, neighbor_state)
+
+        raise PathNotFoundException(f"Path from {current_node.coords} to {target_node.coords} is not possible")
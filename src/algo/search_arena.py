@@ -0,0 +1,61 @@
+from array import array
+
+from algo.bucket_queue import BucketQueue
+
+
+class SearchArena:
+    """
+    SearchArena is the per-index state of a search, kept by a router and reused
+    by every query: g-scores and parents in flat arrays over the dense indices
+    of a CompiledGraph, and the open list.
+
+    Instead of clearing the arrays between queries, every query gets a new
+    generation number. An index was reached (or closed) by the current query
+    only if its stamp equals the current generation, so entries left behind by
+    earlier queries are simply ignored. Starting a query is O(1), apart from the
+    rare wrap-around of the generation counter.
+
+    A router owns one arena, so its searches must not run concurrently.
+    """
+
+    def __init__(self, size: int = 0) -> None:
+        """
+        Initializes the arena.
+
+        Args:
+            size (int): Number of dense indices to allocate for up front.
+        """
+        self.generation: int = 0
+        self.g_scores = array('i', [0]) * size
+        self.parents = array('q', [0]) * size
+        self.reached = array('L', [0]) * size  # Generation that last set the g-score and parent
+        self.closed = array('L', [0]) * size  # Generation that last expanded the index
+        self.queue = BucketQueue()
+        self._max_generation: int = (1 << (8 * self.reached.itemsize)) - 1
+
+    def begin(self, size: int) -> int:
+        """
+        Starts a new query over a graph of the given number of indices, growing
+        the arrays if the graph grew.
+
+        Args:
+            size (int): Number of dense indices of the graph.
+
+        Returns:
+            int: The generation stamping the indices this query reaches and closes.
+        """
+        if len(self.g_scores) < size:
+            grow = size - len(self.g_scores)
+            self.g_scores.extend(array('i', [0]) * grow)
+            self.parents.extend(array('q', [0]) * grow)
+            self.reached.extend(array('L', [0]) * grow)
+            self.closed.extend(array('L', [0]) * grow)
+
+        self.generation += 1
+        if self.generation > self._max_generation:
+            # Stamps would become ambiguous, so forget them all once
+            self.reached = array('L', [0]) * len(self.reached)
+            self.closed = array('L', [0]) * len(self.closed)
+            self.generation = 1
+        self.queue.clear()
+        return self.generation
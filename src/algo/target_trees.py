@@ -0,0 +1,202 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from algo.compiled_graph import CompiledGraph
+from algo.landmarks import UNREACHABLE
+
+# Next hop of the target itself
+NO_NEXT_HOP: int = -1
+# Targets whose queries are counted, per tree the cache can keep
+COUNTED_TARGETS_PER_TREE: int = 4
+
+
+@dataclass
+class TargetTree:
+    """
+    The reverse shortest-path tree of one target: for every index that can
+    reach the target, its distance to the target in edge costs and the
+    neighbour to move to. Only those indices are stored, sorted, so a tree is
+    no larger than the part of the target's level it covers.
+
+    Attributes:
+        target_index (int): The index every route of the tree ends at.
+        level (int): The level of the target.
+        indices (array): The indices that can reach the target, sorted.
+        distances (array): Cost to the target, parallel to indices.
+        next_hops (array): The position in indices of the next index towards the
+            target, parallel to indices, NO_NEXT_HOP for the target.
+    """
+    target_index: int
+    level: int
+    indices: array
+    distances: array
+    next_hops: array
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def distance_to_target(self, index: int) -> int:
+        """
+        Looks up the distance from an index to the target.
+
+        Args:
+            index (int): The index to look up.
+
+        Returns:
+            int: The cost to the target, UNREACHABLE if the index can't reach it.
+        """
+        position = bisect_left(self.indices, index)
+        if position < len(self.indices) and self.indices[position] == index:
+            return self.distances[position]
+        return UNREACHABLE
+
+    def get_route(self, start_index: int) -> Optional[List[int]]:
+        """
+        Follows the next hops from an index to the target.
+
+        Args:
+            start_index (int): The index to start from, on the target's level.
+
+        Returns:
+            Optional[List[int]]: The indices from the start to the target, None if the
+                target can't be reached.
+        """
+        indices, next_hops = self.indices, self.next_hops
+        position = bisect_left(indices, start_index)
+        if position == len(indices) or indices[position] != start_index:
+            return None
+        route: List[int] = [start_index]
+        while route[-1] != self.target_index:
+            position = next_hops[position]
+            route.append(indices[position])
+        return route
+
+
+class TargetTreeCache:
+    """
+    TargetTreeCache keeps the TargetTree of the targets queried most often, e.g.
+    VTUs, pick stations and charging spots. A target gets a tree once it was
+    queried hot_threshold times; the least recently used tree is evicted when
+    more than capacity are kept. Each tree costs 16 bytes per index that can
+    reach its target. Queries are counted for the COUNTED_TARGETS_PER_TREE
+    times capacity targets queried most recently.
+
+    Trees and query counts of a level are dropped whenever the level changes.
+    """
+
+    def __init__(self, graph: CompiledGraph, capacity: int = 16, hot_threshold: int = 3) -> None:
+        """
+        Initializes an empty cache.
+
+        Args:
+            graph (CompiledGraph): The compiled graph, kept in sync with the map by its router.
+            capacity (int): Most trees kept at once.
+            hot_threshold (int): Queries to a target before its tree is built.
+        """
+        self._graph = graph
+        self.capacity = capacity
+        self.hot_threshold = hot_threshold
+        self._trees: "OrderedDict[int, TargetTree]" = OrderedDict()
+        self._query_counts: "OrderedDict[int, int]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._trees)
+
+    def lookup(self, target_index: int) -> Optional[TargetTree]:
+        """
+        Records a query to a target and returns its tree, building it if the target
+        just became hot.
+
+        Args:
+            target_index (int): The index queried.
+
+        Returns:
+            Optional[TargetTree]: The tree of the target, None if it isn't hot (yet).
+        """
+        tree = self._trees.get(target_index)
+        if tree is not None:
+            self._trees.move_to_end(target_index)
+            return tree
+        if self.capacity <= 0:
+            return None
+        count = self._query_counts.pop(target_index, 0) + 1
+        if count < self.hot_threshold:
+            self._query_counts[target_index] = count
+            while len(self._query_counts) > self.capacity * COUNTED_TARGETS_PER_TREE:
+                self._query_counts.popitem(last=False)
+            return None
+        return self.build(target_index)
+
+    def build(self, target_index: int) -> TargetTree:
+        """
+        Builds and caches the tree of a target with one backward search, a
+        breadth-first search on unit-cost graphs and Dijkstra's otherwise,
+        evicting the least recently used tree if the cache is full.
+
+        Args:
+            target_index (int): The target to build the tree of.
+
+        Returns:
+            TargetTree: The tree of the target.
+        """
+        graph = self._graph
+        graph.compile_reverse()
+        reverse_offsets, reverse_targets = graph.reverse_offsets, graph.reverse_targets
+        # Moves stay on a level, so the search only visits the part of the target's level reaching it
+        distances: Dict[int, int] = {target_index: 0}
+        next_hops: Dict[int, int] = {target_index: NO_NEXT_HOP}
+
+        if graph.is_unit_cost:
+            queue = deque([target_index])
+            while queue:
+                current = queue.popleft()
+                next_distance = distances[current] + 1
+                for source in reverse_targets[reverse_offsets[current]:reverse_offsets[current + 1]]:
+                    if source not in distances:
+                        distances[source], next_hops[source] = next_distance, current
+                        queue.append(source)
+        else:
+            reverse_costs = graph.reverse_costs
+            open_list: List[Tuple[int, int]] = [(0, target_index)]
+            while open_list:
+                distance, current = heapq.heappop(open_list)
+                if distance > distances[current]:
+                    continue  # Skip stale heap entries
+                for position in range(reverse_offsets[current], reverse_offsets[current + 1]):
+                    source, next_distance = reverse_targets[position], distance + reverse_costs[position]
+                    if next_distance < distances.get(source, next_distance + 1):
+                        distances[source], next_hops[source] = next_distance, current
+                        heapq.heappush(open_list, (next_distance, source))
+
+        indices = array('q', sorted(distances))
+        positions = {index: position for position, index in enumerate(indices)}
+        positions[NO_NEXT_HOP] = NO_NEXT_HOP
+        tree = TargetTree(
+            target_index,
+            graph.zs[target_index],
+            indices,
+            array('i', [distances[index] for index in indices]),
+            array('i', [positions[next_hops[index]] for index in indices])
+        )
+        self._trees[target_index] = tree
+        while len(self._trees) > self.capacity:
+            self._trees.popitem(last=False)
+        return tree
+
+    def invalidate(self, levels: Iterable[int]) -> None:
+        """
+        Drops the trees and query counts of the levels that changed.
+
+        Args:
+            levels (Iterable[int]): The changed levels.
+        """
+        levels = set(levels)
+        zs = self._graph.zs
+        for target_index in [index for index, tree in self._trees.items() if tree.level in levels]:
+            del self._trees[target_index]
+        for target_index in [index for index in self._query_counts if zs[index] in levels]:
+            del self._query_counts[target_index]
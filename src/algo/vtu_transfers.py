@@ -0,0 +1,212 @@
+from array import array
+from typing import Iterable, List, Set, Tuple
+
+from algo.compiled_graph import CompiledGraph
+from algo.landmarks import UNREACHABLE, _breadth_first, _dijkstra
+from algo_types.map_interfaces import MapNodeTypes
+from algo_types.grid_map_types import NODE_TYPE_CODES
+
+# Index of a VTU slot left empty, on levels with fewer VTUs than slots
+NO_VTU: int = -1
+
+
+class VTUTransferTables:
+    """
+    VTUTransferTables holds, for every VTU, the same-level distances from each
+    cell of its level to the VTU and from the VTU to each cell. A cross-level
+    query then only compares table entries to pick the VTU pair with the lowest
+    total cost. The legs are read off the tables too: from any cell a neighbour
+    closer to the VTU by exactly the cost of the move onto it is always on a
+    shortest path. Distances are in the graph's edge costs.
+
+    Like LandmarkTables, every level gets the same number of slots and distance
+    arrays are slot-major: entry slot * indices_length + v holds the distance of
+    v for the slot's VTU on v's level. Distances must be exact, so any change on
+    a level marks it stale; stale levels are rebuilt on their next query.
+    """
+
+    def __init__(
+        self,
+        vtus: array,
+        distances_to: array,
+        distances_from: array,
+        vtus_per_level: int
+    ) -> None:
+        """
+        Initializes the tables from their arrays.
+
+        Args:
+            vtus (array): VTU index of every (level, slot), level-major, NO_VTU for empty slots.
+            distances_to (array): d(v, VTU) for every slot and index.
+            distances_from (array): d(VTU, v) for every slot and index.
+            vtus_per_level (int): Number of VTU slots per level.
+        """
+        self.vtus = vtus
+        self.distances_to = distances_to
+        self.distances_from = distances_from
+        self.vtus_per_level = vtus_per_level
+        self.indices_length: int = len(distances_to) // vtus_per_level if vtus_per_level else 0
+        self._stale_levels: Set[int] = set()
+
+    @classmethod
+    def build(cls, graph: CompiledGraph, level_nums: int) -> "VTUTransferTables":
+        """
+        Computes the tables of every VTU of the graph.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            level_nums (int): Number of levels of the map.
+
+        Returns:
+            VTUTransferTables: The tables of every level.
+        """
+        tables = cls(array('q'), array('i'), array('i'), 0)
+        for level in range(level_nums):
+            tables.rebuild_level(graph, level)
+        return tables
+
+    def rebuild_level(self, graph: CompiledGraph, level: int) -> None:
+        """
+        Recomputes the tables of a level, picking up VTUs added or removed since.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            level (int): The level to rebuild.
+        """
+        vtu_code = NODE_TYPE_CODES[MapNodeTypes.VTU.value]
+        zs, node_codes = graph.zs, graph.node_codes
+        level_indices = [
+            index for index in range(graph.get_nodes_length()) if zs[index] == level and graph.has_node(index)
+        ]
+        level_vtus = [index for index in level_indices if node_codes[index] == vtu_code]
+        self._fit(graph.get_nodes_length(), max(self.vtus_per_level, len(level_vtus)), level + 1)
+
+        first_slot = level * self.vtus_per_level
+        graph.compile_reverse()
+        for slot in range(self.vtus_per_level):
+            start = slot * self.indices_length
+            for index in level_indices:
+                self.distances_to[start + index] = self.distances_from[start + index] = UNREACHABLE
+            vtu = level_vtus[slot] if slot < len(level_vtus) else NO_VTU
+            self.vtus[first_slot + slot] = vtu
+            if vtu == NO_VTU:
+                continue
+            if graph.is_unit_cost:
+                distances_to = _breadth_first(graph.reverse_offsets, graph.reverse_targets, vtu)
+                distances_from = _breadth_first(graph.offsets, graph.targets, vtu)
+            else:
+                distances_to = _dijkstra(graph.reverse_offsets, graph.reverse_targets, graph.reverse_costs, vtu)
+                distances_from = _dijkstra(graph.offsets, graph.targets, graph.costs, vtu)
+            for index, distance in distances_to.items():
+                self.distances_to[start + index] = distance
+            for index, distance in distances_from.items():
+                self.distances_from[start + index] = distance
+        self._stale_levels.discard(level)
+
+    def invalidate(self, levels: Iterable[int]) -> None:
+        """
+        Marks levels whose layout or blockers changed as stale.
+
+        Args:
+            levels (Iterable[int]): The changed levels.
+        """
+        self._stale_levels.update(levels)
+
+    def is_stale(self, level: int) -> bool:
+        """
+        Checks whether a level changed since its tables were computed.
+        """
+        return level in self._stale_levels
+
+    def get_vtus(self, level: int) -> List[Tuple[int, int]]:
+        """
+        Returns the (slot, VTU index) of every VTU of a level.
+        """
+        first_slot = level * self.vtus_per_level
+        return [
+            (slot, self.vtus[first_slot + slot])
+            for slot in range(self.vtus_per_level)
+            if first_slot + slot < len(self.vtus) and self.vtus[first_slot + slot] != NO_VTU
+        ]
+
+    def distance_to(self, slot: int, index: int) -> int:
+        """
+        Returns d(index, VTU) for the VTU of a slot on the index's level, UNREACHABLE if none.
+        """
+        return self.distances_to[slot * self.indices_length + index]
+
+    def distance_from(self, slot: int, index: int) -> int:
+        """
+        Returns d(VTU, index) for the VTU of a slot on the index's level, UNREACHABLE if none.
+        """
+        return self.distances_from[slot * self.indices_length + index]
+
+    def walk_to(self, graph: CompiledGraph, slot: int, index: int) -> List[int]:
+        """
+        Returns a shortest path from an index to the VTU of a slot, following
+        neighbours whose distance to the VTU is less by the cost of the move.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            slot (int): The slot of the VTU on the index's level.
+            index (int): The index to start from, which must reach the VTU.
+
+        Returns:
+            List[int]: The indices from the index to the VTU.
+        """
+        return self._walk(graph.offsets, graph.targets, graph.costs, self.distances_to, slot, index)
+
+    def walk_from(self, graph: CompiledGraph, slot: int, index: int) -> List[int]:
+        """
+        Returns a shortest path from the VTU of a slot to an index, following
+        predecessors whose distance from the VTU is less by the cost of the move.
+
+        Args:
+            graph (CompiledGraph): The compiled graph of the map.
+            slot (int): The slot of the VTU on the index's level.
+            index (int): The index to reach, which the VTU must reach.
+
+        Returns:
+            List[int]: The indices from the VTU to the index.
+        """
+        graph.compile_reverse()
+        path = self._walk(graph.reverse_offsets, graph.reverse_targets, graph.reverse_costs, self.distances_from, slot, index)
+        path.reverse()
+        return path
+
+    def _walk(self, offsets, targets, costs, distances: array, slot: int, index: int) -> List[int]:
+        start = slot * self.indices_length
+        path: List[int] = [index]
+        distance = distances[start + index]
+        while distance > 0:
+            current = path[-1]
+            distance, neighbor = next(
+                (distance - costs[position], targets[position])
+                for position in range(offsets[current], offsets[current + 1])
+                if costs[position] <= distance and distances[start + targets[position]] == distance - costs[position]
+            )
+            path.append(neighbor)
+        return path
+
+    def _fit(self, indices_length: int, vtus_per_level: int, level_nums: int) -> None:
+        # Re-lay the arrays when the graph grew or a level holds more VTUs than there are slots
+        old_indices_length, old_vtus_per_level = self.indices_length, self.vtus_per_level
+        if indices_length > old_indices_length or vtus_per_level > old_vtus_per_level:
+            indices_length = max(indices_length, old_indices_length)
+            for name in ("distances_to", "distances_from"):
+                old = getattr(self, name)
+                new = array('i', [UNREACHABLE]) * (indices_length * vtus_per_level)
+                for slot in range(old_vtus_per_level):
+                    new[slot * indices_length:slot * indices_length + old_indices_length] = (
+                        old[slot * old_indices_length:(slot + 1) * old_indices_length]
+                    )
+                setattr(self, name, new)
+            old_level_nums = len(self.vtus) // old_vtus_per_level if old_vtus_per_level else 0
+            vtus = array('q', [NO_VTU]) * (old_level_nums * vtus_per_level)
+            for level in range(old_level_nums):
+                vtus[level * vtus_per_level:level * vtus_per_level + old_vtus_per_level] = (
+                    self.vtus[level * old_vtus_per_level:(level + 1) * old_vtus_per_level]
+                )
+            self.vtus, self.indices_length, self.vtus_per_level = vtus, indices_length, vtus_per_level
+        if len(self.vtus) < level_nums * self.vtus_per_level:
+            self.vtus.extend(array('q', [NO_VTU]) * (level_nums * self.vtus_per_level - len(self.vtus)))
@@ -0,0 +1,428 @@
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+from dataclasses import dataclass, field, MISSING
+from uuid import UUID
+
+from algo_types.map_types import Map, Node, Coords, BoundingBox, MapChangeListener
+from algo_types.map_interfaces import MapNodeTypes
+
+# Byte codes stored in GridMap.node_types, 0 marks a cell without a node
+EMPTY_NODE_CODE: int = 0
+NODE_TYPE_CODES: Dict[str, int] = {
+    MapNodeTypes.Lane.value: 1,
+    MapNodeTypes.Aisle.value: 2,
+    MapNodeTypes.VTU.value: 3,
+}
+NODE_CODE_TYPES: Dict[int, str] = {code: node_type for node_type, code in NODE_TYPE_CODES.items()}
+
+# Node ids are stored as raw 16 byte UUIDs
+NODE_ID_SIZE: int = 16
+
+
+@dataclass(frozen=True)
+class GridMap:
+    """
+    Represents a map as a dense lanes x aisles x levels grid. Node types are kept
+    in a packed byte array and node ids in a parallel byte array, both addressed
+    by the flat cell index x * A * L + y * L + z. Node objects are only created
+    when a caller asks for one, so GridMap can stand in for Map on large maps.
+
+    Attributes:
+        lanes_nums (int): Number of lanes in the map.
+        aisle_nums (int): Number of aisles in the map.
+        level_nums (int): Number of levels in the map.
+        map_id (str): The unique identifier of the map.
+        node_types (bytearray): One type code per cell (see NODE_TYPE_CODES).
+        node_ids (bytearray): NODE_ID_SIZE bytes of UUID per cell.
+
+    Both arrays may also be mmap objects, as returned by load_map_snapshot.
+    """
+    lanes_nums: int
+    aisle_nums: int
+    level_nums: int
+    map_id: str
+    node_types: bytearray = field(default=MISSING, repr=False)
+    node_ids: bytearray = field(default=MISSING, repr=False)
+    _id_index: Dict[int, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _blocked_indices: Set[int] = field(default_factory=set, init=False, repr=False, compare=False)
+    _change_listeners: List[MapChangeListener] = field(default_factory=list, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """
+        Validates that the packed arrays match the grid dimensions.
+        """
+        cells_nums = self.lanes_nums * self.aisle_nums * self.level_nums
+        if len(self.node_types) != cells_nums or len(self.node_ids) != cells_nums * NODE_ID_SIZE:
+            raise ValueError(f"GridMap arrays don't match a {self.lanes_nums}x{self.aisle_nums}x{self.level_nums} grid")
+
+    @classmethod
+    def empty(cls, lanes_nums: int, aisle_nums: int, level_nums: int, map_id: str) -> "GridMap":
+        """
+        Creates a GridMap of the given dimensions without any nodes.
+
+        Returns:
+            GridMap: A map where every cell is empty.
+        """
+        cells_nums = lanes_nums * aisle_nums * level_nums
+        return cls(
+            lanes_nums=lanes_nums,
+            aisle_nums=aisle_nums,
+            level_nums=level_nums,
+            map_id=map_id,
+            node_types=bytearray(cells_nums),
+            node_ids=bytearray(cells_nums * NODE_ID_SIZE),
+        )
+
+    @classmethod
+    def from_map(cls, map: Map) -> "GridMap":
+        """
+        Packs an existing Map into a GridMap.
+
+        Args:
+            map (Map): The map to convert.
+
+        Returns:
+            GridMap: A GridMap holding the same nodes as the given map.
+        """
+        grid_map = cls.empty(map.lanes_nums, map.aisle_nums, map.level_nums, map.map_id)
+        for node in map.coordinates.values():
+            grid_map.set_node(node.coords.x, node.coords.y, node.coords.z, node.node_type, node.id)
+        blocked_coords = [map.get_node_by_index(index).coords for index in map.get_blocked_indices()]
+        grid_map.block_indices(grid_map.flat_index(coords.x, coords.y, coords.z) for coords in blocked_coords)
+        return grid_map
+
+    @property
+    def coordinates(self) -> "GridMapCoordinates":
+        """
+        Read-only view mapping node ids to Node objects, matching Map.coordinates.
+        Nodes are created on access.
+        """
+        return GridMapCoordinates(self)
+
+    def flat_index(self, x: int, y: int, z: int) -> int:
+        """
+        Computes the flat cell index of a coordinate.
+
+        Returns:
+            int: The index of the cell in node_types.
+        """
+        return (x * self.aisle_nums + y) * self.level_nums + z
+
+    def coords_of(self, index: int) -> Tuple[int, int, int]:
+        """
+        Computes the coordinate of a flat cell index.
+
+        Returns:
+            Tuple[int, int, int]: The (x, y, z) coordinate of the cell.
+        """
+        xy, z = divmod(index, self.level_nums)
+        x, y = divmod(xy, self.aisle_nums)
+        return x, y, z
+
+    def add_change_listener(self, listener: MapChangeListener) -> None:
+        """
+        Registers a callback that is called with the changed coordinates every
+        time a cell is set, removed, retyped, blocked or unblocked.
+
+        Args:
+            listener (MapChangeListener): The callback to register.
+        """
+        self._change_listeners.append(listener)
+
+    def set_node(self, x: int, y: int, z: int, node_type: str, node_id: Union[int, str]) -> None:
+        """
+        Stores a node in the cell at the given coordinate, replacing any node there.
+
+        Args:
+            node_type (str): The node type, one of the MapNodeTypes values.
+            node_id (Union[int, str]): The UUID of the node, as a string or an integer.
+        """
+        index = self.flat_index(x, y, z)
+        id_int = UUID(node_id).int if isinstance(node_id, str) else node_id
+        self._id_index.pop(self._node_id_at(index), None)
+        self._blocked_indices.discard(index)
+        self.node_types[index] = NODE_TYPE_CODES[node_type]
+        self.node_ids[index * NODE_ID_SIZE:(index + 1) * NODE_ID_SIZE] = id_int.to_bytes(NODE_ID_SIZE, "big")
+        if self._id_index:
+            self._id_index[id_int] = index
+        self._notify_change([(x, y, z)])
+
+    def remove_node(self, node_id: Union[int, str]) -> Node:
+        """
+        Empties the cell holding a node.
+
+        Returns:
+            Node: The removed node.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        index = self.get_node_index(node_id)
+        node = self._node_at(index)
+        self._id_index.pop(node.id, None)
+        self._blocked_indices.discard(index)
+        self.node_types[index] = EMPTY_NODE_CODE
+        self.node_ids[index * NODE_ID_SIZE:(index + 1) * NODE_ID_SIZE] = bytes(NODE_ID_SIZE)
+        self._notify_change([self.coords_of(index)])
+        return node
+
+    def retype_node(self, node_id: Union[int, str], node_type: str) -> Node:
+        """
+        Changes the type of a node, keeping its id and cell.
+
+        Returns:
+            Node: The retyped node.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        index = self.get_node_index(node_id)
+        self.node_types[index] = NODE_TYPE_CODES[node_type]
+        self._notify_change([self.coords_of(index)])
+        return self._node_at(index)
+
+    def block_node(self, node_id: Union[int, str]) -> None:
+        """
+        Marks a node as blocked, e.g. by a pallet or a stalled robot.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        index = self.get_node_index(node_id)
+        self._blocked_indices.add(index)
+        self._notify_change([self.coords_of(index)])
+
+    def unblock_node(self, node_id: Union[int, str]) -> None:
+        """
+        Clears the blocked mark of a node.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        index = self.get_node_index(node_id)
+        self._blocked_indices.discard(index)
+        self._notify_change([self.coords_of(index)])
+
+    def is_blocked(self, index: int) -> bool:
+        """
+        Checks whether the node at a dense (flat cell) index is blocked.
+
+        Returns:
+            bool: True if the node is blocked, otherwise False.
+        """
+        return index in self._blocked_indices
+
+    def get_blocked_indices(self) -> List[int]:
+        """
+        Lists the dense (flat cell) indices of every blocked node.
+
+        Returns:
+            List[int]: The blocked indices, sorted.
+        """
+        return sorted(self._blocked_indices)
+
+    def block_indices(self, indices: Iterable[int]) -> None:
+        """
+        Marks the nodes at dense (flat cell) indices as blocked, e.g. to restore
+        the blocked nodes of a snapshot.
+
+        Args:
+            indices (Iterable[int]): The indices of the nodes to block.
+
+        Raises:
+            KeyError: If a cell holds no node.
+        """
+        indices = list(indices)
+        for index in indices:
+            if self.node_types[index] == EMPTY_NODE_CODE:
+                raise KeyError(f"No node at index {index}")
+        self._blocked_indices.update(indices)
+        self._notify_change([self.coords_of(index) for index in indices])
+
+    def _notify_change(self, changed_coords: List[Tuple[int, int, int]]) -> None:
+        for listener in self._change_listeners:
+            listener(changed_coords)
+
+    def _node_id_at(self, index: int) -> int:
+        return int.from_bytes(self.node_ids[index * NODE_ID_SIZE:(index + 1) * NODE_ID_SIZE], "big")
+
+    def _node_at(self, index: int) -> Node:
+        x, y, z = self.coords_of(index)
+        return Node(
+            id=self._node_id_at(index),
+            node_type=NODE_CODE_TYPES[self.node_types[index]],
+            coords=Coords(x=x, y=y, z=z),
+        )
+
+    def _iter_node_indices(self) -> Iterator[int]:
+        for code in NODE_CODE_TYPES:
+            yield from self._iter_indices_of_code(code)
+
+    def _iter_indices_of_code(self, code: int, start: int = 0, stop: Optional[int] = None, step: int = 1) -> Iterator[int]:
+        # bytearray.find walks the packed array in C, skipping non-matching cells quickly;
+        # strided ranges (one level, one lane of a box) are copied out with a C-level slice first
+        needle = bytes((code,))
+        cells = self.node_types if (start, stop, step) == (0, None, 1) else self.node_types[start:stop:step]
+        position = cells.find(needle)
+        while position != -1:
+            yield start + position * step
+            position = cells.find(needle, position + 1)
+
+    def get_node_by_coords(self, x: int, y: int, z: int) -> Union[Node, None]:
+        """
+        Retrieves a node based on its coordinates (x, y, z).
+
+        Returns:
+            Node or None: The Node object if found, otherwise None.
+        """
+        if not (0 <= x < self.lanes_nums and 0 <= y < self.aisle_nums and 0 <= z < self.level_nums):
+            return None
+        index = self.flat_index(x, y, z)
+        if self.node_types[index] == EMPTY_NODE_CODE:
+            return None
+        return self._node_at(index)
+
+    def get_node_by_id(self, node_id: Union[int, str]) -> Union[Node, None]:
+        """
+        Retrieves a node based on its UUID.
+
+        Args:
+            node_id (Union[int, str]): The UUID of the node, as an integer or a string.
+
+        Returns:
+            Node: The Node object if found.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        return self._node_at(self.get_node_index(node_id))
+
+    def get_node_index(self, node_id: Union[int, str]) -> int:
+        """
+        Retrieves the dense index of a node, which is its flat cell index. The
+        id -> index table is built on the first call and maintained by set_node.
+
+        Args:
+            node_id (Union[int, str]): The UUID of the node, as an integer or a string.
+
+        Returns:
+            int: The flat cell index of the node.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        if not self._id_index:
+            for index in self._iter_node_indices():
+                self._id_index[self._node_id_at(index)] = index
+        id_int = UUID(node_id).int if isinstance(node_id, str) else node_id
+        index = self._id_index.get(id_int)
+        if index is None:
+            raise KeyError(f"Node doesn't exist in Map with Id: {node_id}")
+        return index
+
+    def get_node_by_index(self, index: int) -> Union[Node, None]:
+        """
+        Retrieves a node based on its dense (flat cell) index.
+
+        Returns:
+            Node or None: The Node object if the cell holds one, otherwise None.
+        """
+        if self.node_types[index] == EMPTY_NODE_CODE:
+            return None
+        return self._node_at(index)
+
+    def get_index_by_coords(self, x: int, y: int, z: int) -> Union[int, None]:
+        """
+        Retrieves the dense index of the node at the given coordinates.
+
+        Returns:
+            int or None: The flat cell index if the cell holds a node, otherwise None.
+        """
+        if not (0 <= x < self.lanes_nums and 0 <= y < self.aisle_nums and 0 <= z < self.level_nums):
+            return None
+        index = self.flat_index(x, y, z)
+        return None if self.node_types[index] == EMPTY_NODE_CODE else index
+
+    def get_indices_length(self) -> int:
+        """
+        Returns the number of dense indices, which is the number of cells.
+
+        Returns:
+            int: The size an array indexed by node index must have.
+        """
+        return len(self.node_types)
+
+    def get_nodes_by_types(
+        self,
+        node_type: str,
+        level: Optional[int] = None,
+        bounding_box: Optional[BoundingBox] = None
+    ) -> List[Node]:
+        """
+        Retrieves the nodes of a type, optionally restricted to a level and/or a
+        bounding box. Only the cells inside the restriction are scanned, as strided
+        slices of the packed type array.
+
+        Args:
+            node_type (str): The node type to look up.
+            level (Optional[int]): Only return nodes on this level (z).
+            bounding_box (Optional[BoundingBox]): Only return nodes with
+                min_x <= x <= max_x and min_y <= y <= max_y.
+
+        Returns:
+            List[Node]: The matching nodes.
+        """
+        code = NODE_TYPE_CODES.get(node_type)
+        if code is None:
+            return []
+
+        if bounding_box is None:
+            if level is None:
+                return [self._node_at(index) for index in self._iter_indices_of_code(code)]
+            return [self._node_at(index) for index in self._iter_indices_of_code(code, level, None, self.level_nums)]
+
+        min_x, min_y, max_x, max_y = bounding_box
+        min_x, min_y = max(min_x, 0), max(min_y, 0)
+        max_x, max_y = min(max_x, self.lanes_nums - 1), min(max_y, self.aisle_nums - 1)
+        nodes_to_return: List[Node] = []
+        for z in ([level] if level is not None else range(self.level_nums)):
+            for x in range(min_x, max_x + 1):
+                start = self.flat_index(x, min_y, z)
+                stop = self.flat_index(x, max_y, z) + 1
+                nodes_to_return.extend(self._node_at(index) for index in self._iter_indices_of_code(code, start, stop, self.level_nums))
+        return nodes_to_return
+
+    def get_map_length(self) -> int:
+        """
+        Returns the total number of nodes on the map.
+
+        Returns:
+            int: The number of nodes in the map.
+        """
+        if isinstance(self.node_types, bytearray):
+            return len(self.node_types) - self.node_types.count(EMPTY_NODE_CODE)
+        # mmap has no count(), walk the empty cells instead
+        return len(self.node_types) - sum(1 for _ in self._iter_indices_of_code(EMPTY_NODE_CODE))
+
+
+class GridMapCoordinates(Mapping):
+    """
+    Mapping view over a GridMap that behaves like Map.coordinates, creating
+    Node objects only when they are read.
+    """
+
+    def __init__(self, grid_map: GridMap) -> None:
+        self._grid_map = grid_map
+
+    def __getitem__(self, node_id: int) -> Node:
+        return self._grid_map.get_node_by_id(node_id)
+
+    def __iter__(self) -> Iterator[int]:
+        for index in self._grid_map._iter_node_indices():
+            yield self._grid_map._node_id_at(index)
+
+    def __len__(self) -> int:
+        return self._grid_map.get_map_length()
+
+    def values(self) -> Iterator[Node]:
+        for index in self._grid_map._iter_node_indices():
+            yield self._grid_map._node_at(index)
@@ -1,15 +1,29 @@
-from typing import Literal, Dict, Union, List 
+from typing import Literal, Dict, Union, List, Tuple, Optional, Callable, Set
 from dataclasses import dataclass, field, MISSING
+from bisect import bisect_left, bisect_right, insort
+from array import array
 import uuid
 from uuid import UUID
+from bidict import bidict
+from algo_types.map_interfaces import MapNodeTypes
 
 # Define the allowed node types
 NodeTypes = Literal["Aisle", "Lane", "VTU"]
 
-@dataclass
+# (min_x, min_y, max_x, max_y), inclusive
+BoundingBox = Tuple[int, int, int, int]
+
+# Called with the (x, y, z) coordinates whose node was added, removed or retyped
+MapChangeListener = Callable[[List[Tuple[int, int, int]]], None]
+
+# Shared node type strings, so every node of a type references the same string object
+NODE_TYPE_CONSTANTS: Dict[str, str] = {node_type.value: node_type.value for node_type in MapNodeTypes}
+
+@dataclass(frozen=True, slots=True)
 class Coords:
     """
-    Represents the coordinates of a node on the map.
+    Represents the coordinates of a node on the map. Coords are immutable and
+    slotted to keep per-node memory small.
     
     Attributes:
         x (int): The x-coordinate.
@@ -33,37 +47,58 @@ class Coords:
             raise NotImplemented
         return self.x == value.x and self.y == value.y and self.z == value.z
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Node:
     """
     Represents a node on the map. Each node is identified by its unique id (UUID) 
-    and has a specific type (either 'Aisle' or 'Lane').
+    and has a specific type (either 'Aisle' or 'Lane'). Nodes are immutable and
+    slotted; the id is only stored as an integer and the UUID string is rendered
+    on first access.
 
     Attributes:
         coords (Coords): The coordinates of the node.
         node_type (NodeTypes): The type of the node ('Aisle' or 'Lane').
-        id (str): The string UUID of the node, converted to an integer.
-        uuid (str): The original string UUID.
+        id (int): The UUID of the node, converted to an integer.
     """
     coords: Coords
     node_type: NodeTypes = field(default=MISSING, compare=False)
-    id: str = field(default=MISSING, compare=True)
-    uuid: str = field(default=MISSING, compare=False)
+    id: int = field(default=MISSING, compare=True)
+    _uuid: Optional[str] = field(default=None, compare=False, repr=False)
 
-    def __init__(self, id: str, node_type: NodeTypes, coords: Coords) -> None:
+    def __init__(self, id: Union[str, int], node_type: NodeTypes, coords: Coords) -> None:
         """
         Initializes the Node with an id, node_type, and coordinates.
         
         Args:
-            id (str): The UUID of the node.
+            id (Union[str, int]): The UUID of the node, as a string or as its integer value.
             node_type (NodeTypes): The type of the node ('Aisle' or 'Lane').
             coords (Coords): The coordinates of the node.
         """
-        uuid_conversion = UUID(id)
-        object.__setattr__(self, 'id', uuid_conversion.int)
-        object.__setattr__(self, 'node_type', node_type)
+        object.__setattr__(self, 'id', UUID(id).int if isinstance(id, str) else id)
+        object.__setattr__(self, 'node_type', NODE_TYPE_CONSTANTS.get(node_type, node_type))
         object.__setattr__(self, 'coords', coords)
-        object.__setattr__(self, 'uuid', id)
+        object.__setattr__(self, '_uuid', None)
+
+    @property
+    def uuid(self) -> str:
+        """
+        The string form of the node UUID, rendered lazily and cached on the node.
+
+        Returns:
+            str: The UUID string of the node.
+        """
+        if self._uuid is None:
+            object.__setattr__(self, '_uuid', str(UUID(int=self.id)))
+        return self._uuid
+
+    def __hash__(self) -> int:
+        """
+        Hashes the node by its id, consistent with __eq__.
+
+        Returns:
+            int: The hash of the node id.
+        """
+        return hash(self.id)
 
     def __eq__(self, value: object) -> bool:
         """
@@ -103,28 +138,193 @@ class Map:
         aisle_nums (int): Number of aisles in the map.
         map_id (str): The unique identifier of the map.
         coordinates (Dict[str, Node]): A dictionary mapping node IDs to Node objects.
+
+    Every node also gets a dense index in 0..N-1, kept in a bidirectional
+    node id <-> index mapping, so routing code can run on small integers. The
+    index of a removed node is reused by the next added node. Nodes are also
+    indexed per type, level and lane so typed lookups don't scan the map.
+    Blocked nodes (pallets, stalled robots) stay on the map but can't be
+    moved onto.
     """
     lanes_nums: int
     aisle_nums: int
     level_nums: int 
     map_id: str
     coordinates: Dict[str, Node] = field(default_factory=dict)
+    _coords_index: Dict[Tuple[int, int, int], Node] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _node_indices: bidict = field(default_factory=bidict, init=False, repr=False, compare=False)
+    _free_indices: List[int] = field(default_factory=list, init=False, repr=False, compare=False)
+    _type_index: Dict[str, Dict[int, Dict[int, List[int]]]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _blocked_indices: Set[int] = field(default_factory=set, init=False, repr=False, compare=False)
+    _change_listeners: List[MapChangeListener] = field(default_factory=list, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """
+        Builds the coordinate index, the dense node indices and the per-type
+        index once when the map is constructed, so that lookups no longer scan
+        every node on the map.
+        """
+        # One bulk bidict update, per-item bidict inserts are comparatively slow
+        self._node_indices.update((node.id, index) for index, node in enumerate(self.coordinates.values()))
+        for node in self.coordinates.values():
+            self._index_node(node)
+
+    def _index_node(self, node: Node, index: Optional[int] = None) -> None:
+        x, y, z = node.coords.x, node.coords.y, node.coords.z
+        self._coords_index[(x, y, z)] = node
+        if index is not None:
+            self._node_indices[node.id] = index
+        insort(self._type_index.setdefault(node.node_type, {}).setdefault(z, {}).setdefault(x, []), y)
+
+    def _unindex_node(self, node: Node) -> int:
+        x, y, z = node.coords.x, node.coords.y, node.coords.z
+        del self._coords_index[(x, y, z)]
+        levels = self._type_index[node.node_type]
+        lane = levels[z][x]
+        del lane[bisect_left(lane, y)]
+        if not lane:
+            del levels[z][x]
+        return self._node_indices.pop(node.id)
+
+    def add_change_listener(self, listener: MapChangeListener) -> None:
+        """
+        Registers a callback that is called with the changed coordinates every
+        time a node is added, removed, retyped, blocked or unblocked.
+
+        Args:
+            listener (MapChangeListener): The callback to register.
+        """
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, changed_coords: List[Tuple[int, int, int]]) -> None:
+        for listener in self._change_listeners:
+            listener(changed_coords)
+
+    def block_node(self, node_id: int) -> None:
+        """
+        Marks a node as blocked, e.g. by a pallet or a stalled robot.
+
+        Args:
+            node_id (int): The integer UUID of the node.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        node = self.get_node_by_id(node_id)
+        self._blocked_indices.add(self._node_indices[node_id])
+        self._notify_change([(node.coords.x, node.coords.y, node.coords.z)])
+
+    def unblock_node(self, node_id: int) -> None:
+        """
+        Clears the blocked mark of a node.
+
+        Args:
+            node_id (int): The integer UUID of the node.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        node = self.get_node_by_id(node_id)
+        self._blocked_indices.discard(self._node_indices[node_id])
+        self._notify_change([(node.coords.x, node.coords.y, node.coords.z)])
+
+    def is_blocked(self, index: int) -> bool:
+        """
+        Checks whether the node at a dense index is blocked.
+
+        Returns:
+            bool: True if the node is blocked, otherwise False.
+        """
+        return index in self._blocked_indices
+
+    def get_blocked_indices(self) -> List[int]:
+        """
+        Lists the dense indices of every blocked node.
+
+        Returns:
+            List[int]: The blocked indices, sorted.
+        """
+        return sorted(self._blocked_indices)
+
+    def add_node(self, node: Node) -> int:
+        """
+        Adds a node to the map and to every index.
+
+        Args:
+            node (Node): The node to add.
+
+        Returns:
+            int: The dense index given to the node.
+
+        Raises:
+            ValueError: If a node already exists with the same id or coordinates.
+        """
+        coords = (node.coords.x, node.coords.y, node.coords.z)
+        if node.id in self.coordinates or coords in self._coords_index:
+            raise ValueError(f"Node already exists in Map at {node.coords} or with Id: {node.id}")
+        index = self._free_indices.pop() if self._free_indices else len(self._node_indices)
+        self.coordinates[node.id] = node
+        self._index_node(node, index)
+        self._notify_change([coords])
+        return index
+
+    def remove_node(self, node_id: int) -> Node:
+        """
+        Removes a node from the map and from every index. Its dense index is
+        reused by the next added node.
+
+        Args:
+            node_id (int): The integer UUID of the node.
+
+        Returns:
+            Node: The removed node.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        node = self.get_node_by_id(node_id)
+        del self.coordinates[node_id]
+        index = self._unindex_node(node)
+        self._blocked_indices.discard(index)
+        self._free_indices.append(index)
+        self._notify_change([(node.coords.x, node.coords.y, node.coords.z)])
+        return node
+
+    def retype_node(self, node_id: int, node_type: NodeTypes) -> Node:
+        """
+        Changes the type of a node. The node keeps its id, coordinates and index.
+
+        Args:
+            node_id (int): The integer UUID of the node.
+            node_type (NodeTypes): The new type of the node.
+
+        Returns:
+            Node: The retyped node, which replaces the old one on the map.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        node = self.get_node_by_id(node_id)
+        retyped_node = Node(id=node.id, node_type=node_type, coords=node.coords)
+        self.coordinates[node_id] = retyped_node
+        self._index_node(retyped_node, self._unindex_node(node))
+        self._notify_change([(node.coords.x, node.coords.y, node.coords.z)])
+        return retyped_node
 
     def get_node_by_coords(self, x: int, y: int, z: int) -> Union[Node, None]:
         """
-        Retrieves a node based on its coordinates (x, y).
+        Retrieves a node based on its coordinates (x, y, z) using the coordinate
+        index, in constant time.
 
         Args:
             x (int): The x-coordinate of the node.
             y (int): The y-coordinate of the node.
+            z (int): The z-coordinate (level) of the node.
 
         Returns:
             Node or None: The Node object if found, otherwise None.
         """
-        for value in self.coordinates.values():
-            if value.coords.x == x and value.coords.y == y and z == value.coords.z:
-                return value
-            
+        return self._coords_index.get((x, y, z))
 
     def get_node_by_id(self, node_id: str) -> Union[Node, None]:
         """
@@ -144,11 +344,101 @@ class Map:
             raise KeyError(f"Node doesn't exist in Map with Id: {node_id}")
         return node
 
-    def get_nodes_by_types(self, node_type: str) -> List[Node]: 
+    def get_node_index(self, node_id: int) -> int:
+        """
+        Retrieves the dense index of a node.
+
+        Args:
+            node_id (int): The integer UUID of the node.
+
+        Returns:
+            int: The dense index of the node.
+
+        Raises:
+            KeyError: If the node does not exist in the map.
+        """
+        index = self._node_indices.get(node_id)
+        if index is None:
+            raise KeyError(f"Node doesn't exist in Map with Id: {node_id}")
+        return index
+
+    def get_node_by_index(self, index: int) -> Union[Node, None]:
+        """
+        Retrieves a node based on its dense index.
+
+        Args:
+            index (int): The dense index of the node.
+
+        Returns:
+            Node or None: The Node object if found, otherwise None.
+        """
+        node_id = self._node_indices.inverse.get(index)
+        return None if node_id is None else self.coordinates.get(node_id)
+
+    def get_index_by_coords(self, x: int, y: int, z: int) -> Union[int, None]:
+        """
+        Retrieves the dense index of the node at the given coordinates.
+
+        Returns:
+            int or None: The dense index if a node is found, otherwise None.
+        """
+        node = self._coords_index.get((x, y, z))
+        return None if node is None else self._node_indices[node.id]
+
+    def get_indices_length(self) -> int:
+        """
+        Returns the number of dense indices, i.e. one more than the largest index.
+
+        Returns:
+            int: The size an array indexed by node index must have.
+        """
+        return len(self._node_indices) + len(self._free_indices)
+
+    def get_nodes_by_types(
+        self, 
+        node_type: str, 
+        level: Optional[int] = None, 
+        bounding_box: Optional[BoundingBox] = None
+    ) -> List[Node]: 
+        """
+        Retrieves the nodes of a type from the per-type index, optionally restricted
+        to a level and/or a bounding box. The cost grows with the number of nodes
+        returned, not with the size of the map.
+
+        Args:
+            node_type (str): The node type to look up.
+            level (Optional[int]): Only return nodes on this level (z).
+            bounding_box (Optional[BoundingBox]): Only return nodes with
+                min_x <= x <= max_x and min_y <= y <= max_y.
+
+        Returns:
+            List[Node]: The matching nodes, ordered by level, x and y.
+        """
+        levels = self._type_index.get(node_type, {})
         nodes_to_return: List[Node] = []
-        for node in self.coordinates.values(): 
-            if node.node_type == node_type: 
-                nodes_to_return.append(node)   
+
+        for z in ([level] if level is not None else sorted(levels)): 
+            lanes = levels.get(z)
+            if not lanes:
+                continue
+
+            if bounding_box is None:
+                for x in sorted(lanes):
+                    nodes_to_return.extend(self._coords_index[(x, y, z)] for y in lanes[x])
+                continue
+
+            min_x, min_y, max_x, max_y = bounding_box
+            # Walk whichever is shorter: the box's lanes or the lanes holding this type
+            if max_x - min_x + 1 <= len(lanes):
+                xs = range(min_x, max_x + 1)
+            else:
+                xs = sorted(x for x in lanes if min_x <= x <= max_x)
+            for x in xs: 
+                ys = lanes.get(x)
+                if ys: 
+                    nodes_to_return.extend(
+                        self._coords_index[(x, y, z)] for y in ys[bisect_left(ys, min_y):bisect_right(ys, max_y)]
+                    )
         return nodes_to_return       
 
     def get_map_length(self) -> int:
@@ -164,4 +454,53 @@ class Map:
 @dataclass
 class Path: 
     nodes: List[Node]
-    computation_time: float 
\ No newline at end of file
+    computation_time: float 
+    expanded_nodes: int = 0 
+
+@dataclass
+class DistanceMatrix:
+    """
+    The distances from a list of source nodes to a list of target nodes, as
+    returned by AstarRouting.distance_matrix. Paths are only built for the
+    pairs asked for, on first request.
+
+    Attributes:
+        sources (List[Node]): The nodes of the rows.
+        targets (List[Node]): The nodes of the columns.
+        distances (array): Row-major costs from each source to each target, -1
+            where the target can't be reached. Targets on another level include
+            the transfer cost of riding the VTU shaft, which the moves of their
+            path don't show.
+        find_path (Callable[[Node, Node], Path]): Builds the path of a pair.
+    """
+    sources: List[Node]
+    targets: List[Node]
+    distances: array
+    find_path: Callable[[Node, Node], Path] = field(repr=False)
+    _paths: Dict[Tuple[int, int], Path] = field(default_factory=dict, init=False, repr=False)
+
+    def get(self, row: int, column: int) -> Optional[int]:
+        """
+        Returns the distance from a source to a target, None if it can't be reached.
+        """
+        distance = self.distances[row * len(self.targets) + column]
+        return None if distance < 0 else distance
+
+    def get_row(self, row: int) -> array:
+        """
+        Returns the distances from a source to every target, -1 where unreachable.
+        """
+        return self.distances[row * len(self.targets):(row + 1) * len(self.targets)]
+
+    def get_path(self, row: int, column: int) -> Path:
+        """
+        Returns the path from a source to a target, building it on first request.
+
+        Raises:
+            PathNotFoundException: If the target can't be reached from the source.
+        """
+        path = self._paths.get((row, column))
+        if path is None:
+            path = self.find_path(self.sources[row], self.targets[column])
+            self._paths[(row, column)] = path
+        return path
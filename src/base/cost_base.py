@@ -0,0 +1,57 @@
+from abc import ABC, abstractmethod
+from typing import Tuple
+from algo_types.map_types import NodeTypes
+
+class CostModel(ABC):
+    """
+    The CostModel abstract base class defines the cost of every move a raft can
+    make on a map, e.g. its travel time. Classes that inherit from CostModel
+    must implement `get_move_cost` for moves on a level and `get_transfer_cost`
+    for VTU rides between levels, and may override `get_turn_cost` for changes
+    of direction, which only searches that track the heading charge. Costs are
+    integers, so pick a unit fine enough for the speeds involved (e.g. tenths
+    of a second). Every move must cost at least 1, which the compiled graph
+    checks when pricing its edges.
+    """
+
+    @abstractmethod
+    def get_move_cost(self, node_type: NodeTypes, next_node_type: NodeTypes, direction: Tuple[int, int, int]) -> int:
+        """
+        Abstract method to retrieve the cost of one move on a level.
+
+        Args:
+            node_type (NodeTypes): The type of the node moved from.
+            next_node_type (NodeTypes): The type of the node moved onto.
+            direction (Tuple[int, int, int]): The change in x, y and z coordinates.
+
+        Returns:
+            int: The cost of the move, at least 1.
+        """
+        pass
+
+    @abstractmethod
+    def get_transfer_cost(self, levels: int) -> int:
+        """
+        Abstract method to retrieve the cost of riding a VTU shaft.
+
+        Args:
+            levels (int): The number of levels ridden.
+
+        Returns:
+            int: The cost of the ride.
+        """
+        pass
+
+    def get_turn_cost(self, direction: Tuple[int, int, int], next_direction: Tuple[int, int, int]) -> int:
+        """
+        Retrieves the cost of changing direction between two consecutive moves.
+        Turns are free unless a model overrides this.
+
+        Args:
+            direction (Tuple[int, int, int]): The direction of the move made.
+            next_direction (Tuple[int, int, int]): The direction of the move that follows.
+
+        Returns:
+            int: The cost of the turn, 0 if the direction doesn't change.
+        """
+        return 0
@@ -0,0 +1,197 @@
+import mmap
+import struct
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple, Union
+
+from algo.compiled_graph import CompiledGraph, CompiledGraphArrays
+from algo.landmarks import LandmarkTables, LANDMARK_SECTIONS
+from algo_types.map_types import Map
+from algo_types.grid_map_types import GridMap
+
+# File layout (all integers little-endian, array sections in the byte order given by the flags):
+#   header      _HEADER: magic, version, flags, lanes, aisles, levels, number of sections
+#   directory   one _SECTION per section: name, array typecode, file offset, byte length
+#   sections    each starting on a SECTION_ALIGNMENT boundary, so it can be mapped on its own
+SNAPSHOT_MAGIC: bytes = b"PRMAPSNP"
+SNAPSHOT_VERSION: int = 1
+SECTION_ALIGNMENT: int = 65536  # A multiple of mmap.ALLOCATIONGRANULARITY on every platform
+FLAG_BIG_ENDIAN: int = 1
+
+_HEADER = struct.Struct("<8sHHIIII")
+_SECTION = struct.Struct("<24sc7xQQ")
+
+_GRAPH_SECTIONS: Dict[str, str] = {
+    "graph.node_codes": "B",
+    "graph.xs": "i",
+    "graph.ys": "i",
+    "graph.zs": "i",
+    "graph.offsets": "q",
+    "graph.targets": "q",
+}
+# Optional: without them the edges are priced again on load
+_GRAPH_COST_SECTIONS: Dict[str, str] = {
+    "graph.costs": "i",
+    "graph.cost_table": "q",
+}
+
+
+@dataclass
+class MapSnapshot:
+    """
+    A map loaded from a snapshot file.
+
+    Attributes:
+        map (GridMap): The map, its arrays mapped from the file.
+        compiled_graph_arrays (Optional[CompiledGraphArrays]): The precompiled
+            adjacency, if the snapshot holds one. Pass it to AstarRouting.
+        landmark_tables (Optional[LandmarkTables]): The ALT landmark tables, if the
+            snapshot holds them. AstarRouting.from_snapshot picks both up.
+        sections (Dict[str, Union[mmap.mmap, memoryview]]): Every section of the
+            file by name, including extra sections written by other components.
+    """
+    map: GridMap
+    compiled_graph_arrays: Optional[CompiledGraphArrays] = None
+    landmark_tables: Optional[LandmarkTables] = None
+    sections: Dict[str, Union[mmap.mmap, memoryview]] = field(default_factory=dict)
+
+
+def save_map_snapshot(
+    map: Union[Map, GridMap],
+    path: str,
+    compiled_graph: Optional[CompiledGraph] = None,
+    extra_sections: Optional[Dict[str, array]] = None,
+    landmark_tables: Optional[LandmarkTables] = None
+) -> None:
+    """
+    Writes a map, and optionally its compiled graph, to a versioned binary snapshot.
+    The blocked nodes are written with it, since the compiled graph has no moves
+    onto them.
+
+    Args:
+        map (Union[Map, GridMap]): The map to write. A Map is packed into a GridMap first.
+        path (str): The file to write.
+        compiled_graph (Optional[CompiledGraph]): A graph compiled for the map, written
+            with its edge costs. Graph rows are addressed by GridMap flat indices, so
+            it must come from a GridMap.
+        extra_sections (Optional[Dict[str, array]]): Further named arrays to store
+            next to the map, e.g. precomputed routing tables.
+        landmark_tables (Optional[LandmarkTables]): ALT tables built on the compiled graph.
+
+    Raises:
+        ValueError: If a compiled graph is given for a Map, or a section name is too long.
+    """
+    if isinstance(map, Map):
+        if compiled_graph is not None:
+            raise ValueError("Only graphs compiled for a GridMap can be written to a snapshot")
+        map = GridMap.from_map(map)
+
+    sections: Dict[str, Tuple[str, object]] = {
+        "map_id": ("B", map.map_id.encode("utf-8")),
+        "node_types": ("B", map.node_types),
+        "node_ids": ("B", map.node_ids),
+        "blocked_indices": ("q", array("q", map.get_blocked_indices())),
+    }
+    if compiled_graph is not None:
+        graph_arrays = compiled_graph.get_arrays()
+        for name, typecode in {**_GRAPH_SECTIONS, **_GRAPH_COST_SECTIONS}.items():
+            sections[name] = (typecode, getattr(graph_arrays, name[len("graph."):]))
+    if landmark_tables is not None:
+        for name, values in landmark_tables.get_sections().items():
+            sections[name] = (LANDMARK_SECTIONS[name], values)
+    for name, values in (extra_sections or {}).items():
+        sections[name] = (values.typecode, values)
+
+    directory = bytearray()
+    offset = _align(_HEADER.size + _SECTION.size * len(sections))
+    for name, (typecode, values) in sections.items():
+        if len(name.encode("utf-8")) > 24:
+            raise ValueError(f"Snapshot section name is too long: {name}")
+        length = memoryview(values).nbytes
+        directory += _SECTION.pack(name.encode("utf-8"), typecode.encode("ascii"), offset, length)
+        offset = _align(offset + length)
+
+    flags = FLAG_BIG_ENDIAN if sys.byteorder == "big" else 0
+    with open(path, "wb") as snapshot_file:
+        snapshot_file.write(_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, flags, map.lanes_nums, map.aisle_nums, map.level_nums, len(sections)
+        ))
+        snapshot_file.write(directory)
+        for _, values in sections.values():
+            snapshot_file.seek(_align(snapshot_file.tell()))
+            snapshot_file.write(memoryview(values).cast("B"))
+        snapshot_file.truncate(_align(snapshot_file.tell()))
+
+
+def load_map_snapshot(path: str) -> MapSnapshot:
+    """
+    Loads a snapshot written by save_map_snapshot. Every section is memory-mapped
+    copy-on-write: nothing is read up front, and worker processes loading the
+    same file share one page-cache copy until they modify the map.
+
+    Args:
+        path (str): The snapshot file.
+
+    Returns:
+        MapSnapshot: The map with its nodes blocked as when saved, its compiled
+            graph arrays if stored, and all sections.
+
+    Raises:
+        ValueError: If the file is not a snapshot, or has another version or byte order.
+    """
+    with open(path, "rb") as snapshot_file:
+        magic, version, flags, lanes_nums, aisle_nums, level_nums, sections_nums = _HEADER.unpack(
+            snapshot_file.read(_HEADER.size)
+        )
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a map snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Map snapshot version {version} is not supported, expected {SNAPSHOT_VERSION}")
+        if bool(flags & FLAG_BIG_ENDIAN) != (sys.byteorder == "big"):
+            raise ValueError("Map snapshot was written on a machine with another byte order")
+
+        sections: Dict[str, Union[mmap.mmap, memoryview]] = {}
+        for _ in range(sections_nums):
+            raw_name, raw_typecode, offset, length = _SECTION.unpack(snapshot_file.read(_SECTION.size))
+            name, typecode = raw_name.rstrip(b"\0").decode("utf-8"), raw_typecode.decode("ascii")
+            sections[name] = _map_section(snapshot_file, typecode, offset, length)
+
+    grid_map = GridMap(
+        lanes_nums=lanes_nums,
+        aisle_nums=aisle_nums,
+        level_nums=level_nums,
+        map_id=bytes(sections["map_id"]).decode("utf-8"),
+        node_types=sections["node_types"],
+        node_ids=sections["node_ids"],
+    )
+    if "blocked_indices" in sections:
+        # The compiled graph was saved without moves onto them, so they must stay blocked
+        grid_map.block_indices(sections["blocked_indices"])
+
+    compiled_graph_arrays = None
+    if all(name in sections for name in _GRAPH_SECTIONS):
+        compiled_graph_arrays = CompiledGraphArrays(
+            **{name[len("graph."):]: sections[name] for name in _GRAPH_SECTIONS},
+            **{name[len("graph."):]: sections.get(name) for name in _GRAPH_COST_SECTIONS}
+        )
+
+    return MapSnapshot(
+        map=grid_map,
+        compiled_graph_arrays=compiled_graph_arrays,
+        landmark_tables=LandmarkTables.from_sections(sections, level_nums),
+        sections=sections,
+    )
+
+
+def _align(offset: int) -> int:
+    return -(-offset // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+
+
+def _map_section(snapshot_file, typecode: str, offset: int, length: int) -> Union[mmap.mmap, memoryview, bytearray]:
+    # Byte sections stay mmap objects, GridMap searches them with find()
+    if length == 0:
+        # mmap can't map zero bytes
+        return bytearray() if typecode == "B" else memoryview(array(typecode))
+    mapped = mmap.mmap(snapshot_file.fileno(), length, access=mmap.ACCESS_COPY, offset=offset)
+    return mapped if typecode == "B" else memoryview(mapped).cast(typecode)
@@ -0,0 +1,67 @@
+
+import random
+import time
+from typing import List, Tuple
+
+from generate_map import generate_map
+from algo.routings.a_star import AstarRouting
+from algo_exceptions.route_exceptions import PathNotFoundException
+
+# (lanes, aisles, levels) of the maps to compare, smallest first
+MAP_SIZES: List[Tuple[int, int, int]] = [(20, 20, 5), (50, 50, 10), (100, 100, 10), (200, 200, 10)]
+QUERIES_PER_MAP: int = 200
+QUERY_SPAN: int = 10
+
+
+def benchmark_coords_lookup(lanes_nums: int, aisle_nums: int, level_nums: int) -> Tuple[float, float]:
+    """
+    Times coordinate lookups and same-level A* queries on a map of the given size.
+    Queries are restricted to a fixed QUERY_SPAN x QUERY_SPAN window in the corner
+    of the map, so the work per query is the same for every map size. Unreachable
+    targets are left out of the query mean because their search floods the whole
+    reachable region, which does grow with the map.
+
+    Returns:
+        Tuple[float, float]: Mean lookup time and mean routed query time, in seconds.
+    """
+    seed = lanes_nums * aisle_nums * level_nums
+    rng = random.Random(seed)
+    grid_map = generate_map(lanes_nums, aisle_nums, level_nums, seed=seed)
+    astar = AstarRouting(grid_map)
+    astar.get_compiled_graph()  # Compile up front so it isn't charged to the first query
+
+    pairs = [
+        ((rng.randrange(QUERY_SPAN), rng.randrange(QUERY_SPAN)), (rng.randrange(QUERY_SPAN), rng.randrange(QUERY_SPAN)))
+        for _ in range(QUERIES_PER_MAP)
+    ]
+
+    start_time: float = time.perf_counter()
+    for (x, y), _ in pairs:
+        grid_map.get_node_by_coords(x, y, 0)
+    lookup_time: float = (time.perf_counter() - start_time) / len(pairs)
+
+    query_times: List[float] = []
+    for (sx, sy), (tx, ty) in pairs:
+        start_node = grid_map.get_node_by_coords(sx, sy, 0)
+        end_node = grid_map.get_node_by_coords(tx, ty, 0)
+        start_time = time.perf_counter()
+        try:
+            astar.find_path_on_same_level(start_node, end_node)
+        except PathNotFoundException:
+            continue
+        query_times.append(time.perf_counter() - start_time)
+    query_time: float = sum(query_times) / len(query_times) if query_times else 0.0
+
+    return lookup_time, query_time
+
+
+if __name__ == '__main__':
+    print("Coordinate index benchmark (query time should not grow with map size)")
+    print("--------------------------------------------------------------------------")
+    for lanes_nums, aisle_nums, level_nums in MAP_SIZES:
+        lookup_time, query_time = benchmark_coords_lookup(lanes_nums, aisle_nums, level_nums)
+        print(
+            f"map {lanes_nums}x{aisle_nums}x{level_nums} ({lanes_nums * aisle_nums * level_nums} nodes) | "
+            f"lookup: {lookup_time * 1e6:.2f} us | query: {query_time * 1e3:.3f} ms"
+        )
+    print("--------------------------------------------------------------------------")
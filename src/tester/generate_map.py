@@ -1,37 +1,155 @@
 import random
-from typing import Dict, List 
-from uuid import uuid4
+from typing import Dict, Optional, Sequence, Tuple
+from uuid import UUID
 from algo_types.map_types import Map, Node, Coords
+from algo_types.map_interfaces import MapNodeTypes
+from algo_types.grid_map_types import GridMap, NODE_TYPE_CODES, NODE_ID_SIZE
 
-# Function to generate a 3D map
-def generate_map(lanes_nums: int, aisle_nums: int, level_nums: int) -> Map:
-    coordinates: Dict[str, Node] = {}
-    vtu_objects: List[Node] = [] 
-    new_nodes: List[Node] = [] 
+# (x, y) of the VTU shafts, a VTU is placed at every level of each shaft
+DEFAULT_VTU_POSITIONS: Tuple[Tuple[int, int], ...] = ((6, 8),)
+
+# Maps a random byte onto a lane or aisle code, so node types can be drawn in bulk
+_RANDOM_BYTE_TO_CODE: bytes = bytes(
+    NODE_TYPE_CODES[MapNodeTypes.Aisle.value] if byte % 2 == 0 else NODE_TYPE_CODES[MapNodeTypes.Lane.value]
+    for byte in range(256)
+)
+
+
+def generate_grid_map(
+    lanes_nums: int,
+    aisle_nums: int,
+    level_nums: int,
+    seed: Optional[int] = None,
+    vtu_positions: Sequence[Tuple[int, int]] = DEFAULT_VTU_POSITIONS
+) -> GridMap:
+    """
+    Generates a 3D map straight into the packed GridMap representation. Node types
+    and ids are drawn in bulk from a seeded RNG, so the same seed always gives the
+    same map and a 10M cell map builds in seconds.
+
+    Args:
+        seed (Optional[int]): Seed of the RNG, None for a random map.
+        vtu_positions (Sequence[Tuple[int, int]]): (x, y) of the VTU shafts.
+
+    Returns:
+        GridMap: The generated map, every cell holding an aisle, lane or VTU node.
+
+    Raises:
+        ValueError: If a VTU position lies outside the map.
+    """
+    rng = random.Random(seed)
+    cells_nums = lanes_nums * aisle_nums * level_nums
+
+    node_types = bytearray(rng.randbytes(cells_nums).translate(_RANDOM_BYTE_TO_CODE))
+    node_ids = bytearray(rng.randbytes(cells_nums * NODE_ID_SIZE))
+    map_id = str(UUID(int=rng.getrandbits(128)))
+
+    grid_map = GridMap(
+        lanes_nums=lanes_nums,
+        aisle_nums=aisle_nums,
+        level_nums=level_nums,
+        map_id=map_id,
+        node_types=node_types,
+        node_ids=node_ids
+    )
+    _place_vtu_shafts(grid_map, vtu_positions)
+    return grid_map
+
+
+def generate_rack_grid_map(
+    lanes_nums: int,
+    aisle_nums: int,
+    level_nums: int,
+    seed: Optional[int] = None,
+    cross_lane_every: int = 10,
+    switch_every: int = 8,
+    vtu_positions: Sequence[Tuple[int, int]] = DEFAULT_VTU_POSITIONS
+) -> GridMap:
+    """
+    Generates a rack-style warehouse: aisle columns along y, crossed every
+    cross_lane_every rows by a lane row along x. Every switch_every cells of a
+    lane row is an aisle switch leading into the column, staggered from row to
+    row so the columns also lead back out onto the lanes. Unlike the random
+    maps, this layout has the long straight corridors of a real rack floor.
+
+    Args:
+        seed (Optional[int]): Seed of the RNG drawing the node ids, None for random ids.
+        cross_lane_every (int): Rows between two lane rows.
+        switch_every (int): Cells between two aisle switches of a lane row.
+        vtu_positions (Sequence[Tuple[int, int]]): (x, y) of the VTU shafts.
+
+    Returns:
+        GridMap: The generated map, every cell holding an aisle, lane or VTU node.
 
-    for x in range(level_nums):
-        vtu_object = Node(coords=Coords(x=6, y=8, z=x), node_type="vtu", id=str(uuid4()))
-        vtu_objects.append(vtu_object)
+    Raises:
+        ValueError: If a VTU position lies outside the map.
+    """
+    grid_map = generate_grid_map(lanes_nums, aisle_nums, level_nums, seed, vtu_positions=())
+    lane_code, aisle_code = NODE_TYPE_CODES[MapNodeTypes.Lane.value], NODE_TYPE_CODES[MapNodeTypes.Aisle.value]
 
     for x in range(lanes_nums):
+        column = bytearray()
         for y in range(aisle_nums):
-            for z in range(level_nums):
-                # Randomly assign the node type (Aisle or Lane)
-                node_type = random.choice(["aisle", "lane", ])
-                
-                if not any(coordinate.coords.x == x and coordinate.coords.y == y and coordinate.coords.z == z for coordinate in vtu_objects):
-                    node = Node(coords=Coords(x=x, y=y, z=z), node_type=node_type, id=str(uuid4()))
-                    new_nodes.append(node)
-
-    for vtu in vtu_objects: 
-        coordinates[vtu.id] = vtu   
-    
-    for node in new_nodes: 
-        coordinates[node.id] = node 
-                    
-    # Create and return the 3D Map object
+            row_index, in_row = divmod(y, cross_lane_every)
+            is_lane = in_row == 0 and (x + row_index) % switch_every != 0
+            column += bytes([lane_code if is_lane else aisle_code]) * level_nums
+        start = grid_map.flat_index(x, 0, 0)
+        grid_map.node_types[start:start + len(column)] = column
+
+    _place_vtu_shafts(grid_map, vtu_positions)
+    return grid_map
+
+
+def _place_vtu_shafts(grid_map: GridMap, vtu_positions: Sequence[Tuple[int, int]]) -> None:
+    """
+    Turns the cells of every VTU shaft into VTU nodes, on all levels.
+
+    Args:
+        grid_map (GridMap): The map to place the shafts in.
+        vtu_positions (Sequence[Tuple[int, int]]): (x, y) of the VTU shafts.
+
+    Raises:
+        ValueError: If a position lies outside the map.
+    """
+    for x, y in vtu_positions:
+        if not (0 <= x < grid_map.lanes_nums and 0 <= y < grid_map.aisle_nums):
+            raise ValueError(
+                f"VTU position {(x, y)} is outside the {grid_map.lanes_nums}x{grid_map.aisle_nums} map"
+            )
+    vtu_code = NODE_TYPE_CODES[MapNodeTypes.VTU.value]
+    for x, y in vtu_positions:
+        for z in range(grid_map.level_nums):
+            grid_map.node_types[grid_map.flat_index(x, y, z)] = vtu_code
 
-    return Map(lanes_nums=lanes_nums, aisle_nums=aisle_nums, level_nums=level_nums, map_id=str(uuid4()), coordinates=coordinates)
 
+# Function to generate a 3D map
+def generate_map(
+    lanes_nums: int,
+    aisle_nums: int,
+    level_nums: int,
+    seed: Optional[int] = None,
+    vtu_positions: Sequence[Tuple[int, int]] = DEFAULT_VTU_POSITIONS
+) -> Map:
+    """
+    Generates a 3D map of Node objects. Uses the same seeded RNG stream as
+    generate_grid_map, so both return the same layout and ids for a seed.
+
+    Args:
+        seed (Optional[int]): Seed of the RNG, None for a random map.
+        vtu_positions (Sequence[Tuple[int, int]]): (x, y) of the VTU shafts.
+
+    Returns:
+        Map: The generated map.
 
-# TODO avoid adding duplicate nodes
\ No newline at end of file
+    Raises:
+        ValueError: If a VTU position lies outside the map.
+    """
+    grid_map = generate_grid_map(lanes_nums, aisle_nums, level_nums, seed, vtu_positions)
+    coordinates: Dict[int, Node] = {}
+
+    for index in range(grid_map.get_indices_length()):
+        node = grid_map.get_node_by_index(index)
+        coordinates[node.id] = node
+
+    # Create and return the 3D Map object
+    return Map(lanes_nums=lanes_nums, aisle_nums=aisle_nums, level_nums=level_nums, map_id=grid_map.map_id, coordinates=coordinates)
@@ -0,0 +1,63 @@
+
+import os
+import sys
+import tempfile
+import time
+
+from generate_map import generate_grid_map
+from algo.routings.a_star import AstarRouting
+from algo_exceptions.route_exceptions import PathNotFoundException
+from mapper.map_snapshot import save_map_snapshot, load_map_snapshot
+
+# The 10M cell warehouse is snapshotted without its graph, compiling it in Python takes minutes
+MAP_SIZE = (1000, 1000, 10)
+GRAPH_MAP_SIZE = (200, 200, 10)
+
+
+def benchmark_snapshot(lanes_nums: int, aisle_nums: int, level_nums: int, with_graph: bool) -> None:
+    """
+    Saves a generated map to a snapshot, loads it back and routes a query on the
+    loaded map, printing the time taken by each step.
+    """
+    grid_map = generate_grid_map(lanes_nums, aisle_nums, level_nums, seed=1)
+    astar = AstarRouting(grid_map)
+    compiled_graph = astar.get_compiled_graph() if with_graph else None
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "map.snapshot")
+
+        start_time: float = time.perf_counter()
+        save_map_snapshot(grid_map, path, compiled_graph)
+        save_time: float = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        snapshot = load_map_snapshot(path)
+        load_time: float = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        vtu_nodes = snapshot.map.get_nodes_by_types("vtu", level=0)
+        lookup_time: float = time.perf_counter() - start_time
+
+        print(f"map {lanes_nums}x{aisle_nums}x{level_nums} ({lanes_nums * aisle_nums * level_nums} cells, graph: {with_graph})")
+        print(f"file size: {os.path.getsize(path) / 2**20:.1f} MiB | save: {save_time:.3f} s | load: {load_time * 1e3:.3f} ms")
+        print(f"first typed lookup on loaded map: {lookup_time * 1e3:.3f} ms ({len(vtu_nodes)} VTUs)")
+
+        if with_graph:
+            loaded_astar = AstarRouting(snapshot.map, snapshot.compiled_graph_arrays)
+            start_node = vtu_nodes[0]
+            end_node = snapshot.map.get_node_by_coords(10, 8, start_node.coords.z)
+            start_time = time.perf_counter()
+            try:
+                loaded_astar.find_path_on_same_level(start_node, end_node)
+            except PathNotFoundException:
+                pass
+            print(f"first query on loaded map: {(time.perf_counter() - start_time) * 1e3:.3f} ms")
+        print("--------------------------------------------------------------------------")
+
+
+if __name__ == '__main__':
+    print("Map snapshot benchmark")
+    print("--------------------------------------------------------------------------")
+    benchmark_snapshot(*GRAPH_MAP_SIZE, with_graph=True)
+    if "--small" not in sys.argv:
+        benchmark_snapshot(*MAP_SIZE, with_graph=False)
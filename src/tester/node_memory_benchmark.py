@@ -0,0 +1,68 @@
+
+import sys
+import tracemalloc
+import random
+from typing import Callable, List
+
+from algo_types.map_types import Node, Coords
+from algo_types.map_interfaces import MapNodeTypes
+from algo_types.grid_map_types import GridMap
+
+# Node counts to size; pass other counts on the command line, e.g. `node_memory_benchmark.py 100000 1000000`
+NODE_COUNTS: List[int] = [100_000, 1_000_000, 10_000_000]
+LEVEL_NUMS: int = 10
+AISLE_NUMS: int = 100
+NODE_TYPES: List[str] = [MapNodeTypes.Aisle.value, MapNodeTypes.Lane.value]
+
+
+def measure_bytes(build: Callable[[], object]) -> int:
+    """
+    Measures the memory still allocated by whatever `build` returns.
+
+    Returns:
+        int: The number of bytes held by the built object.
+    """
+    tracemalloc.start()
+    built = build()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return allocated
+
+
+def build_nodes(node_count: int) -> List[Node]:
+    """
+    Builds `node_count` Node objects laid out on a grid, the way a Map holds them.
+    """
+    rng = random.Random(node_count)
+    nodes: List[Node] = []
+    for index in range(node_count):
+        xy, z = divmod(index, LEVEL_NUMS)
+        x, y = divmod(xy, AISLE_NUMS)
+        nodes.append(Node(id=rng.getrandbits(128), node_type=rng.choice(NODE_TYPES), coords=Coords(x=x, y=y, z=z)))
+    return nodes
+
+
+def build_grid_map(node_count: int) -> GridMap:
+    """
+    Builds a GridMap with `node_count` cells, every one holding a node.
+    """
+    lanes_nums = -(-node_count // (AISLE_NUMS * LEVEL_NUMS))
+    grid_map = GridMap.empty(lanes_nums, AISLE_NUMS, LEVEL_NUMS, map_id="memory-benchmark")
+    grid_map.node_types[:node_count] = bytes([1]) * node_count
+    return grid_map
+
+
+if __name__ == '__main__':
+    node_counts = [int(arg) for arg in sys.argv[1:]] or NODE_COUNTS
+
+    print("Memory per node (Node objects include their Coords and 128-bit id)")
+    print("--------------------------------------------------------------------------")
+    for node_count in node_counts:
+        node_bytes = measure_bytes(lambda: build_nodes(node_count))
+        grid_bytes = measure_bytes(lambda: build_grid_map(node_count))
+        print(
+            f"{node_count} nodes | Node objects: {node_bytes / node_count:.1f} B/node ({node_bytes / 2**20:.1f} MiB) | "
+            f"GridMap: {grid_bytes / node_count:.1f} B/node ({grid_bytes / 2**20:.1f} MiB)"
+        )
+    print("--------------------------------------------------------------------------")
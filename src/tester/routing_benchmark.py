@@ -0,0 +1,256 @@
+
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from generate_map import generate_grid_map, generate_rack_grid_map
+from base.routing_base import PathRoutingBase
+from algo.routings.a_star import AstarRouting
+from algo.routings.jump_point import JumpPointRouting
+from algo.routings.hierarchical import HierarchicalRouting
+from algo.routings.contraction import ContractionHierarchyRouting
+from algo.routings.turn_aware import TurnAwareRouting
+from algo.costs import TravelTimeCostModel
+from algo_types.grid_map_types import GridMap
+from algo_types.map_types import Node
+from algo_exceptions.route_exceptions import PathNotFoundException, VTUNotFound
+
+# (lanes, aisles, levels) of the maps to run every scenario on, smallest first
+MAP_SIZES: List[Tuple[int, int, int]] = [(20, 20, 5), (50, 50, 10), (100, 100, 10)]
+SEEDS: List[int] = [1, 2, 3]
+QUERIES_PER_SCENARIO: int = 50
+SHORT_SPAN: int = 10
+# Random pairs tried per unreachable query before giving up on finding one
+UNREACHABLE_ATTEMPTS: int = 50
+
+# Routing engines to benchmark, by name
+ENGINES: Dict[str, Callable[[GridMap], PathRoutingBase]] = {
+    "astar": AstarRouting,
+    "bidirectional": lambda grid_map: AstarRouting(grid_map, bidirectional=True),
+    "astar-travel-time": lambda grid_map: AstarRouting(grid_map, cost_model=TravelTimeCostModel()),
+    "turn-aware": TurnAwareRouting,
+    "jps": JumpPointRouting,
+    "hpa": HierarchicalRouting,
+    "ch": ContractionHierarchyRouting,
+}
+# Map generators, by name: random cell types, or the corridors of a rack floor
+LAYOUTS: Dict[str, Callable[..., GridMap]] = {
+    "random": generate_grid_map,
+    "rack": generate_rack_grid_map,
+}
+
+# A query returns the number of expanded nodes, None if the router doesn't report it
+Query = Callable[[], Optional[int]]
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """
+    Returns the nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, -(-len(sorted_values) * percent // 100) - 1))
+    return sorted_values[int(rank)]
+
+
+def route_same_level(router: PathRoutingBase, start_node: Node, end_node: Node) -> Optional[int]:
+    """
+    Routes on one level, unreachable targets count as a completed query.
+    """
+    try:
+        return router.find_path_on_same_level(start_node, end_node).expanded_nodes
+    except PathNotFoundException:
+        return None
+
+
+def route_nearest_vtu(router: PathRoutingBase, start_node: Node) -> Optional[int]:
+    """
+    Looks up the closest VTU, which doesn't report expanded nodes.
+    """
+    try:
+        router.find_closest_vtu(start_node)
+    except VTUNotFound:
+        pass
+    return None
+
+
+def route_multi_level(router: PathRoutingBase, start_node: Node, end_node: Node) -> Optional[int]:
+    """
+    Routes across levels: to a VTU, up or down its shaft and on to the target.
+    """
+    try:
+        return router.find_path(start_node, end_node).expanded_nodes
+    except PathNotFoundException:
+        return None
+
+
+def build_scenarios(router: PathRoutingBase, grid_map: GridMap, rng: random.Random) -> Dict[str, List[Query]]:
+    """
+    Draws the queries of every scenario for one map. Endpoints are drawn up front
+    so every scenario runs the exact same queries in the timing and memory passes.
+    """
+    lanes_nums, aisle_nums, level_nums = grid_map.lanes_nums, grid_map.aisle_nums, grid_map.level_nums
+
+    def random_node(max_x: int, max_y: int, z: int, min_x: int = 0, min_y: int = 0) -> Node:
+        return grid_map.get_node_by_coords(rng.randrange(min_x, max_x), rng.randrange(min_y, max_y), z)
+
+    def pair_query(route: Callable[[PathRoutingBase, Node, Node], Optional[int]], start_node: Node, end_node: Node) -> Query:
+        return lambda: route(router, start_node, end_node)
+
+    scenarios: Dict[str, List[Query]] = {name: [] for name in (
+        "same_level_short", "same_level_long", "unreachable", "nearest_vtu", "multi_level"
+    )}
+    for _ in range(QUERIES_PER_SCENARIO):
+        z = rng.randrange(level_nums)
+        span_x, span_y = min(SHORT_SPAN, lanes_nums), min(SHORT_SPAN, aisle_nums)
+        scenarios["same_level_short"].append(pair_query(
+            route_same_level, random_node(span_x, span_y, z), random_node(span_x, span_y, z)
+        ))
+        # Opposite quarters of the level
+        scenarios["same_level_long"].append(pair_query(
+            route_same_level,
+            random_node(max(1, lanes_nums // 4), max(1, aisle_nums // 4), z),
+            random_node(lanes_nums, aisle_nums, z, lanes_nums * 3 // 4, aisle_nums * 3 // 4),
+        ))
+        # Kept only if the pair really has no path, found with an untimed search
+        for _ in range(UNREACHABLE_ATTEMPTS):
+            start_node, end_node = random_node(lanes_nums, aisle_nums, z), random_node(lanes_nums, aisle_nums, z)
+            try:
+                router.find_path_on_same_level(start_node, end_node)
+            except PathNotFoundException:
+                scenarios["unreachable"].append(pair_query(route_same_level, start_node, end_node))
+                break
+        start_node = random_node(lanes_nums, aisle_nums, z)
+        end_node = random_node(lanes_nums, aisle_nums, rng.randrange(level_nums))
+        scenarios["nearest_vtu"].append(lambda start_node=start_node: route_nearest_vtu(router, start_node))
+        scenarios["multi_level"].append(
+            pair_query(route_multi_level, start_node, end_node)
+        )
+    return scenarios
+
+
+def run_scenario(queries: List[Query]) -> Dict[str, object]:
+    """
+    Runs the queries of a scenario twice: once timed, once under tracemalloc to
+    get the peak memory of the worst query (tracing slows the queries down, so
+    it stays out of the timing pass).
+    """
+    latencies: List[float] = []
+    expanded: List[int] = []
+    for query in queries:
+        start_time: float = time.perf_counter()
+        expanded_nodes = query()
+        latencies.append(time.perf_counter() - start_time)
+        if expanded_nodes is not None:
+            expanded.append(expanded_nodes)
+
+    peak_memory: int = 0
+    tracemalloc.start()
+    for query in queries:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        query()
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "queries": len(queries),
+        "latency_ms": {
+            "mean": sum(latencies) / len(latencies) * 1e3 if latencies else 0.0,
+            "p50": percentile(latencies, 50) * 1e3,
+            "p95": percentile(latencies, 95) * 1e3,
+            "p99": percentile(latencies, 99) * 1e3,
+            "max": latencies[-1] * 1e3 if latencies else 0.0,
+        },
+        "expanded_nodes": {
+            "mean": sum(expanded) / len(expanded) if expanded else None,
+            "max": max(expanded) if expanded else None,
+        },
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def benchmark_map(
+    lanes_nums: int,
+    aisle_nums: int,
+    level_nums: int,
+    seed: int,
+    engine: str = "astar",
+    layout: str = "random"
+) -> Dict[str, object]:
+    """
+    Generates a seeded map, compiles it and runs every scenario on it.
+    """
+    grid_map = LAYOUTS[layout](
+        lanes_nums, aisle_nums, level_nums, seed=seed,
+        vtu_positions=((min(6, lanes_nums - 1), min(8, aisle_nums - 1)),)
+    )
+    router = ENGINES[engine](grid_map)
+    start_time: float = time.perf_counter()
+    router.get_compiled_graph()
+    compile_time: float = time.perf_counter() - start_time
+
+    run: Dict[str, object] = {
+        "map": {"lanes": lanes_nums, "aisles": aisle_nums, "levels": level_nums, "seed": seed},
+        "compile_time_s": compile_time,
+    }
+    if isinstance(router, ContractionHierarchyRouting):
+        hierarchy = router.get_hierarchy()
+        run["preprocessing"] = {"time_s": hierarchy.preprocessing_time, "shortcuts": hierarchy.shortcut_count}
+
+    scenarios = build_scenarios(router, grid_map, random.Random(seed))
+    run["scenarios"] = {name: run_scenario(queries) for name, queries in scenarios.items()}
+    return run
+
+
+def parse_map_size(value: str) -> Tuple[int, int, int]:
+    lanes_nums, aisle_nums, level_nums = (int(part) for part in value.lower().split("x"))
+    return lanes_nums, aisle_nums, level_nums
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Routing benchmark suite")
+    parser.add_argument("--sizes", type=parse_map_size, nargs="+", default=MAP_SIZES, help="map sizes as LANESxAISLESxLEVELS")
+    parser.add_argument("--seeds", type=int, nargs="+", default=SEEDS)
+    parser.add_argument("--engine", choices=list(ENGINES), default="astar")
+    parser.add_argument("--layout", choices=list(LAYOUTS), default="random")
+    parser.add_argument("--output", default="routing_benchmark.json", help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    results: Dict[str, object] = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "queries_per_scenario": QUERIES_PER_SCENARIO,
+        "engine": args.engine,
+        "layout": args.layout,
+        "runs": [],
+    }
+
+    print("Routing benchmark")
+    print("--------------------------------------------------------------------------")
+    for lanes_nums, aisle_nums, level_nums in args.sizes:
+        for seed in args.seeds:
+            run = benchmark_map(lanes_nums, aisle_nums, level_nums, seed, args.engine, args.layout)
+            results["runs"].append(run)
+            print(f"map {lanes_nums}x{aisle_nums}x{level_nums} seed {seed} | compile: {run['compile_time_s']:.3f} s")
+            if "preprocessing" in run:
+                print(f"  preprocessing: {run['preprocessing']['time_s']:.3f} s | shortcuts: {run['preprocessing']['shortcuts']}")
+            for name, scenario in run["scenarios"].items():
+                latency, expanded_nodes = scenario["latency_ms"], scenario["expanded_nodes"]["mean"]
+                print(
+                    f"  {name:<17} n={scenario['queries']:<3} | p50: {latency['p50']:.3f} ms | p95: {latency['p95']:.3f} ms | "
+                    f"p99: {latency['p99']:.3f} ms | expanded: {'-' if expanded_nodes is None else f'{expanded_nodes:.0f}'} | "
+                    f"peak: {scenario['peak_memory_bytes'] / 1024:.1f} KiB"
+                )
+    print("--------------------------------------------------------------------------")
+
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"results written to {args.output}")